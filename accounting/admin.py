@@ -1,8 +1,10 @@
 from django.contrib import admin
 from mptt.admin import DraggableMPTTAdmin
 
-from accounting.models import (CurrencyCBR, Product, Transaction,
-                               TransactionCategoryTree, TransactionRow, Wallet)
+from accounting.models import (CurrencyCBR, CurrencyRate, Product,
+                               Transaction, TransactionCategoryTree,
+                               TransactionDailyAggregate, TransactionRow,
+                               Wallet)
 
 
 class TransactionRowInline(admin.TabularInline):
@@ -29,10 +31,14 @@ admin.site.register(
 
 admin.site.register(Transaction, inlines=[TransactionRowInline], list_display=(
     't_type', 'wallet', 'user', 'category', 'amount', 'tax', 'description', 'date'), autocomplete_fields=('wallet', 'user', 'category'))
+admin.site.register(TransactionDailyAggregate, list_display=(
+    'day', 'user', 'wallet', 'category', 't_type', 'total', 'count'), list_filter=('t_type',))
 admin.site.register(TransactionRow, list_display=(
     'product', 'transaction', 'amount', 'quantity', 'tax'))
 admin.site.register(Wallet, list_display=('user', 'title', 'currency', 'balance'),
                     autocomplete_fields=('user', 'currency'), search_fields=('user', 'currency', 'title'))
 admin.site.register(CurrencyCBR, list_display=(
     'num_code', 'char_code', 'name'), search_fields=('num_code', 'char_code', 'name'))
+admin.site.register(CurrencyRate, list_display=(
+    'date', 'currency', 'nominal', 'value'), list_filter=('currency',), date_hierarchy='date')
 admin.site.register(Product, list_display=('user', 'title', 'description'))
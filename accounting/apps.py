@@ -5,3 +5,6 @@ class AccountingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounting'
     verbose_name = 'Бухгалтерия'
+
+    def ready(self):
+        from . import signals  # noqa: F401
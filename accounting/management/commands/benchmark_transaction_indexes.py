@@ -0,0 +1,218 @@
+"""
+Планы и время горячих запросов к транзакциям с одиночными индексами FK
+(схема до составных индексов) и с индексами Transaction.Meta.indexes.
+
+Команда создает временных пользователей с кошельками, категориями и --rows
+транзакциями (bulk_create пачками), затем для каждого запроса печатает
+EXPLAIN и медиану времени в обоих вариантах. Всё выполняется в одной
+транзакции БД и в конце откатывается: PostgreSQL и SQLite поддерживают
+транзакционный DDL, так что ни данные, ни изменения индексов не остаются.
+"""
+import random
+import statistics
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from accounting.models.transaction import Transaction
+from accounting.models.transactionCategory import TransactionCategoryTree
+from accounting.models.wallet import Wallet
+from accounting.services import currencies
+
+User = get_user_model()
+
+# Индексы, которые раньше создавались на ForeignKey
+FK_INDEXES = [
+    models.Index(fields=[field], name=f'txn_bench_{field}_idx')
+    for field in ('user', 'wallet', 'category')
+]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает планы и время запросов к транзакциям с индексами FK и с составными индексами'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=1_000_000,
+            help='Количество транзакций'
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=100,
+            help='Количество пользователей, между которыми распределяются транзакции'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10_000,
+            help='Размер пачки bulk_create'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Повторов каждого запроса'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Зерно генератора случайных данных'
+        )
+        parser.add_argument(
+            '--no-plans',
+            action='store_true',
+            help='Не печатать планы запросов, только время'
+        )
+
+    def handle(self, *args, **options):
+        for name in ('rows', 'users', 'batch_size', 'repeat'):
+            if options[name] <= 0:
+                raise CommandError(f'--{name.replace("_", "-")} должен быть больше 0')
+
+        self.options = options
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                target = self._seed(random.Random(options['seed']))
+                self.stdout.write(
+                    f'Создано транзакций: {options["rows"]} '
+                    f'за {time.perf_counter() - started:.1f} с')
+
+                queries = self._queries(*target)
+                self._switch_indexes(Transaction._meta.indexes, FK_INDEXES)
+                before = self._run('Индексы FK', queries)
+                self._switch_indexes(FK_INDEXES, Transaction._meta.indexes)
+                after = self._run('Составные индексы', queries)
+                self._summary(before, after)
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write('Тестовые данные и изменения индексов откачены')
+
+    def _seed(self, rng):
+        currency = currencies.default()
+        prefix = f'benchmark_{uuid.uuid4().hex[:8]}'
+        users = User.objects.bulk_create([
+            User(username=f'{prefix}_{i}') for i in range(self.options['users'])
+        ])
+
+        wallets = {}
+        categories = {}
+        for user in users:
+            wallets[user.pk] = Wallet.objects.bulk_create([
+                Wallet(user=user, title=f'Кошелек {i}', currency=currency,
+                       balance=Decimal('0.00'))
+                for i in range(3)
+            ])
+            categories[user.pk] = [
+                TransactionCategoryTree.objects.create(user=user, title=f'Категория {i}')
+                for i in range(5)
+            ]
+
+        today = timezone.now().date()
+        batch_size = self.options['batch_size']
+        remaining = self.options['rows']
+        while remaining:
+            size = min(batch_size, remaining)
+            batch = []
+            for _ in range(size):
+                user = users[rng.randrange(len(users))]
+                batch.append(Transaction(
+                    user=user,
+                    wallet=rng.choice(wallets[user.pk]),
+                    category=rng.choice(categories[user.pk]),
+                    t_type='IN' if rng.random() < 0.3 else 'EX',
+                    amount=Decimal(rng.randrange(100, 500_000)) / 100,
+                    date=today - timedelta(days=rng.randrange(3 * 365)),
+                ))
+            Transaction.objects.bulk_create(batch)
+            remaining -= size
+
+        user = users[0]
+        return user, wallets[user.pk][0], categories[user.pk][0], today
+
+    def _queries(self, user, wallet, category, today):
+        transactions = Transaction.objects.filter(user=user)
+        ordered = transactions.order_by('-created_at', '-uuid')
+        middle = ordered.values_list('created_at', 'uuid')[
+            transactions.count() // 2]
+        return [
+            ('stats: пользователь + даты + тип',
+             transactions.filter(
+                 date__range=(today - timedelta(days=30), today), t_type='EX')
+             .order_by().values('t_type').annotate(total=Sum('amount'))),
+            ('список: первая страница', ordered[:50]),
+            ('список: страница из середины',
+             ordered.filter(Q(created_at__lt=middle[0]) |
+                            Q(created_at=middle[0], uuid__lt=middle[1]))[:50]),
+            ('баланс кошелька: суммы по типу',
+             Transaction.objects.filter(wallet=wallet)
+             .order_by().values('t_type').annotate(total=Sum('amount'))),
+            ('проверка удаления категории',
+             Transaction.objects.filter(category=category, user=user).order_by()[:1]),
+        ]
+
+    def _switch_indexes(self, drop, create):
+        with connection.cursor() as cursor:
+            existing = set(connection.introspection.get_constraints(
+                cursor, Transaction._meta.db_table))
+
+        # SQL выполняется напрямую: на SQLite schema_editor нельзя открыть
+        # внутри transaction.atomic
+        editor = connection.schema_editor()
+        statements = [f'DROP INDEX {connection.ops.quote_name(index.name)}'
+                      for index in drop if index.name in existing]
+        statements += [str(index.create_sql(Transaction, editor))
+                       for index in create if index.name not in existing]
+
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+        self._analyze()
+        self.stdout.write(
+            f'Индексы перестроены за {time.perf_counter() - started:.1f} с')
+
+    def _analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'ANALYZE {connection.ops.quote_name(Transaction._meta.db_table)}')
+
+    def _run(self, title, queries):
+        self.stdout.write(self.style.SUCCESS(title))
+        timings = {}
+        for name, queryset in queries:
+            samples = []
+            for _ in range(self.options['repeat']):
+                started = time.perf_counter()
+                list(queryset.all())
+                samples.append(time.perf_counter() - started)
+            timings[name] = statistics.median(samples)
+
+            self.stdout.write(f'  {name}: {timings[name] * 1e3:.2f} мс')
+            if not self.options['no_plans']:
+                for line in queryset.explain().splitlines():
+                    self.stdout.write(f'      {line}')
+        return timings
+
+    def _summary(self, before, after):
+        self.stdout.write(self.style.SUCCESS('Итог (медиана, мс)'))
+        for name, elapsed in before.items():
+            speedup = elapsed / after[name] if after[name] else float('inf')
+            self.stdout.write(
+                f'  {name}: {elapsed * 1e3:.2f} -> {after[name] * 1e3:.2f} '
+                f'(x{speedup:.1f})')
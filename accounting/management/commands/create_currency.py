@@ -1,28 +1,100 @@
-from django.core.management.base import BaseCommand
-from pandas import read_xml
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from lxml import etree
+
 from accounting.models.currencyCBR import CurrencyCBR
+from accounting.models.currencyRate import CurrencyRate
+from accounting.services import cbr, currencies, rates
+from accounting.services.total_balance import (recalculate_total_balances,
+                                               users_with_currency)
+
+RUB_NUM_CODE = 643
 
 
 class Command(BaseCommand):
-    help = 'Создает валюты (наименование, цифровой код, символьный код) на основе данных от ЦБ РФ'
+    help = ('Создает и обновляет валюты (наименование, цифровой код, символьный код, курс) '
+            'и сохраняет курсы на дату по ежедневному XML ЦБ РФ')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'source',
+            nargs='?',
+            default=cbr.CBR_DAILY_URL,
+            help='URL, путь к XML-файлу или - для stdin (по умолчанию %(default)s)',
+        )
+        parser.add_argument(
+            '--date',
+            help='Дата курсов (ГГГГ-ММ-ДД), по умолчанию из атрибута Date документа',
+        )
 
     def handle(self, *args, **options):
+        override_date = None
+        if options['date']:
+            override_date = parse_date(options['date'])
+            if override_date is None:
+                raise CommandError('--date должен быть в формате ГГГГ-ММ-ДД')
+
+        try:
+            with cbr.open_source(options['source']) as stream:
+                parsed = {rate.num_code: rate for rate in cbr.iter_rates(stream)}
+        except (cbr.CBRFormatError, etree.XMLSyntaxError, OSError) as e:
+            raise CommandError(f'Не удалось загрузить курсы из {options["source"]}: {e}')
+        if not parsed:
+            raise CommandError(f'В {options["source"]} нет курсов валют')
+
+        rate_date = (override_date or next(iter(parsed.values())).date
+                     or timezone.localdate())
 
-        currencies = CurrencyCBR.objects.all().values_list('num_code', flat=True)
-        if 643 not in currencies:
-            CurrencyCBR.objects.create(num_code=643, char_code='RUB', name='Российский рубль')
+        existing = {
+            num_code: (pk, (char_code, name, nominal, value))
+            for pk, num_code, char_code, name, nominal, value in CurrencyCBR.objects.values_list(
+                'uuid', 'num_code', 'char_code', 'name', 'nominal', 'value')
+        }
+        latest = dict(CurrencyRate.objects.order_by().values('currency_id')
+                      .annotate(last=Max('date')).values_list('currency_id', 'last'))
 
-        df = read_xml('https://www.cbr-xml-daily.ru/daily_utf8.xml')
-        create_list = []
-        for row in df.iterrows():
+        upserts, rate_changed = [], []
+        if RUB_NUM_CODE not in existing and RUB_NUM_CODE not in parsed:
+            upserts.append(CurrencyCBR(num_code=RUB_NUM_CODE, char_code='RUB', name='Российский рубль'))
+        for rate in parsed.values():
+            pk, current = existing.get(rate.num_code, (None, None))
+            wanted = (rate.char_code, rate.name, rate.nominal, rate.value)
+            if current is not None and rate_date < latest.get(pk, rate_date):
+                # Загрузка прошлых дат не меняет текущий курс
+                wanted = wanted[:2] + current[2:]
+            if wanted == current:
+                continue
+            if current is not None and wanted[2:] != current[2:]:
+                rate_changed.append(pk)
+            currency = CurrencyCBR(num_code=rate.num_code, char_code=wanted[0], name=wanted[1],
+                                   nominal=wanted[2], value=wanted[3])
+            if pk is not None:
+                currency.uuid = pk
+            upserts.append(currency)
 
-            currencyData = {
-                    'num_code': row[1]['NumCode'],
-                    'char_code': row[1]['CharCode'],
-                    'name': row[1]['Name'],
-            }
+        with transaction.atomic():
+            CurrencyCBR.objects.bulk_create(
+                upserts, update_conflicts=True, unique_fields=['num_code'],
+                update_fields=['char_code', 'name', 'nominal', 'value', 'update_at'])
+            currency_ids = {num_code: pk for num_code, (pk, _) in existing.items()}
+            currency_ids.update((currency.num_code, currency.pk) for currency in upserts)
+            CurrencyRate.objects.bulk_create(
+                [CurrencyRate(currency_id=currency_ids[rate.num_code], date=rate_date,
+                              nominal=rate.nominal, value=rate.value)
+                 for rate in parsed.values()],
+                update_conflicts=True, unique_fields=['currency', 'date'],
+                update_fields=['nominal', 'value'])
+        currencies.invalidate()
+        rates.invalidate()
 
-            if currencyData['num_code'] not in currencies:
-                create_list.append(CurrencyCBR(**currencyData))
+        # Курсы изменились - общий баланс владельцев кошельков в этих валютах устарел
+        if rate_changed:
+            recalculate_total_balances(users_with_currency(rate_changed))
 
-        CurrencyCBR.objects.bulk_create(create_list)
+        created = sum(currency.num_code not in existing for currency in upserts)
+        self.stdout.write(self.style.SUCCESS(
+            f'Курсы на {rate_date}: {len(parsed)}, новых валют: {created}, '
+            f'обновлено: {len(upserts) - created}'))
@@ -0,0 +1,116 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting.services import synthetic
+
+
+class Command(BaseCommand):
+    help = ('Создает синтетических пользователей, кошельки, деревья категорий и '
+            'транзакции для нагрузочных замеров')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=10,
+            help='Количество пользователей'
+        )
+        parser.add_argument(
+            '--wallets',
+            type=int,
+            default=3,
+            help='Кошельков у каждого пользователя'
+        )
+        parser.add_argument(
+            '--currencies',
+            default='RUB,USD,EUR',
+            help='Коды валют кошельков через запятую (по умолчанию RUB,USD,EUR)'
+        )
+        parser.add_argument(
+            '--category-depth',
+            type=int,
+            default=4,
+            help='Глубина деревьев категорий'
+        )
+        parser.add_argument(
+            '--category-breadth',
+            type=int,
+            default=3,
+            help='Число корневых категорий и детей у каждой категории'
+        )
+        parser.add_argument(
+            '--transactions',
+            type=int,
+            default=100_000,
+            help='Всего транзакций'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=730,
+            help='Глубина истории транзакций в днях'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10_000,
+            help='Размер пачки bulk_create'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Зерно генератора для воспроизводимых данных'
+        )
+        parser.add_argument(
+            '--purge',
+            action='store_true',
+            help='Удалить ранее созданные синтетические данные и выйти'
+        )
+
+    def handle(self, *args, **options):
+        if options['purge']:
+            count = synthetic.purge()
+            self.stdout.write(self.style.SUCCESS(
+                f'Удалено синтетических пользователей: {count}'))
+            return
+
+        for name in ('users', 'category_depth', 'category_breadth', 'days', 'batch_size'):
+            if options[name] <= 0:
+                raise CommandError(f'--{name.replace("_", "-")} должен быть больше 0')
+        if options['wallets'] < 0 or options['transactions'] < 0:
+            raise CommandError('--wallets и --transactions не могут быть отрицательными')
+
+        currencies = [code.strip().upper()
+                      for code in options['currencies'].split(',') if code.strip()]
+        if not currencies:
+            raise CommandError('Не указаны валюты')
+
+        total = options['transactions']
+        started = time.perf_counter()
+
+        def progress(created):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'  транзакций: {created}/{total} ({created / elapsed:.0f}/с)')
+
+        try:
+            result = synthetic.generate(
+                users=options['users'],
+                wallets_per_user=options['wallets'],
+                currencies=currencies,
+                category_depth=options['category_depth'],
+                category_breadth=options['category_breadth'],
+                transactions=total,
+                days=options['days'],
+                batch_size=options['batch_size'],
+                seed=options['seed'],
+                progress=progress,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано за {time.perf_counter() - started:.1f} с: '
+            f'пользователей {len(result.user_ids)}, кошельков {result.wallets}, '
+            f'категорий {result.categories}, транзакций {result.transactions}'))
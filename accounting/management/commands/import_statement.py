@@ -0,0 +1,95 @@
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting.models.wallet import Wallet
+from accounting.services import statement_import
+
+
+class Command(BaseCommand):
+    help = ('Импортирует транзакции пользователя из банковской выписки CSV или OFX. '
+            'Повторный импорт той же выписки не создает дублей')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'source',
+            help='Путь к файлу выписки или - для stdin',
+        )
+        parser.add_argument(
+            '--user',
+            required=True,
+            help='UUID пользователя или его telegram_id',
+        )
+        parser.add_argument(
+            '--wallet',
+            help='UUID или название кошелька для строк без колонки кошелька',
+        )
+        parser.add_argument(
+            '--format',
+            choices=statement_import.FORMATS,
+            help='Формат файла (по умолчанию по расширению и содержимому)',
+        )
+        parser.add_argument(
+            '--encoding',
+            help='Кодировка CSV (по умолчанию UTF-8 или windows-1251 по содержимому)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=statement_import.BATCH_SIZE,
+            help='Строк в одной пачке',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size должен быть больше 0')
+
+        user = self._get_user(options['user'])
+        wallet = None
+        if options['wallet']:
+            wallets = Wallet.objects.filter(user=user)
+            wallet = (wallets.filter(title=options['wallet']).first()
+                      or self._get_wallet_by_uuid(wallets, options['wallet']))
+
+        started = time.perf_counter()
+        try:
+            if options['source'] == '-':
+                result = self._import(user, sys.stdin.buffer, '', wallet, options)
+            else:
+                with open(options['source'], 'rb') as stream:
+                    result = self._import(user, stream, options['source'], wallet, options)
+        except OSError as e:
+            raise CommandError(f'Не удалось прочитать {options["source"]}: {e}')
+        except statement_import.StatementFormatError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        for error in result.errors:
+            self.stdout.write(f'  {error}')
+        rate = result.rows / elapsed * 60 if elapsed else 0
+        style = self.style.WARNING if result.skipped else self.style.SUCCESS
+        self.stdout.write(style(
+            f'Строк: {result.rows}, добавлено: {result.created}, дублей: {result.duplicates}, '
+            f'пропущено с ошибками: {result.skipped} за {elapsed:.1f} с ({rate:.0f} строк/мин)'))
+
+    def _import(self, user, stream, filename, wallet, options):
+        return statement_import.import_file(
+            user, stream, filename=filename, fmt=options['format'], wallet=wallet,
+            batch_size=options['batch_size'], encoding=options['encoding'])
+
+    def _get_user(self, value):
+        User = get_user_model()
+        lookup = {'telegram_id': int(value)} if value.lstrip('-').isdigit() else {'uuid': value}
+        try:
+            return User.objects.get(**lookup)
+        except (User.DoesNotExist, ValidationError):
+            raise CommandError(f'Пользователь {value} не найден')
+
+    def _get_wallet_by_uuid(self, wallets, value):
+        try:
+            return wallets.get(uuid=value)
+        except (Wallet.DoesNotExist, ValidationError):
+            raise CommandError(f'Кошелек {value} не найден у пользователя')
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from accounting.services.rollups import (merge_duplicate_rollups,
+                                         rebuild_rollups)
+from users.models.user import User
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает дневные агрегаты транзакций (TransactionDailyAggregate) с нуля'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='UUID пользователя, агрегаты которого нужно пересобрать',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Размер пачки для bulk_create (по умолчанию 5000)',
+        )
+        parser.add_argument(
+            '--merge-duplicates',
+            action='store_true',
+            help='Только слить дубли строк агрегатов, без полной пересборки',
+        )
+
+    def handle(self, *args, **options):
+        users = None
+        if options['user']:
+            users = User.objects.filter(uuid=options['user'])
+
+        if options['merge_duplicates']:
+            removed = merge_duplicate_rollups(users)
+            self.stdout.write(self.style.SUCCESS(
+                f'Удалено дублей строк агрегатов: {removed}'))
+            return
+
+        created = rebuild_rollups(users, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано строк агрегатов: {created}'))
@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting.services.total_balance import (base_currency_code,
+                                               recalculate_total_balances)
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает общий баланс пользователей по балансам кошельков '
+            'и курсам ЦБ. Пользователи обрабатываются пачками, по одному '
+            'агрегирующему запросу на пачку')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Пользователей в одной пачке',
+        )
+        parser.add_argument(
+            '--user',
+            help='UUID пользователя, общий баланс которого нужно пересчитать',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0:
+            raise CommandError('--chunk-size должен быть больше 0')
+
+        users = get_user_model().objects.all()
+        if options['user']:
+            users = users.filter(uuid=options['user'])
+
+        count = recalculate_total_balances(users, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитан общий баланс {count} пользователей ({base_currency_code()})'))
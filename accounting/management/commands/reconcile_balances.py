@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from accounting.models.wallet import Wallet
+from accounting.services.balance import reconcile_balances
+
+
+class Command(BaseCommand):
+    help = ('Сверяет балансы кошельков с суммой транзакций и исправляет расхождения. '
+            'Предназначена для периодического запуска (cron/systemd timer)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения, не исправляя их',
+        )
+        parser.add_argument(
+            '--user',
+            help='UUID пользователя, кошельки которого нужно проверить',
+        )
+
+    def handle(self, *args, **options):
+        wallets = Wallet.objects.all()
+        if options['user']:
+            wallets = wallets.filter(user__uuid=options['user'])
+
+        drift = reconcile_balances(wallets, repair=not options['dry_run'])
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('Расхождений не найдено'))
+            return
+
+        for item in drift:
+            self.stdout.write(
+                f'  {item.wallet_id}: сохранено {item.balance}, ожидается {item.expected}')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f'Найдено расхождений: {len(drift)} (не исправлены, --dry-run)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Исправлено расхождений: {len(drift)}'))
@@ -1,6 +1,9 @@
 from accounting.models.currencyCBR import CurrencyCBR
+from accounting.models.currencyRate import CurrencyRate
 from accounting.models.product import Product
 from accounting.models.transaction import Transaction
 from accounting.models.transactionCategory import TransactionCategoryTree
+from accounting.models.transactionDailyAggregate import \
+    TransactionDailyAggregate
 from accounting.models.transactionRow import TransactionRow
 from accounting.models.wallet import Wallet
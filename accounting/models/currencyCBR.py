@@ -1,5 +1,6 @@
 from django.db import models
 import uuid
+from decimal import Decimal
 from django.utils import timezone
 
 
@@ -8,13 +9,26 @@ class CurrencyCBR(models.Model):
     num_code = models.SmallIntegerField(unique=True)
     char_code = models.CharField(max_length=3, unique=True)
     name = models.CharField(max_length=255)
+    # Курс ЦБ: value рублей за nominal единиц валюты
+    nominal = models.PositiveIntegerField(default=1)
+    value = models.DecimalField(max_digits=14, decimal_places=4, null=True, blank=True)
     create_at = models.DateTimeField(auto_now_add=True)
     update_at = models.DateTimeField(auto_now=True)
 
     @classmethod
     def get_default_currency(cls):
-        currencyCBR, created = cls.objects.get_or_create(num_code=643, char_code='RUB', name='Российский рубль')
-        return currencyCBR.pk
+        # Из справочника в памяти: вызывается при создании каждого кошелька
+        from accounting.services import currencies
+        return currencies.default().pk
+
+    @property
+    def rate(self):
+        """Рублей за единицу валюты или None, если курс не загружен"""
+        if self.char_code == 'RUB':
+            return Decimal('1')
+        if self.value is None:
+            return None
+        return self.value / self.nominal
 
     def __str__(self):
         return self.name
@@ -0,0 +1,30 @@
+import uuid
+
+from django.db import models
+
+from accounting.models.currencyCBR import CurrencyCBR
+
+
+class CurrencyRate(models.Model):
+    """Курс ЦБ на дату: value рублей за nominal единиц валюты."""
+
+    uuid = models.UUIDField(
+        primary_key=True, default=uuid.uuid4, editable=False)
+    currency = models.ForeignKey(
+        CurrencyCBR, on_delete=models.CASCADE, related_name="currency_rates")
+    date = models.DateField()
+    nominal = models.PositiveIntegerField(default=1)
+    value = models.DecimalField(max_digits=14, decimal_places=4)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name = 'Курс валюты'
+        verbose_name_plural = 'Курсы валют'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['currency', 'date'], name='unique_currency_rate_date'),
+        ]
+
+    def __str__(self):
+        return f'{self.date} {self.currency.char_code}: {self.value}/{self.nominal}'
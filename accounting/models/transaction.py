@@ -18,17 +18,24 @@ class Transaction(models.Model):
     uuid = models.UUIDField(
         primary_key=True, default=uuid.uuid4, editable=False)
     t_type = models.CharField(choices=CHOICES, max_length=2)
+    # Одиночные индексы FK не нужны: эти поля - префиксы составных индексов
     wallet = models.ForeignKey(
-        Wallet, on_delete=models.CASCADE, related_name="wallet_transactions")
+        Wallet, on_delete=models.CASCADE, related_name="wallet_transactions",
+        db_index=False)
     user = models.ForeignKey(
-        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="user_transactions")
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="user_transactions",
+        db_index=False)
     category = models.ForeignKey(TransactionCategoryTree, on_delete=models.CASCADE,
-                                 related_name="category_transactions", blank=True, null=True)
+                                 related_name="category_transactions", blank=True, null=True,
+                                 db_index=False)
     amount = models.DecimalField(max_digits=14, decimal_places=2)
     tax = models.DecimalField(
         max_digits=5, decimal_places=2, default=0.00, blank=True)
     description = models.CharField(max_length=255, blank=True)
     date = models.DateField(default=timezone.now)
+    # Хэш содержимого строки выписки для повторного импорта без дублей
+    import_hash = models.CharField(
+        max_length=64, blank=True, null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -36,6 +43,29 @@ class Transaction(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Тарнзакция'
         verbose_name_plural = 'Тарнзакции'
+        # include (покрывающие индексы для сумм amount) применяется только
+        # на PostgreSQL, на остальных СУБД создается обычный индекс
+        indexes = [
+            # Статистика и дашборд: пользователь, диапазон дат, тип
+            models.Index(fields=['user', 'date', 't_type'], include=['amount'],
+                         name='txn_user_date_type_idx'),
+            # Списки и keyset пагинация: ORDER BY created_at DESC, uuid DESC
+            models.Index(fields=['user', '-created_at', '-uuid'],
+                         name='txn_user_created_idx'),
+            # Пересчет баланса кошелька: суммы по типу
+            models.Index(fields=['wallet', 't_type'], include=['amount'],
+                         name='txn_wallet_type_idx'),
+            # Проверки перед удалением категории
+            models.Index(fields=['category', 'user'],
+                         name='txn_category_user_idx'),
+        ]
+        constraints = [
+            # Частичный: у транзакций, введенных вручную, хэша нет
+            models.UniqueConstraint(
+                fields=['user', 'import_hash'],
+                condition=models.Q(import_hash__isnull=False),
+                name='unique_transaction_import_hash'),
+        ]
 
     def __str__(self):
         return f'[{self.user.username}] ' + str(self.t_type) + ': ' + str(self.amount)
@@ -0,0 +1,51 @@
+import uuid
+
+from django.conf import settings
+from django.db import models
+
+from accounting.models.transactionCategory import TransactionCategoryTree
+from accounting.models.wallet import Wallet
+
+
+class TransactionDailyAggregate(models.Model):
+    """Суммы и количество транзакций за день в разрезе кошелька, категории и типа."""
+
+    CHOICES = (
+        ("IN", "INCOME"),
+        ("EX", "EXPENSE"),
+    )
+
+    uuid = models.UUIDField(
+        primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="user_transaction_aggregates")
+    wallet = models.ForeignKey(
+        Wallet, on_delete=models.CASCADE, related_name="wallet_transaction_aggregates")
+    category = models.ForeignKey(TransactionCategoryTree, on_delete=models.CASCADE,
+                                 related_name="category_transaction_aggregates", blank=True, null=True)
+    t_type = models.CharField(choices=CHOICES, max_length=2)
+    day = models.DateField()
+    total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Агрегат транзакций за день'
+        verbose_name_plural = 'Агрегаты транзакций за день'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'wallet', 'category', 't_type', 'day'],
+                name='unique_transaction_daily_aggregate'),
+            # NULL в category не совпадает с NULL, поэтому строки без
+            # категории нужно ограничить отдельно
+            models.UniqueConstraint(
+                fields=['user', 'wallet', 't_type', 'day'],
+                condition=models.Q(category__isnull=True),
+                name='unique_transaction_daily_aggregate_no_category'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'day'],
+                         name='txn_aggregate_user_day_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.day} {self.t_type}: {self.total} ({self.count})'
@@ -0,0 +1,77 @@
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .services import keyset
+
+
+class TransactionKeysetPagination(BasePagination):
+    """
+    Курсорная пагинация транзакций по (поле сортировки, uuid)
+
+    Поле сортировки берется из queryset после OrderingFilter, по умолчанию
+    -created_at. Ответ: {"next", "previous", "results"} без count.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    default_ordering = '-created_at'
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        try:
+            self.page = keyset.paginate(
+                queryset,
+                cursor=request.query_params.get(self.cursor_query_param),
+                page_size=self.get_page_size(request),
+                ordering=self.get_ordering(queryset),
+            )
+        except keyset.InvalidCursor:
+            raise NotFound(self.invalid_cursor_message)
+        return list(self.page)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    def get_ordering(self, queryset):
+        order_by = queryset.query.order_by
+        if order_by and isinstance(order_by[0], str) and order_by[0].lstrip('-') != 'pk':
+            return order_by[0]
+        return self.default_ordering
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self.get_link(self.page.next_cursor)
+
+    def get_previous_link(self):
+        return self.get_link(self.page.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
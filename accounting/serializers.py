@@ -3,6 +3,7 @@ from rest_framework import serializers
 from .models.transaction import Transaction
 from .models.transactionCategory import TransactionCategoryTree
 from .models.wallet import Wallet
+from .services import statement_import
 
 
 class WalletSerializer(serializers.ModelSerializer):
@@ -49,3 +50,9 @@ class TransactionSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 "Недостаточно прав для изменения этой транзакции")
         return super().update(instance, validated_data)
+
+
+class StatementImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    wallet = serializers.UUIDField(required=False)
+    format = serializers.ChoiceField(choices=statement_import.FORMATS, required=False)
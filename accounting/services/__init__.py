@@ -0,0 +1 @@
+# Сервисный слой accounting app
@@ -0,0 +1,132 @@
+"""
+Инкрементальный учет балансов кошельков.
+
+Баланс кошелька равен сумме доходов минус сумма расходов по его транзакциям.
+Вместо полного пересчета по всей истории при каждой операции баланс
+сдвигается на дельту атомарным UPDATE ... SET balance = balance + delta
+внутри той же транзакции БД, что и изменение самой записи (см. ledger).
+Периодическая сверка (reconcile_balances) находит и исправляет расхождения,
+возникшие в обход сервисного слоя (админка, ручные правки в БД).
+Вместе с балансом кошелька сдвигается общий баланс владельца (total_balance).
+"""
+import logging
+from decimal import ROUND_HALF_EVEN, Decimal
+from typing import List, NamedTuple, Optional
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from accounting.models.wallet import Wallet
+
+from . import total_balance
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0')
+CENT = Decimal('0.01')
+
+
+class BalanceDrift(NamedTuple):
+    """Расхождение сохраненного баланса кошелька с суммой транзакций."""
+    wallet_id: object
+    balance: Decimal
+    expected: Decimal
+
+
+def to_amount(value) -> Decimal:
+    """Приводит сумму к Decimal с округлением, как DecimalField при сохранении."""
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_EVEN)
+
+
+def signed_amount(t_type: str, amount) -> Decimal:
+    """Сумма транзакции со знаком: доход увеличивает баланс, расход уменьшает."""
+    amount = to_amount(amount)
+    return amount if t_type == 'IN' else -amount
+
+
+def apply_balance_delta(wallet_id, delta: Decimal) -> None:
+    """Атомарно сдвигает баланс кошелька на delta без чтения истории."""
+    if not delta:
+        return
+    Wallet.objects.filter(pk=wallet_id).update(balance=F('balance') + delta)
+    total_balance.apply_wallet_delta(wallet_id, delta)
+
+
+def _expected_balance_expression():
+    """Выражение баланса кошелька по всем его транзакциям."""
+    zero = Value(ZERO, output_field=DecimalField(max_digits=14, decimal_places=2))
+    income = Coalesce(
+        Sum('wallet_transactions__amount',
+            filter=Q(wallet_transactions__t_type='IN')),
+        zero
+    )
+    expense = Coalesce(
+        Sum('wallet_transactions__amount',
+            filter=Q(wallet_transactions__t_type='EX')),
+        zero
+    )
+    return income - expense
+
+
+def find_balance_drift(wallets=None) -> List[BalanceDrift]:
+    """
+    Находит кошельки, баланс которых расходится с суммой транзакций
+
+    Args:
+        wallets: QuerySet кошельков для проверки (по умолчанию все)
+
+    Returns:
+        Список расхождений
+    """
+    queryset = wallets if wallets is not None else Wallet.objects.all()
+    drifted = (
+        queryset
+        .order_by()
+        .annotate(expected=_expected_balance_expression())
+        .exclude(balance=F('expected'))
+        .values_list('uuid', 'balance', 'expected')
+    )
+    return [BalanceDrift(*row) for row in drifted]
+
+
+def recalculate_wallet_balance(wallet_id) -> Optional[Decimal]:
+    """Пересчитывает баланс одного кошелька по полной истории под блокировкой строки."""
+    with transaction.atomic():
+        locked = Wallet.objects.select_for_update().filter(pk=wallet_id)
+        if not locked.exists():
+            return None
+        expected = (
+            Wallet.objects.filter(pk=wallet_id)
+            .annotate(expected=_expected_balance_expression())
+            .values_list('expected', flat=True)
+            .get()
+        )
+        locked.update(balance=expected)
+        total_balance.recalculate_total_balances(
+            get_user_model().objects.filter(user_wallets=wallet_id))
+        return expected
+
+
+def reconcile_balances(wallets=None, repair: bool = True) -> List[BalanceDrift]:
+    """
+    Сверяет балансы кошельков с полной суммой транзакций
+
+    Args:
+        wallets: QuerySet кошельков для проверки (по умолчанию все)
+        repair: Исправлять ли найденные расхождения
+
+    Returns:
+        Список найденных расхождений
+    """
+    drift = find_balance_drift(wallets)
+
+    for item in drift:
+        logger.warning(
+            f"Balance drift for wallet {item.wallet_id}: "
+            f"stored={item.balance}, expected={item.expected}")
+        if repair:
+            recalculate_wallet_balance(item.wallet_id)
+
+    return drift
@@ -0,0 +1,165 @@
+"""
+Сериализация дерева категорий пользователя за один запрос к БД.
+
+Категории читаются одним SELECT, упорядоченным по (tree_id, lft): в таком
+порядке MPTT гарантирует, что родитель идёт раньше своих потомков. Поэтому
+вложенная структура собирается в памяти за один проход (O(n)) без
+рекурсивных get_children() на каждый узел.
+
+Строки кэшируются по пользователю под версионным ключом. Версия меняется
+сигналами при любом изменении категорий (accounting.signals), после чего
+старые записи просто перестают читаться и истекают сами.
+
+Для клавиатур бота отдельно кэшируется компактный индекс CategoryEntry
+(uuid, title, level, parent) - его хватает для построения кнопок, и
+перелистывание страниц не обращается к БД.
+"""
+import uuid
+from typing import NamedTuple, Optional
+
+from django.core.cache import cache
+from rest_framework import serializers
+
+from accounting.models.transactionCategory import TransactionCategoryTree
+
+CACHE_TIMEOUT = 60 * 60 * 24
+
+_ROW_FIELDS = ('uuid', 'title', 'description', 'parent_id', 'level', 'created_at')
+_datetime_field = serializers.DateTimeField()
+
+
+class CategoryEntry(NamedTuple):
+    """Компактная запись категории для клавиатур бота"""
+    uuid: str
+    title: str
+    level: int
+    parent: Optional[str]
+
+
+def _version_key(user_id) -> str:
+    return f'category_tree:version:{user_id}'
+
+
+def get_version(user_id) -> str:
+    """Текущая версия кэша категорий пользователя"""
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        # add() не перетирает версию, выставленную параллельным процессом
+        if not cache.add(key, version, None):
+            version = cache.get(key) or version
+    return version
+
+
+def bump_version(user_id) -> None:
+    """Инвалидирует все кэшированные представления категорий пользователя"""
+    cache.set(_version_key(user_id), uuid.uuid4().hex, None)
+
+
+def _rows_key(user_id) -> str:
+    return f'category_tree:rows:{user_id}:{get_version(user_id)}'
+
+
+def _fetch_rows(user_id) -> list:
+    """Все категории пользователя одним запросом в порядке обхода дерева"""
+    rows = []
+    queryset = (
+        TransactionCategoryTree.objects
+        .filter(user_id=user_id)
+        .order_by('tree_id', 'lft')
+        .values_list(*_ROW_FIELDS)
+    )
+    for pk, title, description, parent_id, level, created_at in queryset:
+        rows.append({
+            'uuid': str(pk),
+            'title': title,
+            'description': description,
+            'parent': str(parent_id) if parent_id else None,
+            'level': level,
+            'created_at': _datetime_field.to_representation(created_at),
+        })
+    return rows
+
+
+def get_rows(user_id) -> list:
+    """
+    Плоский список категорий пользователя в порядке (tree_id, lft)
+
+    Returns:
+        list: словари uuid/title/description/parent/level/created_at
+    """
+    key = _rows_key(user_id)
+    rows = cache.get(key)
+    if rows is None:
+        rows = _fetch_rows(user_id)
+        cache.set(key, rows, CACHE_TIMEOUT)
+    return rows
+
+
+def get_entries(user_id) -> list:
+    """
+    Компактный индекс категорий пользователя в порядке (tree_id, lft)
+
+    В кэше лежат обычные кортежи, чтобы запись не зависела от класса
+    CategoryEntry при сериализации.
+
+    Returns:
+        list[CategoryEntry]: записи uuid/title/level/parent
+    """
+    key = f'category_tree:entries:{user_id}:{get_version(user_id)}'
+    entries = cache.get(key)
+    if entries is None:
+        entries = [
+            (str(pk), title, level, str(parent_id) if parent_id else None)
+            for pk, title, level, parent_id in (
+                TransactionCategoryTree.objects
+                .filter(user_id=user_id)
+                .order_by('tree_id', 'lft')
+                .values_list('uuid', 'title', 'level', 'parent_id')
+            )
+        ]
+        cache.set(key, entries, CACHE_TIMEOUT)
+    return [CategoryEntry(*entry) for entry in entries]
+
+
+def _assemble(rows: list) -> tuple:
+    """
+    Собирает узлы с вложенными children за один проход
+
+    Returns:
+        tuple: (корневые узлы, все узлы в порядке обхода)
+    """
+    nodes = {}
+    roots = []
+    ordered = []
+    for row in rows:
+        node = {
+            'uuid': row['uuid'],
+            'title': row['title'],
+            'description': row['description'],
+            'parent': row['parent'],
+            'children': [],
+            'created_at': row['created_at'],
+        }
+        nodes[row['uuid']] = node
+        ordered.append(node)
+
+        parent = nodes.get(row['parent']) if row['parent'] else None
+        if parent is not None:
+            parent['children'].append(node)
+        else:
+            roots.append(node)
+    return roots, ordered
+
+
+def build_tree(user_id, rows: Optional[list] = None) -> list:
+    """Корневые категории пользователя с вложенными children"""
+    roots, _ = _assemble(get_rows(user_id) if rows is None else rows)
+    return roots
+
+
+def build_flat(user_id, rows: Optional[list] = None) -> list:
+    """Все категории пользователя, каждая со своим поддеревом children"""
+    _, ordered = _assemble(get_rows(user_id) if rows is None else rows)
+    return ordered
@@ -0,0 +1,108 @@
+"""
+Потоковый разбор ежедневных курсов ЦБ РФ (формат XML_daily / daily_utf8.xml).
+
+    <ValCurs Date="17.10.2026" name="Foreign Currency Market">
+        <Valute ID="R01235">
+            <NumCode>840</NumCode><CharCode>USD</CharCode><Nominal>1</Nominal>
+            <Name>Доллар США</Name><Value>95,0000</Value>
+        </Valute>
+        ...
+
+Документ читается lxml.etree.iterparse: каждый Valute превращается в
+CBRRate и сразу удаляется из дерева, поэтому память не зависит от размера
+файла. Источник - URL, путь к файлу или '-' (stdin); кодировку берет из
+XML-декларации lxml (daily_utf8.xml - UTF-8, cbr.ru - windows-1251).
+"""
+import sys
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import IO, Iterator, NamedTuple, Optional
+from urllib.request import urlopen
+
+from lxml import etree
+
+CBR_DAILY_URL = 'https://www.cbr-xml-daily.ru/daily_utf8.xml'
+
+URL_TIMEOUT = 30
+
+
+class CBRFormatError(ValueError):
+    """Документ не похож на ежедневные курсы ЦБ"""
+
+
+class CBRRate(NamedTuple):
+    date: Optional[date]
+    num_code: int
+    char_code: str
+    name: str
+    nominal: int
+    value: Decimal
+
+
+@contextmanager
+def open_source(source: str) -> Iterator[IO[bytes]]:
+    """Бинарный поток по URL, пути к файлу или '-' для stdin"""
+    if source == '-':
+        yield sys.stdin.buffer
+    elif source.startswith(('http://', 'https://')):
+        with urlopen(source, timeout=URL_TIMEOUT) as response:
+            yield response
+    else:
+        with open(source, 'rb') as f:
+            yield f
+
+
+def _text(element, tag: str) -> str:
+    value = element.findtext(tag)
+    if value is None:
+        raise CBRFormatError(f'Нет {tag} у валюты {element.get("ID")}')
+    return value.strip()
+
+
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%d.%m.%Y').date()
+    except ValueError as e:
+        raise CBRFormatError(f'Некорректная дата курсов: {value}') from e
+
+
+def iter_rates(stream: IO[bytes]) -> Iterator[CBRRate]:
+    """
+    Курсы из потока по одному, с датой из атрибута Date корня
+
+    Raises:
+        CBRFormatError: не тот корень, нет полей или они не разбираются
+        lxml.etree.XMLSyntaxError: поврежденный XML
+    """
+    rate_date = None
+    for event, element in etree.iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            if element.getparent() is None:
+                if element.tag != 'ValCurs':
+                    raise CBRFormatError(f'Ожидался корень ValCurs, получен {element.tag}')
+                rate_date = _parse_date(element.get('Date'))
+            continue
+        if element.tag != 'Valute':
+            continue
+        num_code, char_code, name, nominal, value = (
+            _text(element, tag) for tag in ('NumCode', 'CharCode', 'Name', 'Nominal', 'Value'))
+        try:
+            rate = CBRRate(
+                date=rate_date,
+                num_code=int(num_code),
+                char_code=char_code,
+                name=name,
+                nominal=int(nominal),
+                # ЦБ пишет курс с десятичной запятой
+                value=Decimal(value.replace(',', '.')),
+            )
+        except (ValueError, InvalidOperation) as e:
+            raise CBRFormatError(f'Некорректная валюта {element.get("ID")}: {e}') from e
+        yield rate
+        # Разобранные элементы не копятся в дереве
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
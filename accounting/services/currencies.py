@@ -0,0 +1,149 @@
+"""
+Справочник валют CurrencyCBR в памяти процесса.
+
+Валют несколько десятков, меняются они раз в день (create_currency), а
+читаются постоянно: значение по умолчанию Wallet.currency, выбор валюты
+в боте, формы Mini App. Справочник загружается одним запросом и отдает
+экземпляры CurrencyCBR по pk, char_code и num_code без обращения к БД.
+
+Изменения видны через версию в общем кэше: invalidate() (сигналы
+CurrencyCBR, create_currency) меняет ее и сразу сбрасывает справочник
+своего процесса, остальные процессы сверяют версию не чаще раза в
+ACCOUNTING_CURRENCY_CHECK_INTERVAL секунд. Поэтому и общий кэш не
+опрашивается при создании каждого кошелька.
+
+Экземпляры общие для всего процесса - менять их нельзя.
+"""
+import threading
+import time
+import uuid
+from typing import Dict, List, NamedTuple, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from accounting.models.currencyCBR import CurrencyCBR
+
+DEFAULT_NUM_CODE = 643
+
+_VERSION_KEY = 'currencies:version'
+
+
+class _Snapshot(NamedTuple):
+    version: str
+    checked_at: float
+    by_pk: Dict
+    by_code: Dict[str, CurrencyCBR]
+    by_num_code: Dict[int, CurrencyCBR]
+
+
+_lock = threading.Lock()
+_snapshot: Optional[_Snapshot] = None
+
+
+def _shared_version() -> str:
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(_VERSION_KEY, version, None):
+            version = cache.get(_VERSION_KEY) or version
+    return version
+
+
+def _is_fresh(snapshot: Optional[_Snapshot]) -> bool:
+    """Справочник загружен и не устарел; при истечении интервала сверяет версию"""
+    global _snapshot
+    if snapshot is None:
+        return False
+    interval = getattr(settings, 'ACCOUNTING_CURRENCY_CHECK_INTERVAL', 60)
+    now = time.monotonic()
+    if now - snapshot.checked_at < interval:
+        return True
+    if _shared_version() != snapshot.version:
+        return False
+    _snapshot = snapshot._replace(checked_at=now)
+    return True
+
+
+def load() -> _Snapshot:
+    """Загружает справочник из БД, если он устарел"""
+    global _snapshot
+    with _lock:
+        if _is_fresh(_snapshot):
+            return _snapshot
+        version = _shared_version()
+        currencies = list(CurrencyCBR.objects.order_by('char_code'))
+        _snapshot = _Snapshot(
+            version=version,
+            checked_at=time.monotonic(),
+            by_pk={currency.pk: currency for currency in currencies},
+            by_code={currency.char_code: currency for currency in currencies},
+            by_num_code={currency.num_code: currency for currency in currencies},
+        )
+        return _snapshot
+
+
+def _current() -> _Snapshot:
+    snapshot = _snapshot
+    return snapshot if _is_fresh(snapshot) else load()
+
+
+def invalidate() -> None:
+    """Сбрасывает справочник во всех процессах"""
+    global _snapshot
+    cache.set(_VERSION_KEY, uuid.uuid4().hex, None)
+    _snapshot = None
+
+
+def all_currencies() -> List[CurrencyCBR]:
+    """Все валюты по char_code"""
+    return list(_current().by_code.values())
+
+
+def by_pk(pk) -> CurrencyCBR:
+    """
+    Raises:
+        CurrencyCBR.DoesNotExist
+    """
+    snapshot = _current()
+    try:
+        return snapshot.by_pk[pk if not isinstance(pk, str) else uuid.UUID(pk)]
+    except (KeyError, ValueError):
+        raise CurrencyCBR.DoesNotExist(f'Валюта {pk} не найдена')
+
+
+def by_code(char_code: str) -> CurrencyCBR:
+    """
+    Валюта по буквенному коду, как CurrencyCBR.objects.get(char_code=...)
+
+    Raises:
+        CurrencyCBR.DoesNotExist
+    """
+    return _lookup_code(_current(), char_code)
+
+
+async def aby_code(char_code: str) -> CurrencyCBR:
+    """by_code() для асинхронного кода: в БД идет только загрузка справочника"""
+    snapshot = _snapshot
+    if not _is_fresh(snapshot):
+        snapshot = await sync_to_async(load)()
+    return _lookup_code(snapshot, char_code)
+
+
+def _lookup_code(snapshot: _Snapshot, char_code: str) -> CurrencyCBR:
+    try:
+        return snapshot.by_code[char_code]
+    except KeyError:
+        raise CurrencyCBR.DoesNotExist(f'Валюта {char_code} не найдена')
+
+
+def default() -> CurrencyCBR:
+    """Валюта кошелька по умолчанию (рубль), создается при первом обращении"""
+    currency = _current().by_num_code.get(DEFAULT_NUM_CODE)
+    if currency is None:
+        CurrencyCBR.objects.get_or_create(
+            num_code=DEFAULT_NUM_CODE, defaults={'char_code': 'RUB', 'name': 'Российский рубль'})
+        invalidate()
+        currency = _current().by_num_code[DEFAULT_NUM_CODE]
+    return currency
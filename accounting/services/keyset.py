@@ -0,0 +1,152 @@
+"""
+Keyset (cursor) пагинация списков по паре (поле сортировки, первичный ключ).
+
+Страница выбирается условием "строго после позиции курсора" в порядке
+(field, pk) и LIMIT page_size + 1, без COUNT и OFFSET. Поэтому глубокая
+страница стоит столько же, сколько первая, а вставка новых строк не
+сдвигает страницы. Первичный ключ делает порядок полным при одинаковых
+значениях поля.
+
+Курсор - base64 от JSON [сортировка, значение поля, pk, направление],
+значение сериализуется полем модели (value_to_string / to_python). Курсор
+другой сортировки считается некорректным.
+"""
+import base64
+import binascii
+import json
+from typing import NamedTuple, Optional
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+class InvalidCursor(ValueError):
+    """Курсор не удалось разобрать."""
+
+
+class Position(NamedTuple):
+    value: object
+    pk: object
+    direction: str
+
+
+class KeysetPage:
+    """Страница keyset пагинации"""
+
+    def __init__(self, items: list, next_cursor: Optional[str],
+                 previous_cursor: Optional[str]):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self) -> bool:
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def encode_cursor(model, ordering: str, obj, direction: str) -> str:
+    field = model._meta.get_field(ordering.lstrip('-'))
+    payload = [ordering, field.value_to_string(obj),
+               model._meta.pk.value_to_string(obj), direction]
+    return base64.urlsafe_b64encode(
+        json.dumps(payload, separators=(',', ':')).encode()).decode()
+
+
+def decode_cursor(model, ordering: str, cursor: str) -> Position:
+    """
+    Raises:
+        InvalidCursor
+    """
+    try:
+        cursor_ordering, value, pk, direction = json.loads(
+            base64.urlsafe_b64decode(cursor.encode()))
+        if cursor_ordering != ordering or direction not in (FORWARD, BACKWARD):
+            raise InvalidCursor(cursor)
+        return Position(
+            value=model._meta.get_field(ordering.lstrip('-')).to_python(value),
+            pk=model._meta.pk.to_python(pk),
+            direction=direction,
+        )
+    except (binascii.Error, UnicodeError, TypeError, ValueError, ValidationError):
+        raise InvalidCursor(cursor)
+
+
+def paginate(queryset, cursor: Optional[str] = None, page_size: int = 20,
+             ordering: str = '-created_at') -> KeysetPage:
+    """
+    Страница queryset после (или перед) позицией курсора
+
+    Args:
+        queryset: Отфильтрованный QuerySet, его сортировка заменяется
+        cursor: Курсор из KeysetPage.next_cursor/previous_cursor или None
+            для первой страницы
+        page_size: Размер страницы
+        ordering: Поле сортировки, '-' - по убыванию
+
+    Raises:
+        InvalidCursor
+    """
+    model = queryset.model
+    field_name = ordering.lstrip('-')
+    descending = ordering.startswith('-')
+    pk_name = model._meta.pk.name
+
+    position = decode_cursor(model, ordering, cursor) if cursor else None
+    backward = position is not None and position.direction == BACKWARD
+    # Назад по убыванию - это вперед по возрастанию, и наоборот
+    scan_descending = descending != backward
+
+    if position is not None:
+        op = 'lt' if scan_descending else 'gt'
+        # Нестрогая граница по полю сортировки отдельно от OR: без нее
+        # индекс (user, created_at) используется только по user_id
+        bound = 'lte' if op == 'lt' else 'gte'
+        queryset = queryset.filter(
+            Q(**{f'{field_name}__{bound}': position.value}),
+            Q(**{f'{field_name}__{op}': position.value}) |
+            Q(**{field_name: position.value, f'{pk_name}__{op}': position.pk})
+        )
+
+    prefix = '-' if scan_descending else ''
+    rows = list(queryset.order_by(
+        f'{prefix}{field_name}', f'{prefix}{pk_name}')[:page_size + 1])
+    has_more = len(rows) > page_size
+    items = rows[:page_size]
+    if backward:
+        items.reverse()
+
+    if not items:
+        return KeysetPage([], None, None)
+
+    if backward:
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, position is not None
+
+    return KeysetPage(
+        items,
+        next_cursor=encode_cursor(
+            model, ordering, items[-1], FORWARD) if has_next else None,
+        previous_cursor=encode_cursor(
+            model, ordering, items[0], BACKWARD) if has_previous else None,
+    )
@@ -0,0 +1,77 @@
+"""
+Единая точка изменения транзакций.
+
+Каждое создание, изменение и удаление транзакции должно проходить через
+эти функции внутри transaction.atomic(): они сдвигают баланс кошелька
+(balance) и дневные агрегаты (rollups) на дельту изменения.
+Используются ботом, mini-app views и DRF TransactionViewSet.
+"""
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.db import transaction
+
+from accounting.models.transaction import Transaction
+
+from . import balance, rollups
+
+
+class TransactionSnapshot(NamedTuple):
+    """Значения транзакции до ее изменения."""
+    user_id: object
+    wallet_id: object
+    category_id: object
+    t_type: str
+    amount: Decimal
+    date: object
+
+
+def snapshot(transaction_obj: Transaction) -> TransactionSnapshot:
+    """Запоминает значения транзакции перед редактированием."""
+    return TransactionSnapshot(
+        user_id=transaction_obj.user_id,
+        wallet_id=transaction_obj.wallet_id,
+        category_id=transaction_obj.category_id,
+        t_type=transaction_obj.t_type,
+        amount=transaction_obj.amount,
+        date=transaction_obj.date,
+    )
+
+
+def _apply(item, sign: int) -> None:
+    """Применяет транзакцию (или ее снимок) к балансу и агрегатам со знаком sign."""
+    amount = balance.to_amount(item.amount)
+    balance.apply_balance_delta(
+        item.wallet_id, sign * balance.signed_amount(item.t_type, amount))
+    rollups.apply_rollup_delta(
+        rollups.aggregate_key(item.user_id, item.wallet_id, item.category_id,
+                              item.t_type, item.date),
+        sign * amount,
+        sign
+    )
+
+
+def record_created(transaction_obj: Transaction) -> None:
+    """Учитывает новую транзакцию. Вызывать внутри transaction.atomic()."""
+    _apply(transaction_obj, 1)
+
+
+def record_updated(before: TransactionSnapshot, transaction_obj: Transaction) -> None:
+    """Переносит изменение транзакции в балансы и агрегаты."""
+    if before == snapshot(transaction_obj):
+        return
+    _apply(before, -1)
+    _apply(transaction_obj, 1)
+
+
+def record_deleted(transaction_obj: Transaction) -> None:
+    """Убирает удаляемую транзакцию из баланса и агрегатов."""
+    _apply(transaction_obj, -1)
+
+
+def create_transaction(**fields) -> Transaction:
+    """Создает транзакцию и учитывает ее в одной транзакции БД."""
+    with transaction.atomic():
+        transaction_obj = Transaction.objects.create(**fields)
+        record_created(transaction_obj)
+    return transaction_obj
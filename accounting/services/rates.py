@@ -0,0 +1,195 @@
+"""
+Курсы валют на дату и пересчет сумм между валютами.
+
+История курсов ЦБ (CurrencyRate) загружается в память процесса матрицей
+RateMatrix: строки - даты, столбцы - валюты, значения - рублей за единицу
+валюты. Пропуски (выходные, праздники) заполнены последним известным
+курсом, до первого курса валюты стоит NaN. У валют без истории столбец
+заполнен текущим курсом из CurrencyCBR, у рубля - единицами; они
+действуют на любую дату, в том числе раньше первой строки матрицы.
+
+RateMatrix.convert() переводит массивы (сумма, валюта, дата) целиком
+средствами NumPy: индекс даты - searchsorted, индекс валюты - через
+np.unique по кодам, поэтому тысячи сумм пересчитываются за один вызов
+без цикла на Python. Суммы возвращаются как float64 для отчетов и
+итогов; неизвестный курс дает NaN.
+
+Матрица кэшируется в процессе под версионным ключом общего кэша.
+invalidate() меняет версию (сигналы CurrencyRate/CurrencyCBR и
+create_currency после массовой загрузки), и каждый процесс при
+следующем обращении строит матрицу заново.
+"""
+import threading
+import uuid
+from datetime import date as date_type
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from django.core.cache import cache
+from django.utils import timezone
+
+from accounting.models.currencyCBR import CurrencyCBR
+from accounting.models.currencyRate import CurrencyRate
+
+RUB = 'RUB'
+
+_VERSION_KEY = 'currency_rates:version'
+
+
+class RateMatrix:
+    """Курсы валют (рублей за единицу) по датам"""
+
+    def __init__(self, dates: np.ndarray, codes: Sequence[str], rates: np.ndarray,
+                 dated: Optional[np.ndarray] = None):
+        self.dates = dates
+        self.codes = tuple(codes)
+        self.columns: Dict[str, int] = {code: i for i, code in enumerate(self.codes)}
+        self.rates = rates
+        # Столбцы с историей; у остальных курс не зависит от даты
+        self.dated = np.ones(len(self.codes), dtype=bool) if dated is None else dated
+
+    @classmethod
+    def from_rows(cls, rows, current: Optional[Dict[str, float]] = None) -> 'RateMatrix':
+        """
+        Строит матрицу из строк (char_code, date, nominal, value)
+
+        Args:
+            rows: История курсов
+            current: Текущие курсы валют без истории, рублей за единицу
+        """
+        rows = list(rows)
+        current = current or {}
+        codes = sorted({row[0] for row in rows} | set(current) | {RUB})
+        columns = {code: i for i, code in enumerate(codes)}
+        dates = np.unique(np.array([row[1] for row in rows], dtype='datetime64[D]'))
+        if not len(dates):
+            dates = np.array([timezone.localdate()], dtype='datetime64[D]')
+
+        rates = np.full((len(dates), len(codes)), np.nan)
+        if rows:
+            row_idx = np.searchsorted(dates, np.array([row[1] for row in rows], dtype='datetime64[D]'))
+            col_idx = np.array([columns[row[0]] for row in rows])
+            rates[row_idx, col_idx] = np.array(
+                [float(row[3]) / row[2] for row in rows], dtype=np.float64)
+
+        # Последний известный курс на каждую дату
+        known = np.where(np.isnan(rates), 0, np.arange(len(dates))[:, None])
+        np.maximum.accumulate(known, axis=0, out=known)
+        rates = rates[known, np.arange(len(codes))]
+
+        dated = ~np.isnan(rates).all(axis=0)
+        dated[columns[RUB]] = False
+        for code, rate in current.items():
+            if not dated[columns[code]]:
+                rates[:, columns[code]] = rate
+        rates[:, columns[RUB]] = 1.0
+        return cls(dates, codes, rates, dated)
+
+    def _columns(self, currencies) -> np.ndarray:
+        """Индексы столбцов для массива кодов валют, -1 для неизвестных"""
+        codes, inverse = np.unique(np.asarray(currencies, dtype=str), return_inverse=True)
+        lookup = np.array([self.columns.get(code, -1) for code in codes], dtype=np.intp)
+        return lookup[inverse.reshape(-1)]
+
+    def _rows(self, dates, size: int) -> np.ndarray:
+        """Индексы строк на даты (последний курс не позже даты), -1 до начала истории"""
+        if dates is None:
+            return np.full(size, len(self.dates) - 1, dtype=np.intp)
+        values = np.asarray(dates, dtype='datetime64[D]').reshape(-1)
+        return np.searchsorted(self.dates, values, side='right') - 1
+
+    def rates_for(self, currencies, dates=None) -> np.ndarray:
+        """
+        Рублей за единицу валюты для каждой пары (валюта, дата)
+
+        dates=None - последний известный курс. NaN, если курса нет.
+        """
+        cols = self._columns(currencies)
+        rows = self._rows(dates, len(cols))
+        rows = np.broadcast_to(rows, cols.shape)
+        cols_or_0 = np.where(cols < 0, 0, cols)
+        # До начала истории NaN только у валют с историей: рубль и валюты
+        # с одним текущим курсом берутся из первой строки
+        missing = (cols < 0) | ((rows < 0) & self.dated[cols_or_0])
+        result = self.rates[np.where(rows < 0, 0, rows), cols_or_0]
+        result[missing] = np.nan
+        return result
+
+    def convert(self, amounts, currencies, dates=None, to: str = RUB) -> np.ndarray:
+        """
+        Переводит суммы в валюту to по курсу на дату каждой суммы
+
+        Args:
+            amounts: Суммы (Decimal, float)
+            currencies: Буквенные коды валют сумм
+            dates: Даты сумм или None - по последнему курсу
+            to: Код валюты результата
+
+        Returns:
+            Массив float64 сумм в валюте to, NaN для сумм без курса
+        """
+        amounts = np.asarray(amounts, dtype=np.float64).reshape(-1)
+        source = self.rates_for(currencies, dates)
+        target = self.rates_for(np.full(len(amounts), to), dates)
+        return amounts * source / target
+
+    def total(self, amounts, currencies, dates=None, to: str = RUB) -> Tuple[float, Tuple[str, ...]]:
+        """Сумма в валюте to и коды валют, пропущенных из-за отсутствия курса"""
+        converted = self.convert(amounts, currencies, dates, to)
+        missing = np.isnan(converted)
+        skipped = tuple(sorted({str(code) for code in np.asarray(currencies, dtype=str)[missing]}))
+        return float(converted[~missing].sum()), skipped
+
+
+_lock = threading.Lock()
+_cached: Tuple[Optional[str], Optional[RateMatrix]] = (None, None)
+
+
+def get_version() -> str:
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(_VERSION_KEY, version, None):
+            version = cache.get(_VERSION_KEY) or version
+    return version
+
+
+def invalidate() -> None:
+    """Сбрасывает матрицы курсов во всех процессах"""
+    cache.set(_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def load_matrix() -> RateMatrix:
+    """Матрица по данным БД, без кэша"""
+    rows = CurrencyRate.objects.order_by().values_list(
+        'currency__char_code', 'date', 'nominal', 'value')
+    current = {
+        code: float(value) / nominal
+        for code, nominal, value in CurrencyCBR.objects.filter(
+            value__isnull=False).values_list('char_code', 'nominal', 'value')
+    }
+    return RateMatrix.from_rows(rows.iterator(chunk_size=10000), current)
+
+
+def get_matrix() -> RateMatrix:
+    """Матрица курсов из кэша процесса, перестраивается после invalidate()"""
+    global _cached
+    version = get_version()
+    cached_version, matrix = _cached
+    if cached_version == version:
+        return matrix
+    with _lock:
+        if _cached[0] != version:
+            _cached = (version, load_matrix())
+        return _cached[1]
+
+
+def convert(amounts, currencies, dates=None, to: str = RUB) -> np.ndarray:
+    """RateMatrix.convert() по кэшированной матрице"""
+    return get_matrix().convert(amounts, currencies, dates, to)
+
+
+def rate_on(currency: str, on: Optional[date_type] = None) -> Optional[float]:
+    """Рублей за единицу валюты на дату (или последний курс), None если курса нет"""
+    rate = get_matrix().rates_for([currency], None if on is None else [on])[0]
+    return None if np.isnan(rate) else float(rate)
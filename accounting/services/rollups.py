@@ -0,0 +1,214 @@
+"""
+Материализованные дневные агрегаты транзакций.
+
+Таблица TransactionDailyAggregate хранит сумму и количество транзакций
+в разрезе (пользователь, кошелек, категория, тип, день) и поддерживается
+инкрементально при создании, изменении и удалении транзакций (см. ledger).
+Статистика и дашборды читают O(дней) строк агрегатов вместо O(транзакций).
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Sum
+
+from accounting.models.transaction import Transaction
+from accounting.models.transactionDailyAggregate import \
+    TransactionDailyAggregate
+
+logger = logging.getLogger(__name__)
+
+_date_field = models.DateField()
+
+
+def aggregate_key(user_id, wallet_id, category_id, t_type: str, day) -> dict:
+    """Ключ строки агрегата; day может прийти строкой из формы."""
+    return {
+        'user_id': user_id,
+        'wallet_id': wallet_id,
+        'category_id': category_id,
+        't_type': t_type,
+        'day': _date_field.to_python(day),
+    }
+
+
+def apply_rollup_delta(key: dict, amount: Decimal, count: int) -> None:
+    """
+    Сдвигает сумму и количество в строке агрегата, создавая ее при необходимости
+
+    Args:
+        key: Ключ строки (см. aggregate_key)
+        amount: Изменение суммы
+        count: Изменение количества транзакций
+    """
+    rows = TransactionDailyAggregate.objects.filter(**key)
+    updated = rows.update(total=F('total') + amount, count=F('count') + count)
+
+    if not updated:
+        try:
+            # Savepoint, чтобы гонка на вставке не ломала внешнюю транзакцию
+            with transaction.atomic():
+                TransactionDailyAggregate.objects.create(
+                    total=amount, count=count, **key)
+        except IntegrityError:
+            rows.update(total=F('total') + amount, count=F('count') + count)
+
+    if count < 0:
+        # Пустые строки не храним, чтобы таблица оставалась компактной
+        rows.filter(count__lte=0).delete()
+
+
+def apply_rollup_deltas(user_id, deltas: dict) -> None:
+    """
+    Сдвигает много строк агрегатов пользователя за несколько запросов
+
+    Для пакетной загрузки транзакций: существующие строки читаются одним
+    SELECT ... FOR UPDATE, удаляются и вставляются заново вместе с
+    недостающими одним bulk_create - это дешевле bulk_update, который
+    строит CASE на каждую строку. Гонку с параллельной вставкой того же
+    ключа ловят уникальные ограничения модели (включая строки без
+    категории): при IntegrityError пачка применяется построчно через
+    apply_rollup_delta. Если по ключу уже лежит несколько строк, они
+    сливаются в одну.
+    Вызывать внутри transaction.atomic().
+
+    Args:
+        user_id: Пользователь
+        deltas: {(wallet_id, category_id, t_type, day): (amount, count)}
+    """
+    if not deltas:
+        return
+    wallets = {key[0] for key in deltas}
+    days = {key[3] for key in deltas}
+    locked = []
+    current = defaultdict(lambda: [Decimal('0'), 0])
+    for row in TransactionDailyAggregate.objects.select_for_update().filter(
+            user_id=user_id, wallet_id__in=wallets, day__in=days):
+        key = (row.wallet_id, row.category_id, row.t_type, row.day)
+        if key in deltas:
+            locked.append(row.pk)
+            current[key][0] += row.total
+            current[key][1] += row.count
+
+    rows = []
+    for key, (amount, count) in deltas.items():
+        if key in current:
+            amount += current[key][0]
+            count += current[key][1]
+        if count <= 0:
+            continue
+        wallet_id, category_id, t_type, day = key
+        rows.append(TransactionDailyAggregate(
+            user_id=user_id, wallet_id=wallet_id, category_id=category_id,
+            t_type=t_type, day=day, total=amount, count=count))
+
+    try:
+        with transaction.atomic():
+            TransactionDailyAggregate.objects.filter(pk__in=locked).delete()
+            TransactionDailyAggregate.objects.bulk_create(rows)
+    except IntegrityError:
+        for key, (amount, count) in deltas.items():
+            apply_rollup_delta(aggregate_key(user_id, *key), amount, count)
+
+
+def merge_duplicate_rollups(users=None) -> int:
+    """
+    Сливает строки агрегатов с одинаковым ключом в одну
+
+    Без ограничения на строки с category IS NULL параллельные первые
+    записи создавали дубли, и каждый следующий сдвиг попадал в оба.
+    Суммы дублей складываются в первую строку, остальные удаляются.
+    Нужно выполнить до применения миграции с этим ограничением.
+
+    Args:
+        users: QuerySet пользователей (по умолчанию все)
+
+    Returns:
+        Количество удаленных лишних строк
+    """
+    aggregates = TransactionDailyAggregate.objects.all()
+    if users is not None:
+        aggregates = aggregates.filter(user__in=users)
+
+    keys = ('user_id', 'wallet_id', 'category_id', 't_type', 'day')
+    duplicated = (
+        aggregates
+        .order_by()
+        .values(*keys)
+        .annotate(rows=Count('uuid'))
+        .filter(rows__gt=1)
+    )
+
+    removed = 0
+    with transaction.atomic():
+        for group in duplicated:
+            rows = list(aggregates.select_for_update().filter(
+                **{key: group[key] for key in keys}).order_by('uuid'))
+            kept, extra = rows[0], rows[1:]
+            kept.total = sum((row.total for row in rows), Decimal('0'))
+            kept.count = sum(row.count for row in rows)
+            kept.save(update_fields=['total', 'count'])
+            TransactionDailyAggregate.objects.filter(
+                pk__in=[row.pk for row in extra]).delete()
+            removed += len(extra)
+
+    if removed:
+        logger.info(f"Merged {removed} duplicate transaction aggregate rows")
+    return removed
+
+
+def rebuild_rollups(users=None, batch_size: int = 5000) -> int:
+    """
+    Полностью пересобирает агрегаты по таблице транзакций
+
+    Строки группируются по ключу заново, так что дубли ключей при этом
+    тоже схлопываются.
+
+    Args:
+        users: QuerySet пользователей (по умолчанию все)
+        batch_size: Размер пачки для bulk_create
+
+    Returns:
+        Количество созданных строк агрегатов
+    """
+    transactions = Transaction.objects.all()
+    aggregates = TransactionDailyAggregate.objects.all()
+    if users is not None:
+        transactions = transactions.filter(user__in=users)
+        aggregates = aggregates.filter(user__in=users)
+
+    grouped = (
+        transactions
+        .order_by()
+        .values('user_id', 'wallet_id', 'category_id', 't_type', 'date')
+        .annotate(total=Sum('amount'), count=Count('uuid'))
+    )
+
+    created = 0
+    with transaction.atomic():
+        aggregates.delete()
+
+        batch = []
+        for row in grouped.iterator(chunk_size=batch_size):
+            batch.append(TransactionDailyAggregate(
+                user_id=row['user_id'],
+                wallet_id=row['wallet_id'],
+                category_id=row['category_id'],
+                t_type=row['t_type'],
+                day=row['date'],
+                total=row['total'],
+                count=row['count'],
+            ))
+            if len(batch) >= batch_size:
+                TransactionDailyAggregate.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+
+        if batch:
+            TransactionDailyAggregate.objects.bulk_create(batch)
+            created += len(batch)
+
+    logger.info(f"Rebuilt {created} transaction aggregate rows")
+    return created
+
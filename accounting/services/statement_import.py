@@ -0,0 +1,461 @@
+"""
+Массовый импорт транзакций из банковских выписок CSV и OFX.
+
+Файл читается потоком, кусками по CHUNK_SIZE байт: парсеры выдают строки
+StatementRow по одной, и в памяти держится только текущая пачка.
+
+    CSV - разделитель и кодировка (UTF-8 или windows-1251) определяются по
+          началу файла, колонки - по заголовку (HEADER_ALIASES: дата,
+          сумма или приход/расход, описание, категория, кошелек, id).
+    OFX - и SGML (1.x), и XML (2.x): теги STMTTRN разбираются одним
+          регулярным выражением, закрывающие теги полей не нужны.
+
+Строка попадает в кошелек по колонке кошелька (название или uuid), иначе
+в кошелек по умолчанию, а в категорию - по названию без учета регистра.
+
+Дубли отсекаются по import_hash - sha256 от кошелька, даты, типа, суммы,
+id операции или описания и номера повторения одинаковой строки в файле.
+Повторный импорт той же выписки ничего не добавляет, а две одинаковые
+покупки в один день остаются двумя транзакциями.
+
+Каждая пачка (batch_size строк) - одна транзакция БД: один запрос на
+поиск дублей, bulk_create, по одному сдвигу баланса на кошелек
+(balance.apply_balance_delta) и пакетное обновление дневных агрегатов
+(rollups.apply_rollup_deltas).
+"""
+import codecs
+import csv
+import hashlib
+import re
+import uuid
+from collections import Counter, defaultdict
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from itertools import chain
+from typing import IO, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from accounting.models.transaction import Transaction
+from accounting.models.wallet import Wallet
+
+from . import balance, category_tree, rollups
+
+FORMATS = ('csv', 'ofx')
+
+BATCH_SIZE = 5000
+CHUNK_SIZE = 64 * 1024
+MAX_ERRORS = 20
+# Transaction.amount: max_digits=14, decimal_places=2
+MAX_AMOUNT = Decimal(10) ** 12
+
+# Нормализованный заголовок колонки -> поле StatementRow
+HEADER_ALIASES = {
+    'date': ('date', 'дата', 'дата операции', 'дата платежа', 'transaction date'),
+    'amount': ('amount', 'сумма', 'сумма операции', 'сумма платежа'),
+    'income': ('income', 'приход', 'поступление', 'зачисление', 'доход'),
+    'expense': ('expense', 'расход', 'списание'),
+    'type': ('type', 'тип', 't_type'),
+    'description': ('description', 'описание', 'назначение платежа', 'memo',
+                    'payee', 'комментарий'),
+    'category': ('category', 'категория'),
+    'wallet': ('wallet', 'кошелек', 'кошелёк', 'счет', 'счёт', 'account'),
+    'external_id': ('id', 'fitid', 'номер операции', 'id операции'),
+}
+_COLUMNS = {alias: field for field, aliases in HEADER_ALIASES.items() for alias in aliases}
+
+INCOME_TYPES = {'in', 'income', 'доход', 'приход', 'поступление', 'credit'}
+EXPENSE_TYPES = {'ex', 'expense', 'расход', 'списание', 'debit'}
+
+DATE_FORMATS = ('%Y-%m-%d', '%d.%m.%Y', '%d.%m.%y', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S',
+                '%d.%m.%Y %H:%M:%S', '%d.%m.%Y %H:%M', '%Y-%m-%dT%H:%M:%S')
+
+_OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<\r\n]*)')
+_OFX_CHARSET = re.compile(rb'CHARSET:\s*(\d+)|encoding="([^"]+)"', re.IGNORECASE)
+
+
+class StatementFormatError(ValueError):
+    """Файл не удалось прочитать как выписку"""
+
+
+class StatementRow(NamedTuple):
+    line: int
+    date: date
+    amount: Decimal  # со знаком: отрицательная сумма - расход
+    description: str
+    category: str
+    wallet: str
+    external_id: str
+
+
+class ImportResult(NamedTuple):
+    rows: int
+    created: int
+    duplicates: int
+    skipped: int
+    errors: List[str]
+
+    def as_dict(self) -> dict:
+        return self._asdict()
+
+
+class _Errors:
+    """Ошибки строк: считаются все, сохраняются первые MAX_ERRORS"""
+
+    def __init__(self):
+        self.count = 0
+        self.messages: List[str] = []
+
+    def add(self, line: int, message: str) -> None:
+        self.count += 1
+        if len(self.messages) < MAX_ERRORS:
+            self.messages.append(f'строка {line}: {message}')
+
+
+# Разбор значений
+
+def parse_amount(value: str) -> Decimal:
+    """'-1 234,56', '1234.56', '+100' -> Decimal"""
+    cleaned = value.replace('\xa0', '').replace(' ', '').replace(',', '.')
+    if cleaned.count('.') > 1:
+        # Точка как разделитель тысяч: 1.234.567.89
+        head, _, tail = cleaned.rpartition('.')
+        cleaned = head.replace('.', '') + '.' + tail
+    try:
+        amount = Decimal(cleaned)
+    except InvalidOperation:
+        raise ValueError(f'некорректная сумма {value!r}')
+    # NaN/Infinity и суммы, не влезающие в Transaction.amount, - ошибка строки,
+    # а не падение всего импорта на сравнении или в bulk_create
+    if not amount.is_finite() or abs(amount) >= MAX_AMOUNT:
+        raise ValueError(f'некорректная сумма {value!r}')
+    return balance.to_amount(amount)
+
+
+class _DateParser:
+    """Подбирает формат даты по первой строке и держит его для остальных"""
+
+    def __init__(self):
+        self.last = DATE_FORMATS[0]
+
+    def __call__(self, value: str) -> date:
+        value = value.strip()
+        for fmt in (self.last, *DATE_FORMATS):
+            try:
+                parsed = datetime.strptime(value, fmt).date()
+            except ValueError:
+                continue
+            self.last = fmt
+            return parsed
+        raise ValueError(f'некорректная дата {value!r}')
+
+
+def _guess_encoding(head: bytes) -> str:
+    try:
+        head.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # Кусок мог оборваться посреди символа
+        if e.start < len(head) - 3:
+            return 'cp1251'
+    return 'utf-8-sig'
+
+
+def _iter_lines(chunks: Iterable[bytes], encoding: str) -> Iterator[str]:
+    """Строки текста из потока байтовых кусков"""
+    tail = ''
+    for text in codecs.iterdecode(chunks, encoding, errors='replace'):
+        lines = (tail + text).splitlines(keepends=True)
+        tail = lines.pop() if lines and not lines[-1].endswith(('\n', '\r')) else ''
+        yield from lines
+    if tail:
+        yield tail
+
+
+def read_chunks(stream: IO[bytes]) -> Iterator[bytes]:
+    return iter(lambda: stream.read(CHUNK_SIZE), b'')
+
+
+# CSV
+
+def iter_csv(chunks: Iterator[bytes], errors: _Errors,
+             encoding: Optional[str] = None) -> Iterator[StatementRow]:
+    head = next(chunks, b'')
+    encoding = encoding or _guess_encoding(head)
+    sample = head[:8192].decode(encoding, errors='ignore')
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(_iter_lines(chain([head], chunks), encoding), dialect)
+
+    header = next(reader, None)
+    if header is None:
+        raise StatementFormatError('Пустой CSV')
+    columns = {}
+    for index, title in enumerate(header):
+        field = _COLUMNS.get(title.strip().lower())
+        if field and field not in columns:
+            columns[field] = index
+    if 'date' not in columns or not ({'amount', 'income', 'expense'} & set(columns)):
+        raise StatementFormatError(
+            'В заголовке CSV нужны колонки даты и суммы (или прихода/расхода), '
+            f'найдены: {", ".join(header)}')
+
+    parse_date = _DateParser()
+
+    def cell(values, field):
+        index = columns.get(field)
+        return values[index].strip() if index is not None and index < len(values) else ''
+
+    for values in reader:
+        line = reader.line_num
+        if not any(value.strip() for value in values):
+            continue
+        try:
+            row = StatementRow(
+                line=line,
+                date=parse_date(cell(values, 'date')),
+                amount=_csv_amount(values, cell),
+                description=cell(values, 'description'),
+                category=cell(values, 'category'),
+                wallet=cell(values, 'wallet'),
+                external_id=cell(values, 'external_id'),
+            )
+        except ValueError as e:
+            errors.add(line, str(e))
+            continue
+        yield row
+
+
+def _csv_amount(values, cell) -> Decimal:
+    income, expense = cell(values, 'income'), cell(values, 'expense')
+    if income or expense:
+        return (parse_amount(income) if income else 0) - abs(
+            parse_amount(expense) if expense else 0)
+    amount = parse_amount(cell(values, 'amount'))
+    t_type = cell(values, 'type').lower()
+    if t_type in EXPENSE_TYPES:
+        return -abs(amount)
+    if t_type in INCOME_TYPES:
+        return abs(amount)
+    if t_type:
+        raise ValueError(f'неизвестный тип {t_type!r}')
+    return amount
+
+
+# OFX
+
+def iter_ofx(chunks: Iterator[bytes], errors: _Errors,
+             encoding: Optional[str] = None) -> Iterator[StatementRow]:
+    head = next(chunks, b'')
+    if not encoding:
+        declared = _OFX_CHARSET.search(head[:4096])
+        if declared and declared.group(1):
+            encoding = f'cp{declared.group(1).decode()}'
+        elif declared:
+            encoding = declared.group(2).decode()
+        else:
+            encoding = _guess_encoding(head)
+    if b'<OFX>' not in head.upper():
+        raise StatementFormatError('Нет элемента <OFX>')
+
+    fields: Optional[Dict[str, str]] = None
+    line = 0
+    for line, text in enumerate(_iter_lines(chain([head], chunks), encoding), 1):
+        for closing, tag, value in _OFX_TAG.findall(text):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if fields is not None:
+                    yield from _ofx_row(fields, errors)
+                fields = None if closing else {'line': line}
+            elif fields is not None and not closing and value.strip():
+                fields[tag] = value.strip()
+    if fields is not None:
+        yield from _ofx_row(fields, errors)
+
+
+def _ofx_row(fields: dict, errors: _Errors) -> Iterator[StatementRow]:
+    line = fields['line']
+    try:
+        posted = fields.get('DTPOSTED', '')
+        # YYYYMMDD[HHMMSS[.XXX]][[-3:MSK]]
+        day = datetime.strptime(posted[:8], '%Y%m%d').date()
+        amount = parse_amount(fields.get('TRNAMT', ''))
+    except ValueError as e:
+        errors.add(line, str(e))
+        return
+    description = ' '.join(
+        value for value in (fields.get('NAME'), fields.get('MEMO')) if value)
+    yield StatementRow(
+        line=line, date=day, amount=amount, description=description,
+        category='', wallet='', external_id=fields.get('FITID', ''))
+
+
+# Импорт
+
+def detect_format(filename: str, head: bytes) -> str:
+    """csv или ofx по расширению, иначе по содержимому"""
+    name = (filename or '').lower()
+    if name.endswith(('.ofx', '.qfx')):
+        return 'ofx'
+    if name.endswith(('.csv', '.txt')):
+        return 'csv'
+    return 'ofx' if b'<OFX>' in head[:4096].upper() or b'OFXHEADER' in head[:4096] else 'csv'
+
+
+class _Mapper:
+    """Кошельки и категории пользователя по названиям из выписки"""
+
+    def __init__(self, user, default_wallet=None):
+        wallets = list(Wallet.objects.filter(user=user).values_list('uuid', 'title'))
+        self.wallets = {title.strip().lower(): pk for pk, title in wallets}
+        self.wallets.update((str(pk), pk) for pk, _ in wallets)
+        self.default_wallet = None
+        if default_wallet is not None:
+            self.default_wallet = self.wallets.get(str(getattr(default_wallet, 'pk', default_wallet)))
+            if self.default_wallet is None:
+                raise Wallet.DoesNotExist('Кошелек не найден')
+        elif len(wallets) == 1:
+            self.default_wallet = wallets[0][0]
+
+        self.categories = {}
+        for entry in category_tree.get_entries(user.pk):
+            # В кэше uuid строкой, а ключи агрегатов сравниваются с UUID из БД
+            self.categories.setdefault(entry.title.strip().lower(), uuid.UUID(entry.uuid))
+
+    def wallet(self, row: StatementRow):
+        if row.wallet:
+            wallet_id = self.wallets.get(row.wallet.lower())
+            if wallet_id is None:
+                raise ValueError(f'кошелек {row.wallet!r} не найден')
+            return wallet_id
+        if self.default_wallet is None:
+            raise ValueError('не указан кошелек')
+        return self.default_wallet
+
+    def category(self, row: StatementRow):
+        return self.categories.get(row.category.lower()) if row.category else None
+
+
+def import_rows(user, rows: Iterable[StatementRow], wallet=None,
+                batch_size: int = BATCH_SIZE, errors: Optional[_Errors] = None) -> ImportResult:
+    """
+    Загружает строки выписки в транзакции пользователя
+
+    Args:
+        user: Владелец транзакций
+        rows: Строки выписки
+        wallet: Кошелек (экземпляр или uuid) для строк без колонки кошелька;
+            если не задан и кошелек у пользователя один - он
+        batch_size: Строк в пачке
+        errors: Накопитель ошибок разбора (его же заполняют парсеры)
+
+    Raises:
+        Wallet.DoesNotExist: wallet не принадлежит пользователю
+    """
+    errors = errors or _Errors()
+    mapper = _Mapper(user, wallet)
+    occurrences = Counter()
+    total = created = duplicates = rejected = 0
+
+    batch = []
+    for row in rows:
+        total += 1
+        if not row.amount:
+            errors.add(row.line, 'нулевая сумма')
+            rejected += 1
+            continue
+        try:
+            wallet_id = mapper.wallet(row)
+        except ValueError as e:
+            errors.add(row.line, str(e))
+            rejected += 1
+            continue
+        t_type = 'IN' if row.amount > 0 else 'EX'
+        amount = abs(row.amount)
+        content = (f'{user.pk}|{wallet_id}|{row.date.isoformat()}|{t_type}|{amount}|'
+                   f'{row.external_id or row.description}')
+        occurrences[content] += 1
+        batch.append(Transaction(
+            user_id=user.pk,
+            wallet_id=wallet_id,
+            category_id=mapper.category(row),
+            t_type=t_type,
+            amount=amount,
+            description=row.description[:255],
+            date=row.date,
+            import_hash=hashlib.sha256(
+                f'{content}|{occurrences[content]}'.encode()).hexdigest(),
+        ))
+        if len(batch) >= batch_size:
+            inserted = _save_batch(user, batch)
+            created += inserted
+            duplicates += len(batch) - inserted
+            batch = []
+    if batch:
+        inserted = _save_batch(user, batch)
+        created += inserted
+        duplicates += len(batch) - inserted
+
+    return ImportResult(
+        # Строки, отброшенные парсером, в total не попали
+        rows=total + errors.count - rejected,
+        created=created,
+        duplicates=duplicates,
+        skipped=errors.count,
+        errors=errors.messages,
+    )
+
+
+def _save_batch(user, batch: List[Transaction]) -> int:
+    """Пишет новые транзакции пачки и их итоги; возвращает число добавленных"""
+    with transaction.atomic():
+        # Пачки одного пользователя пишутся по очереди: параллельный импорт
+        # того же файла после блокировки видит уже добавленные хэши, а не
+        # падает на unique_transaction_import_hash
+        get_user_model().objects.select_for_update().filter(pk=user.pk).exists()
+        existing = set(Transaction.objects.filter(
+            user_id=user.pk, import_hash__in=[obj.import_hash for obj in batch],
+        ).values_list('import_hash', flat=True))
+        new = [obj for obj in batch if obj.import_hash not in existing]
+        if not new:
+            return 0
+        Transaction.objects.bulk_create(new)
+
+        balances = defaultdict(Decimal)
+        aggregates = defaultdict(lambda: [Decimal('0'), 0])
+        for obj in new:
+            balances[obj.wallet_id] += balance.signed_amount(obj.t_type, obj.amount)
+            aggregate = aggregates[(obj.wallet_id, obj.category_id, obj.t_type, obj.date)]
+            aggregate[0] += obj.amount
+            aggregate[1] += 1
+        for wallet_id, delta in balances.items():
+            balance.apply_balance_delta(wallet_id, delta)
+        rollups.apply_rollup_deltas(
+            user.pk, {key: tuple(value) for key, value in aggregates.items()})
+    return len(new)
+
+
+def import_file(user, stream: IO[bytes], filename: str = '', fmt: Optional[str] = None,
+                wallet=None, batch_size: int = BATCH_SIZE,
+                encoding: Optional[str] = None) -> ImportResult:
+    """
+    Импортирует выписку из бинарного потока
+
+    Args:
+        fmt: csv или ofx; по умолчанию по имени файла и содержимому
+
+    Raises:
+        StatementFormatError: файл не похож на выписку
+        Wallet.DoesNotExist: wallet не принадлежит пользователю
+    """
+    chunks = read_chunks(stream)
+    head = next(chunks, b'')
+    fmt = fmt or detect_format(filename, head)
+    if fmt not in FORMATS:
+        raise StatementFormatError(f'Неизвестный формат {fmt}, ожидается csv или ofx')
+    errors = _Errors()
+    parser = iter_ofx if fmt == 'ofx' else iter_csv
+    rows = parser(chain([head], chunks), errors, encoding)
+    return import_rows(user, rows, wallet=wallet, batch_size=batch_size, errors=errors)
@@ -0,0 +1,148 @@
+"""
+Статистика по транзакциям за один запрос к БД.
+
+Читает дневные агрегаты (TransactionDailyAggregate) одним GROUP BY по
+кошельку и запрошенным измерениям с условными суммами
+Sum(..., filter=Q(t_type=...)). Итоги, разбивка по кошелькам и группы
+собираются из строк результата в памяти, поэтому любая комбинация
+измерений стоит ровно один round-trip.
+"""
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from accounting.models.transactionDailyAggregate import \
+    TransactionDailyAggregate
+
+ZERO = Decimal('0')
+
+# Измерение -> (имя колонки в values(), выражение или None для поля модели)
+GROUP_BY_DIMENSIONS = {
+    'day': ('day', None),
+    'week': ('week', TruncWeek('day')),
+    'month': ('month', TruncMonth('day')),
+    'category': ('category_id', None),
+    'wallet': ('wallet_id', None),
+}
+
+
+class InvalidGroupBy(ValueError):
+    """Запрошено неизвестное измерение группировки."""
+
+
+def parse_group_by(value: Optional[str]) -> list:
+    """
+    Разбирает параметр group_by вида "month,category"
+
+    Raises:
+        InvalidGroupBy: если измерение не поддерживается
+    """
+    if not value:
+        return []
+
+    dimensions = []
+    for name in value.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in GROUP_BY_DIMENSIONS:
+            raise InvalidGroupBy(
+                f"Неизвестное измерение '{name}'. "
+                f"Доступны: {', '.join(GROUP_BY_DIMENSIONS)}")
+        if name not in dimensions:
+            dimensions.append(name)
+    return dimensions
+
+
+def _empty_totals() -> dict:
+    return {
+        'total_income': ZERO,
+        'total_expense': ZERO,
+        'balance': ZERO,
+        'transaction_count': 0,
+    }
+
+
+def _add_row(totals: dict, row: dict) -> None:
+    income = row['income'] or ZERO
+    expense = row['expense'] or ZERO
+    totals['total_income'] += income
+    totals['total_expense'] += expense
+    totals['balance'] += income - expense
+    totals['transaction_count'] += row['count'] or 0
+
+
+def compute_stats(user, date_from=None, date_to=None,
+                  group_by: Iterable[str] = ()) -> dict:
+    """
+    Доходы, расходы, количество и разбивки за период одним запросом
+
+    Args:
+        user: Пользователь
+        date_from: Начало периода (включительно)
+        date_to: Конец периода (включительно)
+        group_by: Измерения из GROUP_BY_DIMENSIONS (day/week/month/category/wallet)
+
+    Returns:
+        Dict с итогами (total_income, total_expense, balance, transaction_count),
+        списком wallets с итогами по каждому кошельку и, если задан group_by,
+        списком groups с итогами по каждой комбинации измерений
+    """
+    group_by = list(group_by)
+    rows = TransactionDailyAggregate.objects.filter(user=user)
+    if date_from:
+        rows = rows.filter(day__gte=date_from)
+    if date_to:
+        rows = rows.filter(day__lte=date_to)
+
+    # Кошелек участвует в группировке всегда, чтобы отдать итоги по кошелькам
+    expressions = {}
+    columns = ['wallet_id']
+    for name in group_by:
+        column, expression = GROUP_BY_DIMENSIONS[name]
+        if expression is not None:
+            expressions[column] = expression
+        if column not in columns:
+            columns.append(column)
+
+    grouped = (
+        rows
+        .order_by()
+        .annotate(**expressions)
+        .values(*columns)
+        .annotate(
+            income=Sum('total', filter=Q(t_type='IN')),
+            expense=Sum('total', filter=Q(t_type='EX')),
+            count=Sum('count'),
+        )
+    )
+
+    result = _empty_totals()
+    wallets = OrderedDict()
+    groups = OrderedDict()
+
+    for row in grouped:
+        _add_row(result, row)
+
+        wallet_totals = wallets.setdefault(row['wallet_id'], _empty_totals())
+        _add_row(wallet_totals, row)
+
+        if group_by:
+            key = tuple(row[GROUP_BY_DIMENSIONS[name][0]] for name in group_by)
+            _add_row(groups.setdefault(key, _empty_totals()), row)
+
+    result['wallets'] = [
+        {'wallet': wallet_id, **totals} for wallet_id, totals in wallets.items()
+    ]
+
+    if group_by:
+        result['groups'] = [
+            {**dict(zip(group_by, key)), **totals}
+            for key, totals in sorted(groups.items(), key=lambda item: tuple(
+                (value is None, str(value)) for value in item[0]))
+        ]
+
+    return result
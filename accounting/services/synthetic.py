@@ -0,0 +1,223 @@
+"""
+Синтетические данные учета для нагрузочных замеров.
+
+generate() создает пользователей с кошельками в нескольких валютах,
+деревьями категорий заданной глубины и транзакциями, распределенными по
+датам. Всё пишется bulk_create пачками: узлы MPTT получают lft/rght/level/
+tree_id сразу при построении дерева в памяти, балансы кошельков считаются
+по ходу генерации, дневные агрегаты и общие балансы пересчитываются в конце. Данные
+согласованы так же, как созданные через ledger.
+
+Пользователи получают имена с префиксом SYNTHETIC_PREFIX, purge() удаляет
+их вместе со всеми данными.
+"""
+import random
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from typing import Callable, List, NamedTuple, Optional, Sequence
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from accounting.models.currencyCBR import CurrencyCBR
+from accounting.models.transaction import Transaction
+from accounting.models.transactionCategory import TransactionCategoryTree
+from accounting.models.wallet import Wallet
+from accounting.services.rollups import rebuild_rollups
+from accounting.services.total_balance import recalculate_total_balances
+
+SYNTHETIC_PREFIX = 'synthetic_'
+
+# char_code -> (num_code, name) по классификатору ЦБ
+KNOWN_CURRENCIES = {
+    'RUB': (643, 'Российский рубль'),
+    'USD': (840, 'Доллар США'),
+    'EUR': (978, 'Евро'),
+    'CNY': (156, 'Китайский юань'),
+    'KZT': (398, 'Казахстанский тенге'),
+    'GBP': (826, 'Фунт стерлингов Соединенного королевства'),
+}
+
+DESCRIPTIONS = (
+    'Продукты', 'Кафе', 'Такси', 'Аптека', 'Коммунальные услуги', 'Связь',
+    'Подписка', 'Зарплата', 'Подарок', 'Перевод', 'Одежда', 'Бензин', '',
+)
+
+
+class GenerationResult(NamedTuple):
+    user_ids: List
+    wallets: int
+    categories: int
+    transactions: int
+
+
+def ensure_currencies(codes: Sequence[str]) -> List[CurrencyCBR]:
+    """
+    Валюты по буквенным кодам, недостающие создаются
+
+    Raises:
+        ValueError: код не из KNOWN_CURRENCIES и в базе его нет
+    """
+    existing = {c.char_code: c for c in CurrencyCBR.objects.filter(char_code__in=codes)}
+    result = []
+    for code in codes:
+        if code not in existing:
+            if code not in KNOWN_CURRENCIES:
+                raise ValueError(f'Неизвестная валюта: {code}')
+            num_code, name = KNOWN_CURRENCIES[code]
+            existing[code], _ = CurrencyCBR.objects.get_or_create(
+                char_code=code, defaults={'num_code': num_code, 'name': name})
+        result.append(existing[code])
+    return result
+
+
+def build_category_trees(user_id, first_tree_id: int, depth: int,
+                         breadth: int) -> List[TransactionCategoryTree]:
+    """
+    Деревья категорий пользователя с уже проставленными полями MPTT
+
+    breadth корней, у каждого узла до уровня depth - breadth детей.
+    Каждый корень - отдельное дерево MPTT (свой tree_id), как при
+    обычном создании корневых категорий.
+    """
+    nodes = []
+
+    def build(node, level, tree_id, counter):
+        node.tree_id = tree_id
+        node.level = level
+        node.lft = counter
+        counter += 1
+        if level + 1 < depth:
+            # Братья упорядочены по title, как требует order_insertion_by
+            for i in range(breadth):
+                child = TransactionCategoryTree(
+                    user_id=user_id, parent=node,
+                    title=f'{node.title}.{i + 1:02d}')
+                nodes.append(child)
+                counter = build(child, level + 1, tree_id, counter)
+        node.rght = counter
+        return counter + 1
+
+    for i in range(breadth):
+        root = TransactionCategoryTree(
+            user_id=user_id, parent=None, title=f'Категория {i + 1:02d}')
+        nodes.append(root)
+        build(root, 0, first_tree_id + i, 1)
+    return nodes
+
+
+def generate(users: int = 10, wallets_per_user: int = 3,
+             currencies: Sequence[str] = ('RUB', 'USD', 'EUR'),
+             category_depth: int = 4, category_breadth: int = 3,
+             transactions: int = 100_000, days: int = 730,
+             batch_size: int = 10_000, seed: Optional[int] = None,
+             progress: Optional[Callable[[int], None]] = None) -> GenerationResult:
+    """
+    Создает синтетических пользователей и их данные
+
+    Args:
+        users: Количество пользователей
+        wallets_per_user: Кошельков у каждого, валюты по кругу из currencies
+        currencies: Буквенные коды валют кошельков
+        category_depth: Глубина деревьев категорий
+        category_breadth: Число корней и детей у каждого узла
+        transactions: Всего транзакций, распределяются между пользователями
+        days: Глубина истории в днях от сегодняшней даты
+        batch_size: Размер пачки bulk_create
+        seed: Зерно генератора для воспроизводимых данных
+        progress: Вызывается с числом созданных транзакций после каждой пачки
+    """
+    rng = random.Random(seed)
+    currency_objs = ensure_currencies(currencies)
+    User = get_user_model()
+    run_id = f'{rng.getrandbits(32):08x}'
+
+    with transaction.atomic():
+        # telegram_id нужен для входа в API и Mini App; отрицательные
+        # значения не пересекаются с настоящими идентификаторами Telegram
+        first_telegram_id = min(User.objects.aggregate(
+            value=Min('telegram_id'))['value'] or 0, 0) - 1
+        user_objs = User.objects.bulk_create([
+            User(username=f'{SYNTHETIC_PREFIX}{run_id}_{i}',
+                 telegram_id=first_telegram_id - i)
+            for i in range(users)
+        ], batch_size=batch_size)
+
+        wallet_objs = Wallet.objects.bulk_create([
+            Wallet(user=user, title=f'Кошелек {j + 1}',
+                   currency=currency_objs[j % len(currency_objs)],
+                   balance=Decimal('0.00'))
+            for user in user_objs for j in range(wallets_per_user)
+        ], batch_size=batch_size)
+
+        next_tree_id = (TransactionCategoryTree.objects.aggregate(
+            value=Max('tree_id'))['value'] or 0) + 1
+        category_objs = []
+        for user in user_objs:
+            category_objs += build_category_trees(
+                user.pk, next_tree_id, category_depth, category_breadth)
+            next_tree_id += category_breadth
+        # Родители идут в списке раньше детей, parent_id уже известен
+        TransactionCategoryTree.objects.bulk_create(category_objs, batch_size=batch_size)
+
+    wallets_by_user = defaultdict(list)
+    for wallet in wallet_objs:
+        wallets_by_user[wallet.user_id].append(wallet.pk)
+    categories_by_user = defaultdict(list)
+    for category in category_objs:
+        categories_by_user[category.user_id].append(category.pk)
+    user_ids = [user.pk for user in user_objs]
+
+    balances = defaultdict(Decimal)
+    today = timezone.now().date()
+    created = 0
+    while created < transactions and wallet_objs:
+        size = min(batch_size, transactions - created)
+        batch = []
+        for _ in range(size):
+            user_id = rng.choice(user_ids)
+            wallet_id = rng.choice(wallets_by_user[user_id])
+            income = rng.random() < 0.25
+            # Доходы реже и крупнее расходов
+            amount = Decimal(max(1, int(rng.lognormvariate(12 if income else 7.5, 1)))) / 100
+            balances[wallet_id] += amount if income else -amount
+            batch.append(Transaction(
+                user_id=user_id,
+                wallet_id=wallet_id,
+                category_id=(rng.choice(categories_by_user[user_id])
+                             if categories_by_user[user_id] and rng.random() < 0.9 else None),
+                t_type='IN' if income else 'EX',
+                amount=amount,
+                description=rng.choice(DESCRIPTIONS),
+                date=today - timedelta(days=rng.randrange(days)),
+            ))
+        Transaction.objects.bulk_create(batch)
+        created += size
+        if progress:
+            progress(created)
+
+    with transaction.atomic():
+        for wallet in wallet_objs:
+            wallet.balance = balances[wallet.pk]
+        Wallet.objects.bulk_update(wallet_objs, ['balance'], batch_size=batch_size)
+        rebuild_rollups(users=User.objects.filter(pk__in=user_ids))
+        recalculate_total_balances(User.objects.filter(pk__in=user_ids))
+
+    return GenerationResult(
+        user_ids=user_ids,
+        wallets=len(wallet_objs),
+        categories=len(category_objs),
+        transactions=created,
+    )
+
+
+def purge() -> int:
+    """Удаляет синтетических пользователей со всеми данными, возвращает их число"""
+    User = get_user_model()
+    users = User.objects.filter(username__startswith=SYNTHETIC_PREFIX)
+    count = users.count()
+    users.delete()
+    return count
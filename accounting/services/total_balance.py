@@ -0,0 +1,144 @@
+"""
+Общий баланс пользователя (User.total_balance) в базовой валюте.
+
+Баланс каждого кошелька переводится в ACCOUNTING_BASE_CURRENCY по курсу
+ЦБ, сохраненному в CurrencyCBR (value рублей за nominal единиц). Кошельки
+в валюте без курса в общий баланс не входят.
+
+total_balance сдвигается на дельту вместе с балансом кошелька:
+apply_wallet_delta() вызывается из balance.apply_balance_delta одним
+UPDATE с курсом из подзапроса, сохранение и удаление кошелька учитываются
+сигналами (accounting.signals). После смены курсов и правок в обход ORM
+общий баланс пересчитывается recalculate_total_balances() пачками
+пользователей, по одному агрегирующему запросу на пачку.
+"""
+from decimal import Decimal
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import (Case, DecimalField, F, Subquery, Sum, Value,
+                              When)
+from django.db.models.functions import Coalesce
+
+from accounting.models.currencyCBR import CurrencyCBR
+from accounting.models.wallet import Wallet
+
+from . import balance, currencies
+
+RUB = 'RUB'
+
+_factor_field = DecimalField(max_digits=24, decimal_places=10)
+
+
+def base_currency_code() -> str:
+    return getattr(settings, 'ACCOUNTING_BASE_CURRENCY', RUB)
+
+
+def _base_rate() -> Optional[Decimal]:
+    """Рублей за единицу базовой валюты"""
+    code = base_currency_code()
+    if code == RUB:
+        return Decimal('1')
+    try:
+        return currencies.by_code(code).rate
+    except CurrencyCBR.DoesNotExist:
+        return None
+
+
+def conversion_factor_expression(prefix: str = 'currency__'):
+    """
+    Множитель перевода в базовую валюту для валюты по пути prefix
+
+    prefix - путь к CurrencyCBR ('currency__' от кошелька, '' от самой
+    валюты). Если курса нет, выражение равно NULL.
+    """
+    base = base_currency_code()
+    rate = Case(
+        When(**{f'{prefix}char_code': RUB}, then=Value(Decimal('1'))),
+        default=F(f'{prefix}value') / F(f'{prefix}nominal'),
+        output_field=_factor_field,
+    )
+    if base == RUB:
+        return rate
+    return Case(
+        When(**{f'{prefix}char_code': base}, then=Value(Decimal('1'))),
+        default=rate / Value(_base_rate(), output_field=_factor_field),
+        output_field=_factor_field,
+    )
+
+
+def _shift(users, factor_source, prefix: str, delta: Decimal) -> None:
+    """UPDATE total_balance += delta * множитель из подзапроса к factor_source"""
+    if not delta:
+        return
+    factor = Subquery(
+        factor_source.annotate(factor=conversion_factor_expression(prefix))
+        .values('factor')[:1]
+    )
+    users.update(total_balance=F('total_balance') + Coalesce(
+        Value(delta, output_field=_factor_field) * factor,
+        Value(balance.ZERO, output_field=_factor_field),
+    ))
+
+
+def apply_wallet_delta(wallet_id, delta: Decimal) -> None:
+    """Сдвигает общий баланс владельца кошелька на delta в валюте кошелька"""
+    _shift(get_user_model().objects.filter(user_wallets=wallet_id),
+           Wallet.objects.filter(pk=wallet_id), 'currency__', delta)
+
+
+def apply_balance_change(user_id, currency_id, delta: Decimal) -> None:
+    """Сдвигает общий баланс пользователя на delta в валюте currency_id"""
+    _shift(get_user_model().objects.filter(pk=user_id),
+           CurrencyCBR.objects.filter(pk=currency_id), '', delta)
+
+
+def recalculate_total_balances(users=None, chunk_size: int = 1000) -> int:
+    """
+    Пересчитывает total_balance по балансам кошельков
+
+    Пользователи обрабатываются пачками по chunk_size в порядке pk: на
+    пачку один агрегирующий запрос по кошелькам и один bulk_update.
+
+    Args:
+        users: QuerySet пользователей (по умолчанию все)
+        chunk_size: Размер пачки
+
+    Returns:
+        Количество обработанных пользователей
+    """
+    User = get_user_model()
+    queryset = users if users is not None else User.objects.all()
+    pks = queryset.order_by('pk').values_list('pk', flat=True).distinct()
+    factor = conversion_factor_expression()
+
+    processed = 0
+    last_pk = None
+    while True:
+        chunk_pks = pks if last_pk is None else pks.filter(pk__gt=last_pk)
+        chunk = list(chunk_pks[:chunk_size])
+        if not chunk:
+            break
+
+        totals = dict(
+            Wallet.objects.filter(user_id__in=chunk)
+            .order_by()
+            .values('user_id')
+            .annotate(total=Sum(F('balance') * factor, output_field=_factor_field))
+            .values_list('user_id', 'total')
+        )
+        User.objects.bulk_update(
+            [User(pk=pk, total_balance=balance.to_amount(totals.get(pk) or balance.ZERO)) for pk in chunk],
+            ['total_balance'],
+        )
+        processed += len(chunk)
+        last_pk = chunk[-1]
+    return processed
+
+
+def users_with_currency(currencies):
+    """Пользователи с кошельками в указанных валютах (для пересчета после смены курса)"""
+    return get_user_model().objects.filter(
+        uuid__in=Subquery(
+            Wallet.objects.filter(currency__in=currencies).values('user_id')))
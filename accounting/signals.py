@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from mptt.signals import node_moved
+
+from .models.currencyCBR import CurrencyCBR
+from .models.currencyRate import CurrencyRate
+from .models.transactionCategory import TransactionCategoryTree
+from .models.wallet import Wallet
+from .services import balance, category_tree, currencies, rates, total_balance
+
+_WALLET_SNAPSHOT = '_total_balance_snapshot'
+
+
+@receiver(post_save, sender=TransactionCategoryTree)
+@receiver(post_delete, sender=TransactionCategoryTree)
+@receiver(node_moved, sender=TransactionCategoryTree)
+def invalidate_category_tree(sender, instance, **kwargs):
+    """Сбрасывает кэш дерева категорий владельца при любом изменении"""
+    category_tree.bump_version(instance.user_id)
+
+
+@receiver(post_save, sender=CurrencyRate)
+@receiver(post_delete, sender=CurrencyRate)
+@receiver(post_save, sender=CurrencyCBR)
+@receiver(post_delete, sender=CurrencyCBR)
+def invalidate_rates(sender, **kwargs):
+    """Сбрасывает кэшированные матрицы курсов"""
+    rates.invalidate()
+
+
+@receiver(post_save, sender=CurrencyCBR)
+@receiver(post_delete, sender=CurrencyCBR)
+def invalidate_currencies(sender, **kwargs):
+    """Сбрасывает справочник валют"""
+    currencies.invalidate()
+
+
+def _wallet_state(instance):
+    """(user_id, currency_id, balance) из загруженных полей кошелька или None"""
+    values = instance.__dict__
+    if not all(name in values for name in ('user_id', 'currency_id', 'balance')):
+        return None
+    return values['user_id'], values['currency_id'], balance.to_amount(values['balance'])
+
+
+@receiver(post_init, sender=Wallet)
+def remember_wallet_state(sender, instance, **kwargs):
+    setattr(instance, _WALLET_SNAPSHOT, _wallet_state(instance))
+
+
+@receiver(post_save, sender=Wallet)
+def update_total_balance_on_save(sender, instance, created, raw=False, **kwargs):
+    """Переносит в total_balance изменение баланса, валюты или владельца кошелька"""
+    if raw:
+        return
+    before = None if created else getattr(instance, _WALLET_SNAPSHOT, None)
+    after = _wallet_state(instance)
+    if after is None or (not created and before is None):
+        # Кошелек загружен без этих полей - save() их не менял
+        return
+    if before is not None and before[:2] == after[:2]:
+        total_balance.apply_balance_change(after[0], after[1], after[2] - before[2])
+    else:
+        if before is not None:
+            total_balance.apply_balance_change(before[0], before[1], -before[2])
+        total_balance.apply_balance_change(after[0], after[1], after[2])
+    setattr(instance, _WALLET_SNAPSHOT, after)
+
+
+@receiver(post_delete, sender=Wallet)
+def update_total_balance_on_delete(sender, instance, origin=None, **kwargs):
+    """Вычитает баланс удаленного кошелька, если не удаляется сам пользователь"""
+    if getattr(origin, 'model', type(origin)) is get_user_model():
+        return
+    total_balance.apply_balance_change(
+        instance.user_id, instance.currency_id, -balance.to_amount(instance.balance))
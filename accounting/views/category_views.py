@@ -1,11 +1,13 @@
 from django.db.models import Q
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from ..models.transactionCategory import TransactionCategoryTree
 from ..serializers import TransactionCategorySerializer
+from ..services import category_tree
 
 
 class TransactionCategoryViewSet(viewsets.ModelViewSet):
@@ -20,9 +22,37 @@ class TransactionCategoryViewSet(viewsets.ModelViewSet):
         """Автоматически добавляет пользователя при создании"""
         serializer.save(user=self.request.user)
 
+    def _use_recursive(self, request):
+        """
+        ?mode=recursive включает прежнюю сериализацию через get_children()
+        (запрос на каждый узел), по умолчанию дерево собирается из одного
+        закэшированного запроса
+        """
+        return request.query_params.get('mode') == 'recursive'
+
+    def list(self, request, *args, **kwargs):
+        """Все категории с поддеревьями, как flat"""
+        if self._use_recursive(request):
+            return super().list(request, *args, **kwargs)
+        return Response(category_tree.build_flat(request.user.pk))
+
+    def retrieve(self, request, *args, **kwargs):
+        """Категория с поддеревом из того же закэшированного списка"""
+        if self._use_recursive(request):
+            return super().retrieve(request, *args, **kwargs)
+
+        lookup = str(kwargs[self.lookup_url_kwarg or self.lookup_field]).lower()
+        for node in category_tree.build_flat(request.user.pk):
+            if node['uuid'] == lookup:
+                return Response(node)
+        raise NotFound()
+
     @action(detail=False, methods=['get'])
     def tree(self, request):
         """Возвращает категории в виде дерева"""
+        if not self._use_recursive(request):
+            return Response(category_tree.build_tree(request.user.pk))
+
         queryset = self.get_queryset()
 
         # Получаем только корневые категории
@@ -34,6 +64,9 @@ class TransactionCategoryViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def flat(self, request):
         """Возвращает плоский список всех категорий"""
+        if not self._use_recursive(request):
+            return Response(category_tree.build_flat(request.user.pk))
+
         queryset = self.get_queryset()
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
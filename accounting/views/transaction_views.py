@@ -1,15 +1,19 @@
 from datetime import datetime, timedelta
 
-from django.db import models
+from django.db import transaction
 from django.db.models import Q
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from ..models.transaction import Transaction
-from ..serializers import TransactionSerializer
+from ..models.wallet import Wallet
+from ..pagination import TransactionKeysetPagination
+from ..serializers import StatementImportSerializer, TransactionSerializer
+from ..services import ledger, statement_import, stats
 
 
 class TransactionViewSet(viewsets.ModelViewSet):
@@ -21,46 +25,69 @@ class TransactionViewSet(viewsets.ModelViewSet):
     search_fields = ['description']
     ordering_fields = ['date', 'amount', 'created_at']
     ordering = ['-created_at']
+    pagination_class = TransactionKeysetPagination
 
     def get_queryset(self):
         """Возвращает только транзакции текущего пользователя"""
-        return Transaction.objects.filter(user=self.request.user)
+        return Transaction.objects.filter(
+            user=self.request.user).select_related('wallet', 'category')
 
     def perform_create(self, serializer):
         """Автоматически добавляет пользователя при создании"""
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            instance = serializer.save(user=self.request.user)
+            ledger.record_created(instance)
+
+    def perform_update(self, serializer):
+        """Переносит изменение транзакции в балансы и агрегаты"""
+        with transaction.atomic():
+            before = ledger.snapshot(serializer.instance)
+            instance = serializer.save()
+            ledger.record_updated(before, instance)
+
+    def perform_destroy(self, instance):
+        """Убирает удаляемую транзакцию из баланса и агрегатов"""
+        with transaction.atomic():
+            ledger.record_deleted(instance)
+            instance.delete()
 
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        """Статистика по транзакциям"""
-        queryset = self.get_queryset()
-
+        """Статистика по транзакциям (один запрос к дневным агрегатам)"""
         # Фильтры по дате
         date_from = request.query_params.get('date_from')
         date_to = request.query_params.get('date_to')
 
-        if date_from:
-            queryset = queryset.filter(date__gte=date_from)
-        if date_to:
-            queryset = queryset.filter(date__lte=date_to)
+        # Необязательная группировка: day, week, month, category, wallet
+        try:
+            group_by = stats.parse_group_by(
+                request.query_params.get('group_by'))
+        except stats.InvalidGroupBy as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Подсчет статистики
-        total_income = queryset.filter(t_type='IN').aggregate(
-            total=models.Sum('amount')
-        )['total'] or 0
+        return Response(stats.compute_stats(
+            request.user, date_from, date_to, group_by=group_by))
 
-        total_expense = queryset.filter(t_type='EX').aggregate(
-            total=models.Sum('amount')
-        )['total'] or 0
+    @action(detail=False, methods=['post'], url_path='import',
+            parser_classes=[MultiPartParser])
+    def import_statement(self, request):
+        """Импорт выписки CSV/OFX; повторная загрузка того же файла не создает дублей"""
+        serializer = StatementImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data['file']
 
-        balance = total_income - total_expense
+        try:
+            result = statement_import.import_file(
+                request.user, upload, filename=upload.name,
+                fmt=serializer.validated_data.get('format'),
+                wallet=serializer.validated_data.get('wallet'))
+        except statement_import.StatementFormatError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Wallet.DoesNotExist:
+            return Response({'error': 'Кошелек не найден'},
+                            status=status.HTTP_400_BAD_REQUEST)
 
-        return Response({
-            'total_income': total_income,
-            'total_expense': total_expense,
-            'balance': balance,
-            'transaction_count': queryset.count()
-        })
+        return Response(result.as_dict())
 
     @action(detail=False, methods=['get'])
     def recent(self, request):
@@ -1,5 +1,6 @@
 import logging
 import os
+from datetime import timedelta
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -57,11 +58,28 @@ MIDDLEWARE = [
 ]
 
 REST_FRAMEWORK = {
+    # JWT проверяется первым: запрос с Bearer токеном не читает сессию.
+    # SessionAuthentication оставлен для browsable API и админов
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'users.authentication.TelegramJWTAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.DjangoModelPermissionsOrAnonReadOnly'
     ]
 }
 
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(
+        minutes=int(os.getenv('JWT_ACCESS_TOKEN_MINUTES', '15'))),
+    'REFRESH_TOKEN_LIFETIME': timedelta(
+        days=int(os.getenv('JWT_REFRESH_TOKEN_DAYS', '7'))),
+    # Первичный ключ пользователя - uuid
+    'USER_ID_FIELD': 'uuid',
+    'USER_ID_CLAIM': 'user_id',
+    'UPDATE_LAST_LOGIN': False,
+}
+
 ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
@@ -93,6 +111,9 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', '127.0.0.1'),
         'PORT': os.getenv('DB_PORT', '5432'),
+        # Постоянные соединения с проверкой перед переиспользованием
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -145,6 +166,15 @@ TELEGRAM_MINIAPP_URL = os.getenv('TELEGRAM_MINIAPP_URL', '')
 TELEGRAM_MINIAPP_DEBUG_MODE = os.getenv(
     'TELEGRAM_MINIAPP_DEBUG_MODE', 'False').lower() == 'true'
 
+# Срок действия init data Mini App от auth_date (секунды) и размер кэша
+# проверенных init data
+TELEGRAM_WEBAPP_AUTH_MAX_AGE = int(
+    os.getenv('TELEGRAM_WEBAPP_AUTH_MAX_AGE', 60 * 60 * 24))
+TELEGRAM_WEBAPP_AUTH_CACHE_SIZE = int(
+    os.getenv('TELEGRAM_WEBAPP_AUTH_CACHE_SIZE', '10000'))
+# Время жизни подписанного токена сессии Mini App, секунды
+TELEGRAM_MINIAPP_TOKEN_TTL = int(os.getenv('TELEGRAM_MINIAPP_TOKEN_TTL', 60 * 60))
+
 # Webhook settings
 TELEGRAM_WEBHOOK_PATH = '/telegram/webhook/'
 TELEGRAM_WEBHOOK_FULL_URL = f"{TELEGRAM_WEBHOOK_URL}{TELEGRAM_WEBHOOK_PATH}" if TELEGRAM_WEBHOOK_URL else ''
@@ -181,6 +211,32 @@ TELEGRAM_BOT_COMMANDS = [
     }
 ]
 
+# ===========================================
+# TELEGRAM UPDATE PROCESSING
+# ===========================================
+# Воркеры, параллельно обрабатывающие обновления разных чатов
+TELEGRAM_UPDATE_WORKERS = int(os.getenv('TELEGRAM_UPDATE_WORKERS', '8'))
+# Максимум принятых и не обработанных обновлений в процессе
+TELEGRAM_UPDATE_QUEUE_SIZE = int(os.getenv('TELEGRAM_UPDATE_QUEUE_SIZE', '1000'))
+# Сколько webhook ждет места в очереди перед ответом 503, секунды
+TELEGRAM_UPDATE_SUBMIT_TIMEOUT = float(
+    os.getenv('TELEGRAM_UPDATE_SUBMIT_TIMEOUT', '5'))
+# Период записи метрик очередей в лог, секунды (0 - выключено)
+TELEGRAM_UPDATE_METRICS_INTERVAL = float(
+    os.getenv('TELEGRAM_UPDATE_METRICS_INTERVAL', '60'))
+
+# Кэш пользователей бота по telegram_id: размер, TTL записи (секунды) и
+# второй уровень в общем Django cache (Redis)
+TELEGRAM_USER_CACHE_SIZE = int(os.getenv('TELEGRAM_USER_CACHE_SIZE', '10000'))
+TELEGRAM_USER_CACHE_TTL = int(os.getenv('TELEGRAM_USER_CACHE_TTL', '300'))
+TELEGRAM_USER_CACHE_SHARED = os.getenv(
+    'TELEGRAM_USER_CACHE_SHARED', 'True').lower() == 'true'
+
+# Пул потоков для ORM-кода бота: число потоков (= постоянных соединений)
+# и период проверки соединения, секунды
+TELEGRAM_DB_WORKERS = int(os.getenv('TELEGRAM_DB_WORKERS', '4'))
+TELEGRAM_DB_CHECK_INTERVAL = float(os.getenv('TELEGRAM_DB_CHECK_INTERVAL', '30'))
+
 # ===========================================
 # SECURITY SETTINGS
 # ===========================================
@@ -280,19 +336,50 @@ LOGGING = {
     },
 }
 
+# ===========================================
+# ACCOUNTING
+# ===========================================
+# Валюта общего баланса пользователя (User.total_balance)
+ACCOUNTING_BASE_CURRENCY = os.getenv('ACCOUNTING_BASE_CURRENCY', 'RUB')
+# Как часто процесс сверяет версию справочника валют в общем кэше, секунды
+ACCOUNTING_CURRENCY_CHECK_INTERVAL = int(os.getenv('ACCOUNTING_CURRENCY_CHECK_INTERVAL', '60'))
+
+# ===========================================
+# REDIS CONFIGURATION
+# ===========================================
+REDIS_HOST = os.getenv('REDIS_HOST', '127.0.0.1')
+REDIS_PORT = int(os.getenv('REDIS_PORT', '6379'))
+REDIS_DB = int(os.getenv('REDIS_DB', '0'))
+REDIS_PASSWORD = os.getenv('REDIS_PASSWORD', '')
+
 # ===========================================
 # CACHE CONFIGURATION
 # ===========================================
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-        'LOCATION': f"redis://{os.getenv('REDIS_HOST', '127.0.0.1')}:{os.getenv('REDIS_PORT', '6379')}/{os.getenv('REDIS_DB', '0')}",
+        'LOCATION': f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}",
         'OPTIONS': {
-            'PASSWORD': os.getenv('REDIS_PASSWORD', ''),
+            'PASSWORD': REDIS_PASSWORD,
         }
     }
 }
 
+# ===========================================
+# TELEGRAM FSM STORAGE
+# ===========================================
+# В продакшене состояние диалогов хранится в Redis и переживает перезапуск
+TELEGRAM_FSM_STORAGE = os.getenv('TELEGRAM_FSM_STORAGE', 'redis')
+TELEGRAM_FSM_REDIS_DB = int(os.getenv('TELEGRAM_FSM_REDIS_DB', REDIS_DB))
+TELEGRAM_FSM_STATE_TTL = int(os.getenv('TELEGRAM_FSM_STATE_TTL', 60 * 60 * 24))
+TELEGRAM_FSM_STATE_TTLS = {
+    'TransactionStates': 60 * 60,
+    'TransactionCategoryStates': 60 * 60,
+    'WalletStates': 60 * 60,
+    'CategoryStates': 60 * 60,
+    'SettingsStates': 60 * 15,
+}
+
 # ===========================================
 # EMAIL CONFIGURATION
 # ===========================================
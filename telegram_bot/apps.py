@@ -5,3 +5,6 @@ class TelegramBotConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'telegram_bot'
     verbose_name = 'Telegram Bot'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -9,7 +9,8 @@ from django.contrib.auth.backends import BaseBackend
 
 from users.models.user import User
 
-from ..telegram_auth import get_telegram_user_from_webapp
+from ..telegram_auth import (get_or_create_telegram_user,
+                             get_telegram_user_from_webapp)
 
 logger = logging.getLogger(__name__)
 
@@ -94,19 +95,9 @@ class TelegramWebAppAuthBackend(BaseBackend):
             User объект или None
         """
         telegram_id = user_data.get('id')
-        username = user_data.get('username') or f"tg_{telegram_id}"
-
-        # Ищем существующего пользователя
-        user = User.objects.filter(telegram_id=telegram_id).first()
-
-        if not user:
-            # Создаем нового пользователя
-            user = User.objects.create(
-                telegram_id=telegram_id,
-                username=username,
-                first_name=user_data.get('first_name', ''),
-                last_name=user_data.get('last_name', ''),
-            )
+        user, created = get_or_create_telegram_user(user_data)
+
+        if created:
             logger.info(
                 f"Created new user: {user.username} (telegram_id: {telegram_id})")
         else:
@@ -1,38 +1,75 @@
 import asyncio
+import contextvars
+import hmac
 import logging
 import os
+import time
+from collections import deque
+from typing import Optional
 
 import django
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
-from aiogram.webhook.aiohttp_server import (SimpleRequestHandler,
-                                            setup_application)
+from aiogram.exceptions import TelegramConflictError
+from aiogram.types import Update
+from aiogram.types.update import UpdateTypeLookupError
+from aiogram.utils.backoff import Backoff, BackoffConfig
 from aiohttp import web
+from django.conf import settings
 
 from telegram_bot.config import (BOT_COMMANDS, TELEGRAM_BOT_TOKEN,
                                  TELEGRAM_WEBHOOK_SECRET, WEBHOOK_PATH,
                                  WEBHOOK_URL)
 from telegram_bot.handlers import register_handlers
-from telegram_bot.middleware import AuthMiddleware, DatabaseMiddleware
+from telegram_bot.db import get_db_executor
+from telegram_bot.middleware import AuthMiddleware
+from telegram_bot.storage import create_events_isolation, create_storage
 
 # Настройка Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings.dev')
 django.setup()
 
-
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
 
-async def create_bot():
-    """Создание и настройка бота"""
-    bot = Bot(
+POLLING_BACKOFF = BackoffConfig(min_delay=1.0, max_delay=30.0, factor=1.5, jitter=0.1)
+
+
+def build_bot():
+    """Создание экземпляра бота без обращений к Bot API"""
+    return Bot(
         token=TELEGRAM_BOT_TOKEN,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
 
+
+def build_dispatcher():
+    """Создание диспетчера с хранилищем FSM и middleware"""
+    storage = create_storage()
+    dp = Dispatcher(
+        storage=storage,
+        events_isolation=create_events_isolation(storage)
+    )
+
+    # Регистрация middleware. ORM-код middleware и обработчиков выполняется
+    # в пуле потоков БД (telegram_bot.db), соединения там постоянные
+    dp.message.middleware(AuthMiddleware())
+    dp.callback_query.middleware(AuthMiddleware())
+
+    # Регистрация обработчиков
+    register_handlers(dp)
+
+    return dp
+
+
+async def create_bot():
+    """Создание и настройка бота"""
+    bot = build_bot()
+
     # Установка команд бота
     await bot.set_my_commands(BOT_COMMANDS)
 
@@ -41,23 +78,279 @@ async def create_bot():
 
 async def create_dispatcher():
     """Создание диспетчера с middleware"""
-    dp = Dispatcher()
+    return build_dispatcher()
+
+
+def get_update_chat_id(update: Update) -> int:
+    """Ключ очереди для обновления: id чата, если его нет - id пользователя"""
+    try:
+        event = update.event
+    except UpdateTypeLookupError:
+        return 0
+
+    chat = getattr(event, 'chat', None)
+    if chat is None:
+        chat = getattr(getattr(event, 'message', None), 'chat', None)
+    if chat is not None:
+        return chat.id
+
+    user = getattr(event, 'from_user', None)
+    return user.id if user is not None else 0
+
+
+class UpdateScheduler:
+    """
+    Планировщик обработки обновлений
+
+    Обновления раскладываются по очередям чатов. Очередь чата обслуживает
+    не больше одного воркера за раз, поэтому обновления одного пользователя
+    обрабатываются строго по порядку, а разные чаты - параллельно пулом из
+    `workers` воркеров. Общее число ожидающих обновлений ограничено
+    `queue_size`: submit() ждёт свободного места (backpressure).
+
+    metrics() возвращает глубину очередей и счётчики обработки; при
+    metrics_interval > 0 они периодически пишутся в лог.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot,
+                 workers: int = 8, queue_size: int = 1000,
+                 metrics_interval: float = 0):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.workers = workers
+        self.queue_size = queue_size
+        self.metrics_interval = metrics_interval
+
+        self._slots = asyncio.Semaphore(queue_size)
+        # chat_id -> обновления чата; первое обрабатывается прямо сейчас
+        # или ждёт воркера в _ready
+        self._chats = {}
+        self._ready = asyncio.Queue()
+        self._tasks = []
+        self._pending = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+        # Метрики
+        self._busy = 0
+        self._max_pending = 0
+        self._max_chat_depth = 0
+        self._submitted = 0
+        self._processed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._processing_time = 0.0
+
+    @property
+    def pending(self) -> int:
+        """Обновления, принятые в работу и ещё не обработанные"""
+        return self._pending
+
+    def metrics(self) -> dict:
+        """
+        Текущее состояние очередей и счётчики с момента запуска
+
+        Returns:
+            dict: pending - принятые и не обработанные обновления,
+                active_chats - чаты с непустой очередью, ready_chats - чаты,
+                ожидающие свободного воркера, max_* - максимумы глубины
+        """
+        return {
+            'workers': self.workers,
+            'busy_workers': self._busy,
+            'queue_size': self.queue_size,
+            'pending': self._pending,
+            'active_chats': len(self._chats),
+            'ready_chats': self._ready.qsize(),
+            'max_pending': self._max_pending,
+            'max_chat_depth': self._max_chat_depth,
+            'submitted': self._submitted,
+            'processed': self._processed,
+            'failed': self._failed,
+            'rejected': self._rejected,
+            'avg_processing_ms': round(
+                self._processing_time / self._processed * 1000, 2
+            ) if self._processed else 0.0,
+        }
+
+    def start(self):
+        """Запуск пула воркеров в текущем event loop"""
+        if self._tasks:
+            return
+        # Воркеры не наследуют контекст вызвавшего кода: при старте из
+        # ASGI-запроса thread-sensitive вызовы асинхронного ORM иначе ушли бы
+        # в executor контекста этого запроса, закрытый после ответа
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f'update-worker-{i}',
+                                context=contextvars.Context())
+            for i in range(self.workers)
+        ]
+        if self.metrics_interval > 0:
+            self._tasks.append(asyncio.create_task(
+                self._report_metrics(), name='update-metrics'))
+        logger.info(f"Планировщик обновлений запущен: {self.workers} воркеров")
+
+    async def stop(self, timeout: Optional[float] = 10):
+        """Дожидается обработки принятых обновлений и останавливает воркеры"""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Остановка планировщика: не обработано {self._pending} обновлений")
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, update: Update,
+                     timeout: Optional[float] = None) -> bool:
+        """
+        Ставит обновление в очередь его чата
+
+        Args:
+            update: Обновление Telegram
+            timeout: Сколько ждать места в очереди, None - без ограничения
+
+        Returns:
+            bool: False, если очередь переполнена и место не освободилось
+        """
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            self._rejected += 1
+            logger.warning(
+                f"Очередь обновлений переполнена, update {update.update_id} отклонен")
+            return False
+
+        self._submitted += 1
+        self._pending += 1
+        self._max_pending = max(self._max_pending, self._pending)
+        self._idle.clear()
+
+        chat_id = get_update_chat_id(update)
+        updates = self._chats.get(chat_id)
+        if updates is None:
+            updates = self._chats[chat_id] = deque([update])
+            self._ready.put_nowait(chat_id)
+        else:
+            updates.append(update)
+        self._max_chat_depth = max(self._max_chat_depth, len(updates))
+        return True
+
+    async def _worker(self):
+        while True:
+            chat_id = await self._ready.get()
+            updates = self._chats[chat_id]
+            update = updates[0]
+            self._busy += 1
+            started = time.perf_counter()
+            try:
+                await self.dispatcher.feed_update(self.bot, update)
+            except Exception as e:
+                self._failed += 1
+                logger.exception(
+                    f"Ошибка обработки update {update.update_id}: {e}")
+            finally:
+                self._busy -= 1
+                self._processed += 1
+                self._processing_time += time.perf_counter() - started
+                updates.popleft()
+                # Чат с оставшимися обновлениями встаёт в конец очереди,
+                # чтобы активный пользователь не занимал воркер целиком
+                if updates:
+                    self._ready.put_nowait(chat_id)
+                else:
+                    del self._chats[chat_id]
+
+                self._slots.release()
+                self._pending -= 1
+                if not self._pending:
+                    self._idle.set()
+
+    async def _report_metrics(self):
+        while True:
+            await asyncio.sleep(self.metrics_interval)
+            logger.info(
+                f"Метрики обработки обновлений: {self.metrics()}, "
+                f"БД: {get_db_executor().stats()}")
+
+
+def create_scheduler(dispatcher: Dispatcher, bot: Bot) -> UpdateScheduler:
+    """Планировщик с параметрами из настроек TELEGRAM_UPDATE_*"""
+    return UpdateScheduler(
+        dispatcher,
+        bot,
+        workers=getattr(settings, 'TELEGRAM_UPDATE_WORKERS', 8),
+        queue_size=getattr(settings, 'TELEGRAM_UPDATE_QUEUE_SIZE', 1000),
+        metrics_interval=getattr(
+            settings, 'TELEGRAM_UPDATE_METRICS_INTERVAL', 0),
+    )
 
-    # Регистрация middleware
-    dp.message.middleware(AuthMiddleware())
-    dp.callback_query.middleware(AuthMiddleware())
-    dp.message.middleware(DatabaseMiddleware())
-    dp.callback_query.middleware(DatabaseMiddleware())
 
-    # Регистрация обработчиков
-    register_handlers(dp)
+class BotRuntime:
+    """Долгоживущие бот, диспетчер и планировщик процесса"""
 
-    return dp
+    def __init__(self):
+        self.bot = build_bot()
+        self.dispatcher = build_dispatcher()
+        self.scheduler = create_scheduler(self.dispatcher, self.bot)
+        self.submit_timeout = getattr(
+            settings, 'TELEGRAM_UPDATE_SUBMIT_TIMEOUT', 5)
+        self.loop = asyncio.get_running_loop()
+        self.scheduler.start()
+
+    def parse_update(self, data: dict) -> Update:
+        """Разбор JSON обновления с привязкой к боту"""
+        return Update.model_validate(data, context={'bot': self.bot})
+
+    async def submit(self, update: Update) -> bool:
+        """Постановка обновления в очередь с таймаутом ожидания места"""
+        return await self.scheduler.submit(update, timeout=self.submit_timeout)
+
+    async def stop(self):
+        """Остановка планировщика и закрытие соединений"""
+        await self.scheduler.stop()
+        logger.info(
+            f"Метрики обработки обновлений: {self.scheduler.metrics()}, "
+            f"БД: {get_db_executor().stats()}")
+        await self.dispatcher.storage.close()
+        await self.dispatcher.fsm.events_isolation.close()
+        await self.bot.session.close()
+
+
+_runtime: Optional[BotRuntime] = None
+
+
+def get_runtime() -> BotRuntime:
+    """
+    BotRuntime текущего процесса, создаётся при первом обращении
+
+    Должна вызываться из работающего event loop. Рантайм привязан к циклу,
+    в котором создан, поэтому webhook через Django требует ASGI-сервера
+    с постоянным циклом (uvicorn, daphne).
+    """
+    global _runtime
+    loop = asyncio.get_running_loop()
+    if _runtime is None or _runtime.loop is not loop:
+        if _runtime is not None:
+            logger.warning(
+                "Event loop сменился, BotRuntime создается заново. "
+                "Webhook должен работать под ASGI-сервером")
+        _runtime = BotRuntime()
+    return _runtime
+
+
+def is_valid_webhook_secret(token: Optional[str]) -> bool:
+    """Проверка секретного токена из заголовка webhook"""
+    return not TELEGRAM_WEBHOOK_SECRET or hmac.compare_digest(
+        (token or '').encode(), TELEGRAM_WEBHOOK_SECRET.encode())
 
 
 async def on_startup(bot: Bot):
     """Действия при запуске бота"""
     logger.info("Бот запущен!")
+    await bot.set_my_commands(BOT_COMMANDS)
 
     # Установка webhook
     if WEBHOOK_URL:
@@ -79,37 +372,104 @@ async def on_shutdown(bot: Bot):
 
 
 def create_webhook_app():
-    """Создание приложения для webhook"""
+    """
+    Создание aiohttp приложения для webhook
+
+    Бот, диспетчер и планировщик создаются один раз в on_startup, внутри
+    цикла, в котором работает приложение.
+    """
     app = web.Application()
 
-    # Создание бота и диспетчера
-    bot = asyncio.run(create_bot())
-    dp = asyncio.run(create_dispatcher())
+    async def handle_update(request):
+        if not is_valid_webhook_secret(request.headers.get(SECRET_HEADER)):
+            return web.json_response({'error': 'forbidden'}, status=403)
 
-    # Настройка webhook
-    webhook_handler = SimpleRequestHandler(
-        dispatcher=dp,
-        bot=bot,
-        secret_token=TELEGRAM_WEBHOOK_SECRET
-    )
+        runtime = get_runtime()
+        try:
+            update = runtime.parse_update(await request.json())
+        except ValueError as e:
+            return web.json_response({'error': str(e)}, status=400)
 
-    webhook_handler.register(app, path=WEBHOOK_PATH)
+        if not await runtime.submit(update):
+            # Telegram повторит доставку позже
+            return web.json_response({'error': 'overloaded'}, status=503)
+        return web.json_response({'status': 'ok'})
 
-    # Настройка приложения
-    setup_application(app, dp, bot=bot)
+    async def startup(app):
+        await on_startup(get_runtime().bot)
 
-    # Обработчики запуска и остановки
-    app.on_startup.append(lambda app: on_startup(bot))
-    app.on_shutdown.append(lambda app: on_shutdown(bot))
+    async def shutdown(app):
+        runtime = get_runtime()
+        await on_shutdown(runtime.bot)
+        await runtime.stop()
+
+    app.router.add_post(WEBHOOK_PATH, handle_update)
+    app.on_startup.append(startup)
+    app.on_shutdown.append(shutdown)
 
     return app
 
 
+def run_webhook(host: str = '127.0.0.1', port: int = 8081):
+    """Запуск бота в режиме webhook отдельным aiohttp сервером"""
+    web.run_app(create_webhook_app(), host=host, port=port)
+
+
+def set_webhook():
+    """Регистрация webhook для режима Django/ASGI"""
+    async def main():
+        bot = build_bot()
+        try:
+            await on_startup(bot)
+        finally:
+            await bot.session.close()
+
+    asyncio.run(main())
+
+
+async def poll_updates(bot: Bot, dp: Dispatcher, scheduler: UpdateScheduler,
+                       polling_timeout: int = 30):
+    """
+    Long polling с передачей обновлений в планировщик
+
+    Пока очередь планировщика заполнена, новые обновления не запрашиваются.
+    Сетевые ошибки повторяются с экспоненциальной задержкой, конфликт с
+    другим экземпляром бота прерывает polling.
+    """
+    backoff = Backoff(config=POLLING_BACKOFF)
+    allowed_updates = dp.resolve_used_update_types()
+    request_timeout = int((bot.session.timeout or 0) + polling_timeout)
+    offset = None
+
+    while True:
+        try:
+            updates = await bot.get_updates(
+                offset=offset,
+                timeout=polling_timeout,
+                allowed_updates=allowed_updates,
+                request_timeout=request_timeout,
+            )
+        except TelegramConflictError:
+            raise
+        except Exception as e:
+            logger.error(
+                f"Не удалось получить обновления: {e}. "
+                f"Повтор через {backoff.next_delay:.1f} с")
+            await backoff.asleep()
+            continue
+
+        backoff.reset()
+        for update in updates:
+            await scheduler.submit(update)
+            offset = update.update_id + 1
+
+
 def run_polling():
     """Запуск бота в режиме polling (для разработки)"""
     async def main():
         bot = await create_bot()
         dp = await create_dispatcher()
+        scheduler = create_scheduler(dp, bot)
 
         # Удаляем webhook перед запуском polling
         try:
@@ -120,8 +480,9 @@ def run_polling():
 
         logger.info("Бот запущен в режиме polling!")
 
+        scheduler.start()
         try:
-            await dp.start_polling(bot)
+            await poll_updates(bot, dp, scheduler)
         except Exception as e:
             error_msg = str(e)
             if 'Conflict' in error_msg and 'getUpdates' in error_msg:
@@ -135,6 +496,12 @@ def run_polling():
                 logger.error(f"Ошибка при запуске бота: {e}")
                 raise
         finally:
+            await scheduler.stop()
+            logger.info(
+                f"Метрики обработки обновлений: {scheduler.metrics()}, "
+                f"БД: {get_db_executor().stats()}")
+            await dp.storage.close()
+            await bot.session.close()
             logger.info("Бот остановлен!")
 
     asyncio.run(main())
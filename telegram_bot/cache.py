@@ -0,0 +1,83 @@
+"""
+Кэши в памяти процесса бота.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+_MISSING = object()
+
+
+class LRUTTLCache:
+    """
+    Потокобезопасный LRU-кэш с TTL записей
+
+    При переполнении вытесняется запись, к которой дольше всего не
+    обращались. Просроченная запись удаляется при чтении. Счётчики
+    hits/misses/evictions/expired доступны через stats().
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300,
+                 timer: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+
+            value, expires_at = item
+            if expires_at <= self._timer():
+                del self._data[key]
+                self.expired += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        expires_at = self._timer() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Размер кэша и счётчики с момента создания"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expired': self.expired,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
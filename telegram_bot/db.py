@@ -0,0 +1,146 @@
+"""
+Выполнение ORM-кода бота в выделенном пуле потоков.
+
+Django ORM синхронный, а соединение с БД привязано к потоку. При
+asyncio.to_thread вызовы попадают в произвольные потоки общего пула, и
+каждый новый поток открывает своё соединение. Здесь используется
+фиксированный пул из TELEGRAM_DB_WORKERS потоков: соединения живут в них
+постоянно (CONN_MAX_AGE) и проверяются (CONN_HEALTH_CHECKS) не чаще раза
+в check_interval секунд, а также после ошибки.
+
+unit_of_work() выполняет целую функцию ORM-кода обработчика за один
+переход и в одной транзакции БД.
+
+Открытия соединений в потоках пула считаются сигналом connection_created,
+так что churn виден в stats().
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+THREAD_NAME_PREFIX = 'bot-db'
+
+
+class DBExecutor:
+    """Пул потоков с постоянными соединениями Django"""
+
+    def __init__(self, max_workers: int = 4, check_interval: float = 30):
+        self.max_workers = max_workers
+        self.check_interval = check_interval
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=THREAD_NAME_PREFIX)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.errors = 0
+        self.connections_opened = 0
+        self.connection_checks = 0
+        self._threads = set()
+
+    async def run(self, func, *args, **kwargs):
+        """Выполняет func(*args, **kwargs) в потоке пула"""
+        loop = asyncio.get_running_loop()
+        # Контекстные переменные вызывающей задачи видны в потоке пула,
+        # как при asyncio.to_thread
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self._executor,
+            functools.partial(context.run, self._call, func, args, kwargs))
+
+    def _call(self, func, args, kwargs):
+        local = self._local
+        now = time.monotonic()
+        if getattr(local, 'dirty', True) or now - local.checked_at >= self.check_interval:
+            # Закрывает только просроченные и сломанные соединения,
+            # живое соединение потока переиспользуется
+            close_old_connections()
+            local.checked_at = now
+            local.dirty = False
+            with self._lock:
+                self.connection_checks += 1
+                self._threads.add(threading.get_ident())
+
+        with self._lock:
+            self.calls += 1
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            local.dirty = True
+            with self._lock:
+                self.errors += 1
+            raise
+
+    def on_connection_created(self):
+        with self._lock:
+            self.connections_opened += 1
+
+    def stats(self) -> dict:
+        """Вызовы, ошибки, открытые соединения и задействованные потоки"""
+        return {
+            'workers': self.max_workers,
+            'threads': len(self._threads),
+            'calls': self.calls,
+            'errors': self.errors,
+            'connections_opened': self.connections_opened,
+            'connection_checks': self.connection_checks,
+        }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+_db_executor: Optional[DBExecutor] = None
+_db_executor_lock = threading.Lock()
+
+
+def get_db_executor() -> DBExecutor:
+    """Пул потоков БД процесса с параметрами из настроек"""
+    global _db_executor
+    if _db_executor is None:
+        with _db_executor_lock:
+            if _db_executor is None:
+                _db_executor = DBExecutor(
+                    max_workers=getattr(settings, 'TELEGRAM_DB_WORKERS', 4),
+                    check_interval=getattr(
+                        settings, 'TELEGRAM_DB_CHECK_INTERVAL', 30),
+                )
+    return _db_executor
+
+
+async def run_db(func, *args, **kwargs):
+    """Выполнение синхронного ORM-кода в пуле потоков БД бота"""
+    return await get_db_executor().run(func, *args, **kwargs)
+
+
+async def unit_of_work(func, *args, **kwargs):
+    """
+    Выполняет func целиком в одном переходе в пул БД и в transaction.atomic
+
+    func должна возвращать простые значения (DTO), а не модели с ленивыми
+    связями: обращение к ним из event loop снова пошло бы в БД.
+    """
+    def atomic_call():
+        with transaction.atomic():
+            return func(*args, **kwargs)
+
+    return await run_db(atomic_call)
+
+
+def _count_connection(sender, connection, **kwargs):
+    if _db_executor is not None and threading.current_thread().name.startswith(THREAD_NAME_PREFIX):
+        _db_executor.on_connection_created()
+
+
+connection_created.connect(_count_connection, dispatch_uid='telegram_bot_db_executor')
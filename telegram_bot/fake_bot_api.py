@@ -0,0 +1,107 @@
+"""
+Локальная замена Telegram Bot API для профилирования бота без сети.
+
+FakeBotAPIServer - aiohttp-сервер с теми же адресами, что у Bot API
+(/bot<token>/<method>). На sendMessage и edit-методы он отвечает
+сообщением с правдоподобными полями, на остальные методы - True, и считает
+вызовы по методам. Бот подключается к нему через TelegramAPIServer:
+
+    server = FakeBotAPIServer()
+    await server.start()
+    bot = Bot(token, session=AiohttpSession(api=server.api_server()))
+
+latency добавляет к каждому ответу задержку, имитируя сеть до Telegram.
+"""
+import asyncio
+import json
+import socket
+import time
+from collections import Counter
+from typing import Optional
+
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+
+MESSAGE_METHODS = {'sendmessage', 'sendphoto', 'senddocument'}
+EDIT_METHODS = {'editmessagetext', 'editmessagereplymarkup', 'editmessagecaption'}
+
+
+class FakeBotAPIServer:
+    """aiohttp-сервер, отвечающий как Bot API"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.calls = Counter()
+        self._message_ids = Counter()
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def base_url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    def api_server(self) -> TelegramAPIServer:
+        return TelegramAPIServer.from_base(self.base_url)
+
+    def last_message_id(self, chat_id: int) -> int:
+        """Идентификатор последнего сообщения, отправленного ботом в чат"""
+        return self._message_ids[chat_id]
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+
+        # Порт 0 - свободный порт, выбранный системой
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        self.port = sock.getsockname()[1]
+        await web.SockSite(self._runner, sock).start()
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method'].lower()
+        token = request.match_info['token']
+        self.calls[method] += 1
+        params = await request.post()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return web.json_response({'ok': True, 'result': self._result(method, token, params)})
+
+    def _result(self, method: str, token: str, params):
+        if method == 'getme':
+            return {
+                'id': int(token.split(':', 1)[0]),
+                'is_bot': True,
+                'first_name': 'Fake bot',
+                'username': 'fake_bot',
+            }
+        if method in MESSAGE_METHODS:
+            chat_id = int(params['chat_id'])
+            self._message_ids[chat_id] += 1
+            return self._message(chat_id, self._message_ids[chat_id], params)
+        if method in EDIT_METHODS and 'chat_id' in params:
+            return self._message(int(params['chat_id']), int(params['message_id']), params)
+        return True
+
+    @staticmethod
+    def _message(chat_id: int, message_id: int, params) -> dict:
+        message = {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'text': params.get('text', ''),
+        }
+        if 'reply_markup' in params:
+            markup = json.loads(params['reply_markup'])
+            # В сообщении Telegram возвращает только inline-клавиатуру
+            if isinstance(markup, dict) and 'inline_keyboard' in markup:
+                message['reply_markup'] = markup
+        return message
@@ -2,12 +2,14 @@
 Обработчики баланса и статистики.
 """
 
-import asyncio
-
 from aiogram import F
 from aiogram.filters import Command
 from aiogram.types import Message
+from asgiref.sync import sync_to_async
 
+from accounting.services import rates
+from accounting.services.total_balance import base_currency_code
+from telegram_bot.repositories import WalletRepository
 from telegram_bot.utils import format_balance
 
 from .base import BaseHandler
@@ -26,13 +28,9 @@ class BalanceHandler(BaseHandler):
 
     async def cmd_balance(self, message: Message, django_user):
         """Показать баланс кошельков."""
-        from accounting.models.wallet import Wallet
         from telegram_bot.utils import get_currency_emoji
 
-        wallets = await asyncio.to_thread(
-            lambda: list(Wallet.objects.filter(
-                user=django_user).select_related('currency'))
-        )
+        wallets = await WalletRepository.list_for_user(django_user)
 
         if not wallets:
             await message.answer(
@@ -70,6 +68,19 @@ class BalanceHandler(BaseHandler):
 
             text += f"  📊 <b>Итого: {format_balance(currency_data['total_balance'])} {currency_code}</b>\n\n"
 
+        if len(wallets_by_currency) > 1:
+            # Матрица курсов строится из БД только после их обновления
+            matrix = await sync_to_async(rates.get_matrix)()
+            base_code = base_currency_code()
+            total, skipped = matrix.total(
+                [wallet.balance for wallet in wallets],
+                [wallet.currency.char_code for wallet in wallets],
+                to=base_code,
+            )
+            text += f"💼 <b>Всего: {format_balance(total)} {base_code}</b>\n"
+            if skipped:
+                text += f"<i>Без учета {', '.join(skipped)}: нет курса ЦБ</i>\n"
+
         await message.answer(text)
 
     async def btn_balance(self, message: Message, django_user):
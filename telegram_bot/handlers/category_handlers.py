@@ -2,7 +2,6 @@
 Обработчики категорий транзакций.
 """
 
-import asyncio
 import logging
 
 from aiogram import F
@@ -15,6 +14,7 @@ from telegram_bot.keyboards import (categories_keyboard,
                                     paginated_categories_keyboard,
                                     paginated_category_selection_keyboard,
                                     skip_keyboard)
+from telegram_bot.repositories import CategoryRepository
 
 from .base import BaseHandler, ErrorHandler, ResponseFormatter, StateManager
 from .states import CategoryStates
@@ -56,13 +56,7 @@ class CategoryHandler(BaseHandler):
 
     async def cmd_categories(self, message: Message, django_user, state: FSMContext):
         """Управление категориями."""
-        from accounting.models.transactionCategory import \
-            TransactionCategoryTree
-
-        categories = await asyncio.to_thread(
-            lambda: list(
-                TransactionCategoryTree.objects.filter(user=django_user))
-        )
+        categories = await CategoryRepository.entries(django_user)
 
         text = "📂 <b>Управление категориями</b>\n\n"
 
@@ -113,20 +107,15 @@ class CategoryHandler(BaseHandler):
         await state.update_data(description=description)
 
         # Получаем существующие категории для выбора родительской
-        from accounting.models.transactionCategory import \
-            TransactionCategoryTree
-        categories = await asyncio.to_thread(
-            lambda: list(
-                TransactionCategoryTree.objects.filter(user=django_user))
-        )
+        categories = await CategoryRepository.entries(django_user)
 
         self.logger.info(
             f"Found {len(categories)} existing categories for user {django_user}")
 
         if categories:
             await state.set_state(CategoryStates.waiting_for_parent)
-            # Сохраняем все категории в состоянии для пагинации
-            await state.update_data(all_categories=categories, current_page=0)
+            # В состоянии только номер страницы, категории берутся из кэша
+            await state.update_data(current_page=0)
             sent_message = await message.answer(
                 "📂 Выберите родительскую категорию:",
                 reply_markup=paginated_categories_keyboard(categories, page=0)
@@ -168,13 +157,8 @@ class CategoryHandler(BaseHandler):
         self.logger.info(
             f"Selecting parent category with UUID: {category_uuid}")
 
-        from accounting.models.transactionCategory import \
-            TransactionCategoryTree
-
         try:
-            parent_category = await asyncio.to_thread(
-                TransactionCategoryTree.objects.get, uuid=category_uuid, user=django_user
-            )
+            parent_category = await CategoryRepository.get(django_user, category_uuid)
 
             self.logger.info(f"Found parent category: {parent_category}")
 
@@ -210,9 +194,6 @@ class CategoryHandler(BaseHandler):
 
     async def _create_category(self, state: FSMContext, django_user, parent_category):
         """Создание категории."""
-        from accounting.models.transactionCategory import \
-            TransactionCategoryTree
-
         data = await state.get_data()
 
         # Логируем данные для отладки
@@ -222,27 +203,17 @@ class CategoryHandler(BaseHandler):
 
         try:
             # Проверяем уникальность названия категории для пользователя
-            existing_category = await asyncio.to_thread(
-                lambda: TransactionCategoryTree.objects.filter(
-                    user=django_user,
-                    title=data['title'],
-                    parent=parent_category
-                ).first()
-            )
-
-            if existing_category:
+            if await CategoryRepository.exists(django_user, data['title'], parent_category):
                 self.logger.warning(
                     f"Category with title '{data['title']}' already exists for user {django_user}")
                 raise ValueError(
                     f"Категория с названием '{data['title']}' уже существует")
 
-            category = await asyncio.to_thread(
-                lambda: TransactionCategoryTree.objects.create(
-                    user=django_user,
-                    parent=parent_category,
-                    title=data['title'],
-                    description=data['description']
-                )
+            category = await CategoryRepository.create(
+                django_user,
+                title=data['title'],
+                description=data['description'],
+                parent=parent_category,
             )
             self.logger.info(f"Category created successfully: {category}")
             return category
@@ -250,12 +221,11 @@ class CategoryHandler(BaseHandler):
             self.logger.error(f"Error creating category: {str(e)}")
             raise
 
-    async def callback_categories_page(self, callback: CallbackQuery, state: FSMContext):
+    async def callback_categories_page(self, callback: CallbackQuery, state: FSMContext, django_user):
         """Обработчик пагинации категорий."""
         try:
             page = int(callback.data.split("_")[-1])
-            data = await state.get_data()
-            categories = data.get('all_categories', [])
+            categories = await CategoryRepository.entries(django_user)
 
             if not categories:
                 await callback.answer("Категории не найдены")
@@ -274,12 +244,11 @@ class CategoryHandler(BaseHandler):
             self.logger.error(f"Error in callback_categories_page: {str(e)}")
             await callback.answer("Произошла ошибка при переключении страницы")
 
-    async def callback_category_select_page(self, callback: CallbackQuery, state: FSMContext):
+    async def callback_category_select_page(self, callback: CallbackQuery, state: FSMContext, django_user):
         """Обработчик пагинации выбора категории."""
         try:
             page = int(callback.data.split("_")[-1])
-            data = await state.get_data()
-            categories = data.get('all_categories', [])
+            categories = await CategoryRepository.entries(django_user)
 
             if not categories:
                 await callback.answer("Категории не найдены")
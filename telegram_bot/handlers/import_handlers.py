@@ -0,0 +1,119 @@
+"""
+Обработчики импорта банковских выписок.
+"""
+
+from html import escape
+
+from aiogram import Bot, F
+from aiogram.fsm.context import FSMContext
+from aiogram.types import CallbackQuery, Message
+
+from accounting.models.wallet import Wallet
+from accounting.services import statement_import
+from telegram_bot.db import run_db
+from telegram_bot.keyboards import import_wallet_keyboard
+from telegram_bot.repositories import WalletRepository
+
+from .base import BaseHandler, ErrorHandler, ResponseFormatter, StateManager
+from .states import ImportStates
+
+EXTENSIONS = ('.csv', '.ofx', '.qfx')
+
+# Bot API не отдает боту файлы больше 20 МБ
+MAX_FILE_SIZE = 20 * 1024 * 1024
+
+
+class ImportHandler(BaseHandler):
+    """Обработчик импорта выписок."""
+
+    def _register_handlers(self):
+        """Регистрация обработчиков импорта."""
+        self.router.message.register(
+            self.process_document,
+            F.document.file_name.lower().endswith(EXTENSIONS))
+
+        # Callback обработчики
+        self.router.callback_query.register(
+            self.callback_select_wallet,
+            ImportStates.waiting_for_wallet, F.data.startswith("import_wallet_"))
+        self.router.callback_query.register(
+            self.callback_cancel, F.data == "import_cancel")
+
+    async def process_document(self, message: Message, django_user, state: FSMContext):
+        """Файл выписки: импорт сразу или после выбора кошелька."""
+        document = message.document
+        if document.file_size and document.file_size > MAX_FILE_SIZE:
+            await message.answer(ResponseFormatter.format_error_message(
+                "Файл слишком большой",
+                ["Бот может скачать файл до 20 МБ"]))
+            return
+
+        wallets = await WalletRepository.list_for_user(django_user)
+        if not wallets:
+            await message.answer("❌ Сначала создайте кошелек командой /wallets")
+            return
+
+        if len(wallets) == 1:
+            await self._import(message, message.bot, django_user,
+                               document.file_id, document.file_name, wallets[0].uuid)
+            return
+
+        await StateManager.cleanup_previous_inline_keyboards(message, state)
+        await state.set_state(ImportStates.waiting_for_wallet)
+        await state.update_data(import_file_id=document.file_id,
+                                import_file_name=document.file_name)
+        sent_message = await message.answer(
+            "📥 <b>Импорт выписки</b>\n\n"
+            "Выберите кошелек для операций без колонки кошелька:",
+            reply_markup=import_wallet_keyboard(wallets)
+        )
+        await StateManager.save_message_with_keyboard(sent_message, state)
+
+    async def callback_select_wallet(self, callback: CallbackQuery, django_user, state: FSMContext):
+        """Выбор кошелька для импорта."""
+        wallet_uuid = callback.data.split("_")[-1]
+        data = await state.get_data()
+        await state.clear()
+        await callback.message.edit_reply_markup(reply_markup=None)
+        await callback.answer()
+        await self._import(callback.message, callback.bot, django_user,
+                           data['import_file_id'], data['import_file_name'], wallet_uuid)
+
+    async def callback_cancel(self, callback: CallbackQuery, state: FSMContext):
+        """Отмена импорта."""
+        await StateManager.cleanup_previous_inline_keyboards(callback.message, state)
+        await state.clear()
+        await callback.message.edit_text("❌ Импорт отменен", reply_markup=None)
+        await callback.answer("Импорт отменен")
+
+    async def _import(self, message: Message, bot: Bot, django_user,
+                      file_id: str, file_name: str, wallet_uuid):
+        """Скачивание файла и импорт в пуле БД."""
+        status = await message.answer("⏳ Импортирую выписку...")
+        try:
+            stream = await bot.download(file_id)
+            result = await run_db(
+                statement_import.import_file, django_user, stream,
+                filename=file_name, wallet=wallet_uuid)
+        except statement_import.StatementFormatError as e:
+            await status.edit_text(ResponseFormatter.format_error_message(
+                "Не удалось прочитать выписку", [escape(str(e), quote=False)]))
+            return
+        except Wallet.DoesNotExist:
+            await status.edit_text("❌ Кошелек не найден")
+            return
+        except Exception as e:
+            self.logger.error(f"Ошибка импорта выписки: {e}")
+            await status.edit_text(ErrorHandler.handle_general_error(e))
+            return
+
+        details = [
+            f"📄 Строк: {result.rows}",
+            f"➕ Добавлено: {result.created}",
+            f"🔁 Уже были: {result.duplicates}",
+        ]
+        if result.skipped:
+            details.append(f"⚠️ С ошибками: {result.skipped}")
+            details.extend(f"• {escape(error, quote=False)}" for error in result.errors[:5])
+        await status.edit_text(ResponseFormatter.format_success_message(
+            "Выписка импортирована", details))
@@ -6,6 +6,7 @@ from aiogram import Dispatcher
 
 from .balance_handlers import BalanceHandler
 from .category_handlers import CategoryHandler
+from .import_handlers import ImportHandler
 from .settings_handlers import SettingsHandler
 from .transaction_handlers import TransactionHandler
 from .wallet_handlers import WalletHandler
@@ -22,6 +23,7 @@ def register_handlers(dp: Dispatcher):
     # Создаем экземпляры обработчиков
     balance_handler = BalanceHandler()
     category_handler = CategoryHandler()
+    import_handler = ImportHandler()
     settings_handler = SettingsHandler()
     transaction_handler = TransactionHandler()
     wallet_handler = WalletHandler()
@@ -30,6 +32,7 @@ def register_handlers(dp: Dispatcher):
     # Регистрируем роутеры в диспетчере
     dp.include_router(balance_handler.get_router())
     dp.include_router(category_handler.get_router())
+    dp.include_router(import_handler.get_router())
     dp.include_router(settings_handler.get_router())
     dp.include_router(transaction_handler.get_router())
     dp.include_router(wallet_handler.get_router())
@@ -6,7 +6,9 @@ from aiogram import F
 from aiogram.filters import Command, CommandStart
 from aiogram.types import Message
 
+from accounting.services.total_balance import base_currency_code
 from telegram_bot.keyboards import main_menu_keyboard
+from telegram_bot.repositories import UserRepository
 from telegram_bot.utils import format_balance
 
 from .base import BaseHandler
@@ -36,7 +38,8 @@ class SettingsHandler(BaseHandler):
             text += f"Для начала создайте кошелек командой /wallets"
         else:
             text = f"👋 С возвращением, {django_user.first_name}!\n\n"
-            text += f"Ваш общий баланс: {format_balance(django_user.total_balance)}"
+            total = await UserRepository.total_balance(django_user)
+            text += f"Ваш общий баланс: {format_balance(total)} {base_currency_code()}"
 
         await message.answer(
             text,
@@ -53,6 +56,7 @@ class SettingsHandler(BaseHandler):
         text += "/wallets - Управление кошельками\n"
         text += "/categories - Управление категориями\n"
         text += "/help - Показать эту справку\n\n"
+        text += "📥 Пришлите файл выписки CSV или OFX, чтобы импортировать операции\n\n"
         text += "💡 <i>Используйте кнопки меню для быстрого доступа к функциям</i>"
 
         await message.answer(text)
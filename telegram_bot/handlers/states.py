@@ -34,6 +34,11 @@ class TransactionCategoryStates(StatesGroup):
     waiting_for_parent = State()
 
 
+class ImportStates(StatesGroup):
+    """Состояния для импорта выписки."""
+    waiting_for_wallet = State()
+
+
 class SettingsStates(StatesGroup):
     """Состояния для настроек."""
     waiting_for_language = State()
@@ -2,9 +2,7 @@
 Обработчики транзакций (доходы и расходы).
 """
 
-import asyncio
 import logging
-from decimal import Decimal
 
 from aiogram import F
 from aiogram.filters import Command
@@ -15,6 +13,9 @@ from telegram_bot.keyboards import (category_selection_keyboard,
                                     paginated_category_selection_keyboard,
                                     skip_keyboard, transaction_type_keyboard,
                                     wallet_selection_keyboard)
+from telegram_bot.operations import CategoryExists
+from telegram_bot.repositories import (CategoryRepository, TransactionRepository,
+                                       WalletRepository)
 from telegram_bot.utils import validate_amount
 
 from .base import BaseHandler, ErrorHandler, ResponseFormatter, StateManager
@@ -101,10 +102,10 @@ class TransactionHandler(BaseHandler):
 
     async def process_amount(self, message: Message, state: FSMContext, django_user):
         """Обработка введенной суммы."""
-        amount = validate_amount(message.text)
+        is_valid, amount, error = validate_amount(message.text)
 
-        if amount is None:
-            await message.answer("❌ Неверный формат суммы! Введите положительное число.")
+        if not is_valid:
+            await message.answer(f"❌ {error}! Введите положительное число.")
             return
 
         await state.update_data(amount=amount)
@@ -121,12 +122,7 @@ class TransactionHandler(BaseHandler):
         await state.update_data(description=message.text)
         await state.set_state(TransactionStates.waiting_for_wallet)
 
-        from accounting.models.wallet import Wallet
-
-        wallets = await asyncio.to_thread(
-            lambda: list(Wallet.objects.filter(
-                user=django_user).select_related('currency'))
-        )
+        wallets = await WalletRepository.list_for_user(django_user)
 
         if not wallets:
             await message.answer(
@@ -143,31 +139,17 @@ class TransactionHandler(BaseHandler):
         """Выбор кошелька для транзакции."""
         wallet_uuid = callback.data.split("_")[-1]
 
-        from accounting.models.wallet import Wallet
-
         try:
-            wallet = await asyncio.to_thread(
-                Wallet.objects.select_related(
-                    'currency').get, uuid=wallet_uuid, user=django_user
-            )
-
-            data = await state.get_data()
-            data['wallet_uuid'] = wallet_uuid
             await state.update_data(wallet_uuid=wallet_uuid)
 
             # Получаем категории пользователя
-            from accounting.models.transactionCategory import \
-                TransactionCategoryTree
-            categories = await asyncio.to_thread(
-                lambda: list(
-                    TransactionCategoryTree.objects.filter(user=django_user))
-            )
+            categories = await CategoryRepository.entries(django_user)
 
             if categories:
                 await StateManager.cleanup_previous_inline_keyboards(callback.message, state)
                 await state.set_state(TransactionStates.waiting_for_category)
-                # Сохраняем категории для пагинации
-                await state.update_data(all_categories=categories, current_page=0)
+                # В состоянии только номер страницы, категории берутся из кэша
+                await state.update_data(current_page=0)
                 await callback.message.edit_text(
                     f"📂 Выберите категорию для транзакции:",
                     reply_markup=paginated_category_selection_keyboard(
@@ -175,18 +157,16 @@ class TransactionHandler(BaseHandler):
                 )
             else:
                 # Создаем транзакцию без категории
-                transaction, updated_wallet = await self._create_transaction(state, django_user, wallet, None)
+                tx = await self._create_transaction(state, django_user, wallet_uuid)
 
-                # Получаем обновленные данные состояния
-                updated_data = await state.get_data()
                 await StateManager.cleanup_previous_inline_keyboards(callback.message, state)
                 await callback.message.edit_text(
                     ResponseFormatter.format_success_message(
                         "Транзакция добавлена!",
                         [
-                            f"💰 Сумма: {updated_data['amount']} {updated_wallet.currency.char_code}",
-                            f"📝 Описание: {updated_data['description']}",
-                            f"💳 Кошелек: {updated_wallet.title}"
+                            f"💰 Сумма: {tx.amount} {tx.wallet.currency_code}",
+                            f"📝 Описание: {tx.description}",
+                            f"💳 Кошелек: {tx.wallet.title}"
                         ]
                     ),
                     reply_markup=None
@@ -207,15 +187,7 @@ class TransactionHandler(BaseHandler):
         """Выбор категории для транзакции."""
         category_uuid = callback.data.split("_")[-1]
 
-        from accounting.models.transactionCategory import \
-            TransactionCategoryTree
-        from accounting.models.wallet import Wallet
-
         try:
-            category = await asyncio.to_thread(
-                TransactionCategoryTree.objects.get, uuid=category_uuid, user=django_user
-            )
-
             data = await state.get_data()
 
             if 'wallet_uuid' not in data:
@@ -227,22 +199,18 @@ class TransactionHandler(BaseHandler):
                 await callback.answer("Произошла ошибка")
                 return
 
-            wallet = await asyncio.to_thread(
-                Wallet.objects.select_related(
-                    'currency').get, uuid=data['wallet_uuid'], user=django_user
-            )
-
-            transaction, updated_wallet = await self._create_transaction(state, django_user, wallet, category)
+            tx = await self._create_transaction(
+                state, django_user, data['wallet_uuid'], category_uuid)
 
             await StateManager.cleanup_previous_inline_keyboards(callback.message, state)
             await callback.message.edit_text(
                 ResponseFormatter.format_success_message(
                     "Транзакция добавлена!",
                     [
-                        f"💰 Сумма: {data['amount']} {updated_wallet.currency.char_code}",
-                        f"📝 Описание: {data['description']}",
-                        f"📂 Категория: {category.title}",
-                        f"💳 Кошелек: {updated_wallet.title}"
+                        f"💰 Сумма: {tx.amount} {tx.wallet.currency_code}",
+                        f"📝 Описание: {tx.description}",
+                        f"📂 Категория: {tx.category.title}",
+                        f"💳 Кошелек: {tx.wallet.title}"
                     ]
                 ),
                 reply_markup=None
@@ -261,8 +229,6 @@ class TransactionHandler(BaseHandler):
 
     async def callback_no_category(self, callback: CallbackQuery, state: FSMContext, django_user):
         """Создание транзакции без категории."""
-        from accounting.models.wallet import Wallet
-
         try:
             data = await state.get_data()
 
@@ -275,21 +241,17 @@ class TransactionHandler(BaseHandler):
                 await callback.answer("Произошла ошибка")
                 return
 
-            wallet = await asyncio.to_thread(
-                Wallet.objects.select_related(
-                    'currency').get, uuid=data['wallet_uuid'], user=django_user
-            )
-
-            transaction, updated_wallet = await self._create_transaction(state, django_user, wallet, None)
+            tx = await self._create_transaction(
+                state, django_user, data['wallet_uuid'])
 
             await StateManager.cleanup_previous_inline_keyboards(callback.message, state)
             await callback.message.edit_text(
                 ResponseFormatter.format_success_message(
                     "Транзакция добавлена!",
                     [
-                        f"💰 Сумма: {data['amount']} {updated_wallet.currency.char_code}",
-                        f"📝 Описание: {data['description']}",
-                        f"💳 Кошелек: {updated_wallet.title}"
+                        f"💰 Сумма: {tx.amount} {tx.wallet.currency_code}",
+                        f"📝 Описание: {tx.description}",
+                        f"💳 Кошелек: {tx.wallet.title}"
                     ]
                 ),
                 reply_markup=None
@@ -312,62 +274,32 @@ class TransactionHandler(BaseHandler):
         await callback.message.edit_text("❌ Транзакция отменена", reply_markup=None)
         await callback.answer("Транзакция отменена")
 
-    async def _create_transaction(self, state: FSMContext, django_user, wallet, category):
-        """Создание транзакции."""
-        from django.db.models import Sum
-
-        from accounting.models.transaction import Transaction
-        from accounting.models.wallet import Wallet
+    async def _create_transaction(self, state: FSMContext, django_user, wallet_uuid, category_uuid=None):
+        """
+        Создание транзакции
 
+        Кошелек, категория, транзакция и новый баланс читаются и пишутся
+        одной функцией за один переход в пул БД и в одной транзакции.
+        """
         data = await state.get_data()
 
-        # Логируем данные для отладки
-        self.logger.info(f"Creating transaction: user={django_user.username}, wallet={wallet.title}, "
+        self.logger.info(f"Creating transaction: user={django_user.username}, wallet={wallet_uuid}, "
                          f"type={data['transaction_type']}, amount={data['amount']}, "
                          f"description={data['description']}")
 
-        transaction = await asyncio.to_thread(
-            lambda: Transaction.objects.create(
-                user=django_user,
-                wallet=wallet,
-                category=category,
-                t_type=data['transaction_type'],
-                amount=Decimal(str(data['amount'])),
-                description=data['description']
-            )
+        tx = await TransactionRepository.add(
+            django_user,
+            wallet_uuid,
+            data['transaction_type'],
+            data['amount'],
+            data['description'],
+            category_uuid=category_uuid,
         )
 
-        # Принудительно обновляем баланс кошелька
-        await asyncio.to_thread(
-            lambda: wallet.refresh_from_db()
-        )
-
-        # Пересчитываем баланс на основе всех транзакций
-        total_income = await asyncio.to_thread(
-            lambda: Transaction.objects.filter(wallet=wallet, t_type='IN').aggregate(
-                total=Sum('amount'))['total'] or Decimal('0')
-        )
-        total_expense = await asyncio.to_thread(
-            lambda: Transaction.objects.filter(wallet=wallet, t_type='EX').aggregate(
-                total=Sum('amount'))['total'] or Decimal('0')
-        )
-
-        new_balance = total_income - total_expense
-        await asyncio.to_thread(
-            lambda: Wallet.objects.filter(
-                uuid=wallet.uuid).update(balance=new_balance)
-        )
-
-        # Обновляем объект кошелька из базы данных
-        wallet = await asyncio.to_thread(
-            Wallet.objects.select_related('currency').get, uuid=wallet.uuid
-        )
-
-        # Логируем результат
         self.logger.info(
-            f"Transaction created: {transaction.uuid}, wallet balance after: {wallet.balance}")
+            f"Transaction created: {tx.uuid}, wallet balance after: {tx.wallet.balance}")
 
-        return transaction, wallet
+        return tx
 
     async def callback_create_new_category(self, callback: CallbackQuery, state: FSMContext, django_user):
         """Начало создания новой категории во время транзакции."""
@@ -419,12 +351,7 @@ class TransactionHandler(BaseHandler):
         await state.update_data(category_description=description)
 
         # Получаем существующие категории для выбора родительской
-        from accounting.models.transactionCategory import \
-            TransactionCategoryTree
-        categories = await asyncio.to_thread(
-            lambda: list(
-                TransactionCategoryTree.objects.filter(user=django_user))
-        )
+        categories = await CategoryRepository.entries(django_user)
 
         if categories:
             await state.set_state(TransactionCategoryStates.waiting_for_parent)
@@ -455,15 +382,8 @@ class TransactionHandler(BaseHandler):
         """Выбор родительской категории для транзакции."""
         category_uuid = callback.data.split("_")[1]  # tcp_uuid -> uuid
 
-        from accounting.models.transactionCategory import \
-            TransactionCategoryTree
-
         try:
-            parent_category = await asyncio.to_thread(
-                TransactionCategoryTree.objects.get, uuid=category_uuid, user=django_user
-            )
-
-            await self._create_transaction_category(state, django_user, parent_category, callback.message)
+            await self._create_transaction_category(state, django_user, category_uuid, callback.message)
             await callback.answer("Категория успешно создана!")
 
         except Exception as e:
@@ -475,23 +395,22 @@ class TransactionHandler(BaseHandler):
             )
             await callback.answer("Произошла ошибка")
 
-    async def _create_transaction_category(self, state: FSMContext, django_user, parent_category, message_or_callback):
-        """Создание категории и продолжение транзакции."""
-        from accounting.models.transactionCategory import \
-            TransactionCategoryTree
-
+    async def _create_transaction_category(self, state: FSMContext, django_user, parent_uuid, message_or_callback):
+        """Создание категории и транзакции в ней за один переход в пул БД."""
         data = await state.get_data()
 
-        # Проверяем уникальность названия категории для пользователя
-        existing_category = await asyncio.to_thread(
-            lambda: TransactionCategoryTree.objects.filter(
-                user=django_user,
-                title=data['category_title'],
-                parent=parent_category
-            ).first()
-        )
-
-        if existing_category:
+        try:
+            tx = await TransactionRepository.add_with_new_category(
+                django_user,
+                parent_uuid,
+                data['category_title'],
+                data['category_description'],
+                data['transaction_wallet_uuid'],
+                data['transaction_type'],
+                data['transaction_amount'],
+                data['transaction_description'],
+            )
+        except CategoryExists:
             error_msg = f"❌ Категория с названием '{data['category_title']}' уже существует"
             if hasattr(message_or_callback, 'edit_text'):
                 await message_or_callback.edit_text(error_msg, reply_markup=None)
@@ -499,46 +418,14 @@ class TransactionHandler(BaseHandler):
                 await message_or_callback.answer(error_msg)
             return
 
-        # Создаем категорию
-        category = await asyncio.to_thread(
-            lambda: TransactionCategoryTree.objects.create(
-                user=django_user,
-                parent=parent_category,
-                title=data['category_title'],
-                description=data['category_description']
-            )
-        )
-
-        # Восстанавливаем данные транзакции
-        await state.update_data(
-            amount=data['transaction_amount'],
-            description=data['transaction_description'],
-            transaction_type=data['transaction_type'],
-            wallet_uuid=data['transaction_wallet_uuid']
-        )
-
-        # Возвращаемся к состоянию выбора категории и сразу выбираем созданную
-        await state.set_state(TransactionStates.waiting_for_category)
-
-        # Получаем кошелек
-        from accounting.models.wallet import Wallet
-        wallet = await asyncio.to_thread(
-            Wallet.objects.select_related('currency').get,
-            uuid=data['transaction_wallet_uuid'],
-            user=django_user
-        )
-
-        # Создаем транзакцию с новой категорией
-        transaction, updated_wallet = await self._create_transaction(state, django_user, wallet, category)
-
         # Отправляем сообщение об успехе
         success_message = ResponseFormatter.format_success_message(
             "Транзакция добавлена!",
             [
-                f"💰 Сумма: {data['transaction_amount']} {updated_wallet.currency.char_code}",
-                f"📝 Описание: {data['transaction_description']}",
-                f"📂 Категория: {category.title}",
-                f"💳 Кошелек: {updated_wallet.title}"
+                f"💰 Сумма: {tx.amount} {tx.wallet.currency_code}",
+                f"📝 Описание: {tx.description}",
+                f"📂 Категория: {tx.category.title}",
+                f"💳 Кошелек: {tx.wallet.title}"
             ]
         )
 
@@ -577,12 +464,11 @@ class TransactionHandler(BaseHandler):
         builder.adjust(1)
         return builder.as_markup()
 
-    async def callback_category_select_page(self, callback: CallbackQuery, state: FSMContext):
+    async def callback_category_select_page(self, callback: CallbackQuery, state: FSMContext, django_user):
         """Обработчик пагинации выбора категории в транзакции."""
         try:
             page = int(callback.data.split("_")[-1])
-            data = await state.get_data()
-            categories = data.get('all_categories', [])
+            categories = await CategoryRepository.entries(django_user)
 
             if not categories:
                 await callback.answer("Категории не найдены")
@@ -2,7 +2,6 @@
 Обработчики кошельков.
 """
 
-import asyncio
 import logging
 
 from aiogram import F
@@ -12,6 +11,7 @@ from aiogram.types import CallbackQuery, Message
 
 from telegram_bot.keyboards import (currency_selection_keyboard, skip_keyboard,
                                     wallets_keyboard)
+from telegram_bot.repositories import WalletRepository
 from telegram_bot.utils import format_balance
 
 from .base import BaseHandler, ErrorHandler, ResponseFormatter, StateManager
@@ -45,12 +45,7 @@ class WalletHandler(BaseHandler):
 
     async def cmd_wallets(self, message: Message, django_user, state: FSMContext):
         """Управление кошельками."""
-        from accounting.models.wallet import Wallet
-
-        wallets = await asyncio.to_thread(
-            lambda: list(Wallet.objects.filter(
-                user=django_user).select_related('currency'))
-        )
+        wallets = await WalletRepository.list_for_user(django_user)
 
         text = "💳 <b>Управление кошельками</b>\n\n"
 
@@ -109,29 +104,15 @@ class WalletHandler(BaseHandler):
         """Выбор валюты для кошелька."""
         currency_code = callback.data.split("_")[-1]
 
-        from accounting.models.currencyCBR import CurrencyCBR
-        from accounting.models.wallet import Wallet
-
         try:
-            currency = await asyncio.to_thread(
-                CurrencyCBR.objects.get, char_code=currency_code
-            )
-
             data = await state.get_data()
 
-            # Создаем кошелек
-            wallet = await asyncio.to_thread(
-                lambda: Wallet.objects.create(
-                    user=django_user,
-                    title=data['title'],
-                    description=data['description'],
-                    currency=currency
-                )
-            )
-
-            # Получаем кошелек с загруженной валютой для отображения
-            wallet = await asyncio.to_thread(
-                Wallet.objects.select_related('currency').get, uuid=wallet.uuid
+            # Создаем кошелек, валюта уже загружена в экземпляр
+            wallet = await WalletRepository.create(
+                django_user,
+                title=data['title'],
+                description=data['description'],
+                currency_code=currency_code,
             )
 
             await StateManager.cleanup_previous_inline_keyboards(callback.message, state)
@@ -132,6 +132,26 @@ def wallet_selection_keyboard(wallets):
     return builder.as_markup()
 
 
+def import_wallet_keyboard(wallets):
+    """Клавиатура для выбора кошелька импорта выписки"""
+    builder = InlineKeyboardBuilder()
+
+    for wallet in wallets:
+        builder.add(InlineKeyboardButton(
+            text=f"{wallet.title} ({wallet.currency.char_code})",
+            callback_data=f"import_wallet_{wallet.uuid}"
+        ))
+
+    builder.add(InlineKeyboardButton(
+        text="❌ Отмена",
+        callback_data="import_cancel"
+    ))
+
+    builder.adjust(1)
+
+    return builder.as_markup()
+
+
 def category_selection_keyboard(categories, for_parent=False):
     """Клавиатура для выбора категории"""
     builder = InlineKeyboardBuilder()
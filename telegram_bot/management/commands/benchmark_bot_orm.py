@@ -0,0 +1,191 @@
+"""
+Сравнение способов вызова ORM из обработчиков бота.
+
+Каждое "обновление" повторяет запросы /balance и выбора категории:
+кошельки пользователя, список категорий и суммы транзакций. Обновления
+выполняются конкурентно тремя способами:
+
+    to_thread - лямбды в asyncio.to_thread, как было в обработчиках;
+    pool      - telegram_bot.db.run_db, фиксированный пул потоков;
+    native    - telegram_bot.repositories, асинхронный API QuerySet.
+
+Для каждого способа печатаются задержки обновления, пик числа потоков
+процесса сверх исходного и число открытых соединений с БД. Данные
+создаются во временном пользователе и удаляются после замера.
+"""
+import asyncio
+import statistics
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.backends.signals import connection_created
+from django.db.models import Q, Sum
+
+from accounting.models.transaction import Transaction
+from accounting.models.transactionCategory import TransactionCategoryTree
+from accounting.models.wallet import Wallet
+from accounting.services import currencies
+from accounting.services.category_tree import get_entries
+from telegram_bot.db import run_db
+from telegram_bot.repositories import (CategoryRepository, TransactionRepository,
+                                       WalletRepository)
+
+User = get_user_model()
+
+MODES = ('to_thread', 'pool', 'native')
+
+
+def _list_wallets(user):
+    return list(Wallet.objects.filter(user=user).select_related('currency'))
+
+
+def _totals(user):
+    return Transaction.objects.filter(user=user).aggregate(
+        income=Sum('amount', filter=Q(t_type='IN')),
+        expense=Sum('amount', filter=Q(t_type='EX')),
+    )
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает задержки и число потоков: asyncio.to_thread, пул БД и асинхронный ORM'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--updates',
+            type=int,
+            default=1000,
+            help='Количество обновлений на способ'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=50,
+            help='Количество одновременно обрабатываемых обновлений'
+        )
+        parser.add_argument(
+            '--wallets',
+            type=int,
+            default=5,
+            help='Кошельков у тестового пользователя'
+        )
+        parser.add_argument(
+            '--categories',
+            type=int,
+            default=30,
+            help='Категорий у тестового пользователя'
+        )
+        parser.add_argument(
+            '--mode',
+            choices=MODES,
+            action='append',
+            help='Замерять только указанные способы (можно повторять)'
+        )
+
+    def handle(self, *args, **options):
+        if options['updates'] <= 0 or options['concurrency'] <= 0:
+            raise CommandError('--updates и --concurrency должны быть больше 0')
+
+        user = self._seed(options['wallets'], options['categories'])
+        try:
+            for mode in options['mode'] or MODES:
+                result = asyncio.run(self._measure(
+                    mode, user, options['updates'], options['concurrency']))
+                self._report(mode, result)
+        finally:
+            user.delete()
+
+    def _seed(self, wallets, categories):
+        currency = currencies.default()
+        user = User.objects.create(username=f'benchmark_{uuid.uuid4().hex[:12]}')
+        wallet_objs = Wallet.objects.bulk_create([
+            Wallet(user=user, title=f'Кошелек {i}', currency=currency,
+                   balance=Decimal('1000.00'))
+            for i in range(wallets)
+        ])
+        parent = None
+        for i in range(categories):
+            category = TransactionCategoryTree.objects.create(
+                user=user, title=f'Категория {i}', parent=parent if i % 3 else None)
+            parent = category
+        if wallet_objs:
+            Transaction.objects.bulk_create([
+                Transaction(user=user, wallet=wallet_objs[i % len(wallet_objs)],
+                            t_type='IN' if i % 2 else 'EX',
+                            amount=Decimal('10.00'))
+                for i in range(wallets * 20)
+            ])
+        return user
+
+    async def _update(self, mode, user):
+        if mode == 'to_thread':
+            await asyncio.to_thread(_list_wallets, user)
+            await asyncio.to_thread(get_entries, user.pk)
+            await asyncio.to_thread(_totals, user)
+        elif mode == 'pool':
+            await run_db(_list_wallets, user)
+            await run_db(get_entries, user.pk)
+            await run_db(_totals, user)
+        else:
+            await WalletRepository.list_for_user(user)
+            await CategoryRepository.entries(user)
+            await TransactionRepository.totals(user)
+
+    async def _measure(self, mode, user, updates, concurrency):
+        baseline_threads = threading.active_count()
+        peak_threads = baseline_threads
+        connections = 0
+
+        def on_connection(**kwargs):
+            nonlocal connections
+            connections += 1
+
+        connection_created.connect(on_connection, weak=False)
+
+        async def sample_threads():
+            nonlocal peak_threads
+            while True:
+                peak_threads = max(peak_threads, threading.active_count())
+                await asyncio.sleep(0.001)
+
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def one_update():
+            async with semaphore:
+                started = time.perf_counter()
+                await self._update(mode, user)
+                latencies.append(time.perf_counter() - started)
+
+        sampler = asyncio.create_task(sample_threads())
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(one_update() for _ in range(updates)))
+        finally:
+            elapsed = time.perf_counter() - started
+            sampler.cancel()
+            connection_created.disconnect(on_connection)
+
+        return {
+            'latencies': latencies,
+            'elapsed': elapsed,
+            'extra_threads': peak_threads - baseline_threads,
+            'connections': connections,
+        }
+
+    def _report(self, mode, result):
+        values = sorted(result['latencies'])
+        p95 = values[int(len(values) * 0.95) - 1] if len(values) > 1 else values[0]
+        self.stdout.write(self.style.SUCCESS(mode))
+        self.stdout.write(
+            f'  задержка обновления: p50={statistics.median(values) * 1e3:7.2f} мс  '
+            f'p95={p95 * 1e3:7.2f} мс  max={values[-1] * 1e3:7.2f} мс'
+        )
+        self.stdout.write(
+            f'  обновлений/с: {len(values) / result["elapsed"]:.0f}  '
+            f'потоков сверх исходных (пик): {result["extra_threads"]}  '
+            f'новых соединений с БД: {result["connections"]}'
+        )
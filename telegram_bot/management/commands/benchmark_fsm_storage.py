@@ -0,0 +1,142 @@
+"""
+Замер задержек чтения/записи FSM состояния для разных хранилищ.
+
+По умолчанию Redis эмулируется через fakeredis (pip install fakeredis), так
+что команду можно запускать локально без сервера. С --redis-url замер идёт
+против настоящего Redis.
+"""
+import asyncio
+import statistics
+import time
+from decimal import Decimal
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from telegram_bot.storage import (DEFAULT_STATE_TTL, PackedRedisStorage,
+                                  StateDataCodec, msgpack)
+
+BOT_ID = 1
+
+# Типичные данные диалога создания транзакции
+SAMPLE_DATA = {
+    'transaction_type': 'EX',
+    'amount': Decimal('1234.50'),
+    'description': 'Продукты на неделю',
+    'wallet_uuid': '2f0c8a52-3f64-4d8e-9a3e-5a8b1f3d9c11',
+    'current_page': 3,
+    'messages_with_keyboards': [1001, 1002, 1003],
+}
+
+
+class Command(BaseCommand):
+    help = 'Замеряет задержки чтения/записи FSM состояния (memory, Redis/fakeredis)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=2000,
+            help='Количество шагов диалога на хранилище'
+        )
+        parser.add_argument(
+            '--chats',
+            type=int,
+            default=100,
+            help='Количество разных чатов'
+        )
+        parser.add_argument(
+            '--redis-url',
+            help='Замерять против настоящего Redis вместо fakeredis'
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] <= 0 or options['chats'] <= 0:
+            raise CommandError('--iterations и --chats должны быть больше 0')
+
+        asyncio.run(self._run(options))
+
+    async def _run(self, options):
+        storages = [('memory', MemoryStorage())]
+        codecs = [StateDataCodec(use_msgpack=False)]
+        if msgpack is not None:
+            codecs.append(StateDataCodec(use_msgpack=True))
+
+        for codec in codecs:
+            redis = self._create_redis(options['redis_url'])
+            storages.append((
+                f'redis/{codec.name}',
+                PackedRedisStorage(
+                    redis=redis,
+                    state_ttls=getattr(settings, 'TELEGRAM_FSM_STATE_TTLS', {}),
+                    default_ttl=DEFAULT_STATE_TTL,
+                    codec=codec,
+                )
+            ))
+            self.stdout.write(
+                f'{codec.name}: {len(codec.dumps(SAMPLE_DATA))} байт на данные диалога')
+
+        self.stdout.write('')
+        for name, storage in storages:
+            timings = await self._measure(
+                storage, options['iterations'], options['chats'])
+            self.stdout.write(self.style.SUCCESS(name))
+            for operation, values in timings.items():
+                self.stdout.write(f'  {operation:<10} {self._format(values)}')
+            await storage.close()
+
+    def _create_redis(self, url):
+        if url:
+            from redis.asyncio import Redis
+            return Redis.from_url(url)
+
+        try:
+            from fakeredis.aioredis import FakeRedis
+        except ImportError:
+            raise CommandError(
+                'Для локального замера нужен fakeredis: pip install fakeredis')
+        return FakeRedis()
+
+    async def _measure(self, storage, iterations, chats):
+        """Один шаг диалога: get_state, get_data, update_data, set_state"""
+        timings = {
+            'get_state': [], 'get_data': [], 'set_data': [], 'set_state': [],
+        }
+        for i in range(iterations):
+            chat_id = i % chats
+            key = StorageKey(bot_id=BOT_ID, chat_id=chat_id, user_id=chat_id)
+
+            started = time.perf_counter()
+            await storage.get_state(key)
+            timings['get_state'].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            data = await storage.get_data(key)
+            timings['get_data'].append(time.perf_counter() - started)
+
+            data.update(SAMPLE_DATA, current_page=i)
+            started = time.perf_counter()
+            await storage.set_data(key, data)
+            timings['set_data'].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await storage.set_state(key, 'TransactionStates:waiting_for_category')
+            timings['set_state'].append(time.perf_counter() - started)
+
+        for chat_id in range(chats):
+            key = StorageKey(bot_id=BOT_ID, chat_id=chat_id, user_id=chat_id)
+            await storage.set_state(key, None)
+            await storage.set_data(key, {})
+        return timings
+
+    @staticmethod
+    def _format(values):
+        values = sorted(values)
+        p95 = values[int(len(values) * 0.95) - 1] if len(values) > 1 else values[0]
+        return (
+            f'p50={statistics.median(values) * 1e6:8.1f} мкс  '
+            f'p95={p95 * 1e6:8.1f} мкс  '
+            f'max={values[-1] * 1e6:8.1f} мкс'
+        )
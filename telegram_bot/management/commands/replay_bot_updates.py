@@ -0,0 +1,335 @@
+"""
+Воспроизведение сценариев дохода/расхода через настоящий Dispatcher.
+
+Команда создает синтетических пользователей (accounting.services.synthetic),
+поднимает FakeBotAPIServer и подает Dispatcher из create_dispatcher()
+обновления, как их прислал бы Telegram:
+
+    /income или /expense -> сумма -> описание -> кнопка кошелька -> кнопка категории
+
+Обновления одного пользователя идут по порядку, пользователи работают
+конкурентно (--concurrency). Для каждого обновления замеряется время
+dp.feed_update, число запросов к БД и вызовов Bot API. Запросы
+относятся к обновлению через контекстную переменную: она видна и в
+потоке асинхронного ORM, и в пуле telegram_bot.db.
+
+По окончании печатаются p50/p95/p99 по шагам сценария и в целом,
+--output сохраняет их в JSON. Созданные пользователи удаляются, если не
+указан --keep.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import random
+import statistics
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.enums import ParseMode
+from aiogram.types import CallbackQuery, Chat, Message, Update
+from aiogram.types import User as TelegramUser
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from accounting.models.transaction import Transaction
+from accounting.models.transactionCategory import TransactionCategoryTree
+from accounting.models.wallet import Wallet
+from accounting.services import synthetic
+from telegram_bot.fake_bot_api import FakeBotAPIServer
+
+User = get_user_model()
+
+STEPS = ('command', 'amount', 'description', 'wallet', 'category')
+
+# Счетчики обрабатываемого сейчас обновления
+_current_update = contextvars.ContextVar('replay_current_update', default=None)
+
+
+class _UpdateStats:
+    __slots__ = ('queries', 'api_calls')
+
+    def __init__(self):
+        self.queries = 0
+        self.api_calls = 0
+
+
+def _count_query(execute, sql, params, many, context):
+    stats = _current_update.get()
+    if stats is not None:
+        stats.queries += 1
+    return execute(sql, params, many, context)
+
+
+def _install_query_counter(sender, connection, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+async def _count_api_call(make_request, bot, method):
+    stats = _current_update.get()
+    if stats is not None:
+        stats.api_calls += 1
+    return await make_request(bot, method)
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет сценарии дохода/расхода синтетических пользователей через '
+            'Dispatcher и локальный Bot API, печатает задержки, запросы к БД и вызовы API')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=1000,
+            help='Количество синтетических пользователей'
+        )
+        parser.add_argument(
+            '--flows',
+            type=int,
+            default=3,
+            help='Сценариев дохода/расхода на пользователя'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=100,
+            help='Пользователей, обрабатываемых одновременно'
+        )
+        parser.add_argument(
+            '--api-latency',
+            type=float,
+            default=0,
+            help='Задержка ответа Bot API, мс'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Зерно генератора сценариев и данных'
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл для JSON результатов'
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Не удалять созданных пользователей'
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] <= 0 or options['flows'] <= 0 or options['concurrency'] <= 0:
+            raise CommandError('--users, --flows и --concurrency должны быть больше 0')
+
+        self.stdout.write(f'Создание {options["users"]} пользователей...')
+        generated = synthetic.generate(
+            users=options['users'],
+            wallets_per_user=2,
+            currencies=('RUB',),
+            category_depth=2,
+            category_breadth=3,
+            transactions=0,
+            seed=options['seed'],
+        )
+        user_ids = generated.user_ids
+
+        connection_created.connect(_install_query_counter, weak=False)
+        for connection in connections.all(initialized_only=True):
+            _install_query_counter(None, connection)
+        # Обработчики пишут в лог каждую транзакцию
+        logging.disable(logging.INFO)
+        try:
+            report = asyncio.run(self._replay(user_ids, options))
+        finally:
+            logging.disable(logging.NOTSET)
+            connection_created.disconnect(_install_query_counter)
+            if not options['keep']:
+                User.objects.filter(pk__in=user_ids).delete()
+
+        self._print(report)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Результаты записаны в {options["output"]}'))
+
+    def _load_users(self, user_ids):
+        users = {user.pk: user for user in User.objects.filter(pk__in=user_ids)}
+        wallets, categories = {}, {}
+        for wallet_id, user_id in Wallet.objects.filter(
+                user_id__in=user_ids).values_list('uuid', 'user_id'):
+            wallets.setdefault(user_id, []).append(wallet_id)
+        for category_id, user_id in TransactionCategoryTree.objects.filter(
+                user_id__in=user_ids).values_list('uuid', 'user_id'):
+            categories.setdefault(user_id, []).append(category_id)
+        return [
+            (users[user_id], wallets.get(user_id, []), categories.get(user_id, []))
+            for user_id in user_ids
+        ]
+
+    async def _replay(self, user_ids, options):
+        from asgiref.sync import sync_to_async
+
+        from telegram_bot.bot import create_dispatcher
+
+        users = await sync_to_async(self._load_users)(user_ids)
+        before = await Transaction.objects.filter(user_id__in=user_ids).acount()
+
+        server = FakeBotAPIServer(latency=options['api_latency'] / 1000)
+        await server.start()
+        session = AiohttpSession(api=server.api_server())
+        session.middleware(_count_api_call)
+        bot = Bot(token='42:replay', session=session,
+                  default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+        dp = await create_dispatcher()
+
+        rng = random.Random(options['seed'])
+        update_ids = iter(range(1, 10 ** 12))
+        samples = {step: [] for step in STEPS}
+        errors, unhandled = [], 0
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        def message(tg_user, text):
+            return Message(
+                message_id=server.last_message_id(tg_user.id) + 1,
+                date=datetime.now(),
+                chat=Chat(id=tg_user.id, type='private'),
+                from_user=tg_user,
+                text=text,
+            )
+
+        def callback(tg_user, data):
+            return CallbackQuery(
+                id=str(next(update_ids)),
+                from_user=tg_user,
+                chat_instance='replay',
+                data=data,
+                message=Message(
+                    message_id=server.last_message_id(tg_user.id),
+                    date=datetime.now(),
+                    chat=Chat(id=tg_user.id, type='private'),
+                    text='',
+                ),
+            )
+
+        async def feed(step, event):
+            nonlocal unhandled
+            kind = 'message' if isinstance(event, Message) else 'callback_query'
+            update = Update(update_id=next(update_ids), **{kind: event})
+            stats = _UpdateStats()
+            token = _current_update.set(stats)
+            started = time.perf_counter()
+            try:
+                result = await dp.feed_update(bot, update)
+                if result is UNHANDLED:
+                    unhandled += 1
+            except Exception as e:
+                errors.append(f'{step}: {e!r}')
+            finally:
+                elapsed = time.perf_counter() - started
+                _current_update.reset(token)
+            samples[step].append((elapsed, stats.queries, stats.api_calls))
+
+        async def run_user(user, wallets, categories, flow_rng):
+            tg_user = TelegramUser(id=user.telegram_id, is_bot=False,
+                                   first_name=user.username)
+            async with semaphore:
+                for _ in range(options['flows']):
+                    command = flow_rng.choice(('/income', '/expense'))
+                    amount = Decimal(flow_rng.randrange(100, 1_000_000)) / 100
+                    await feed('command', message(tg_user, command))
+                    await feed('amount', message(tg_user, str(amount)))
+                    await feed('description', message(tg_user, 'Продукты'))
+                    await feed('wallet', callback(
+                        tg_user, f'select_wallet_{flow_rng.choice(wallets)}'))
+                    await feed('category', callback(
+                        tg_user, f'select_category_{flow_rng.choice(categories)}'))
+
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(
+                run_user(user, wallets, categories, random.Random(rng.random()))
+                for user, wallets, categories in users
+            ))
+        finally:
+            elapsed = time.perf_counter() - started
+            await bot.session.close()
+            await server.stop()
+            await dp.storage.close()
+
+        created = await Transaction.objects.filter(user_id__in=user_ids).acount() - before
+        return self._report(samples, elapsed, errors, unhandled, created, server, options)
+
+    @staticmethod
+    def _stats(values):
+        values = sorted(values)
+        if len(values) > 1:
+            cuts = statistics.quantiles(values, n=100, method='inclusive')
+        else:
+            cuts = values * 99
+        return {
+            'p50': round(cuts[49], 3),
+            'p95': round(cuts[94], 3),
+            'p99': round(cuts[98], 3),
+            'max': round(values[-1], 3),
+            'mean': round(statistics.fmean(values), 3),
+        }
+
+    def _report(self, samples, elapsed, errors, unhandled, created, server, options):
+        def summary(rows):
+            return {
+                'updates': len(rows),
+                'latency_ms': self._stats([row[0] * 1e3 for row in rows]),
+                'queries': self._stats([row[1] for row in rows]),
+                'api_calls': self._stats([row[2] for row in rows]),
+            }
+
+        all_rows = [row for rows in samples.values() for row in rows]
+        return {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'users': options['users'],
+            'flows_per_user': options['flows'],
+            'concurrency': options['concurrency'],
+            'api_latency_ms': options['api_latency'],
+            'elapsed_s': round(elapsed, 3),
+            'updates_per_s': round(len(all_rows) / elapsed, 1) if elapsed else 0,
+            'transactions_expected': options['users'] * options['flows'],
+            'transactions_created': created,
+            'unhandled': unhandled,
+            'errors': len(errors),
+            'error_samples': errors[:10],
+            'bot_api_calls': dict(server.calls),
+            'total': summary(all_rows),
+            'steps': {step: summary(rows) for step, rows in samples.items() if rows},
+        }
+
+    def _print(self, report):
+        # Обработчики перехватывают ошибки БД и отвечают текстом ошибки,
+        # поэтому недостача транзакций - тоже признак сбоя
+        failed = (report['errors'] or report['unhandled'] or
+                  report['transactions_created'] != report['transactions_expected'])
+        style = self.style.WARNING if failed else self.style.SUCCESS
+        self.stdout.write(style(
+            f'Обновлений: {report["total"]["updates"]} за {report["elapsed_s"]} с '
+            f'({report["updates_per_s"]}/с), ошибок: {report["errors"]}, '
+            f'без обработчика: {report["unhandled"]}, транзакций создано: '
+            f'{report["transactions_created"]}/{report["transactions_expected"]}'))
+        for error in report['error_samples']:
+            self.stdout.write(f'  {error}')
+
+        rows = [('всего', report['total'])] + list(report['steps'].items())
+        self.stdout.write(
+            f'{"шаг":12} {"p50 мс":>9} {"p95 мс":>9} {"p99 мс":>9} '
+            f'{"запросов":>9} {"вызовов API":>12}')
+        for name, data in rows:
+            latency = data['latency_ms']
+            self.stdout.write(
+                f'{name:12} {latency["p50"]:9.2f} {latency["p95"]:9.2f} {latency["p99"]:9.2f} '
+                f'{data["queries"]["mean"]:9.2f} {data["api_calls"]["mean"]:12.2f}')
@@ -0,0 +1,318 @@
+"""
+Набор замеров производительности на синтетических данных.
+
+Для пользователей, созданных generate_synthetic_data, замеряются:
+
+    api     - эндпоинты DRF (JWT как у Mini App);
+    miniapp - страницы Mini App (токен сессии Mini App в _auth);
+    bot     - методы обработчиков бота с Bot без сети и FSM в памяти.
+
+По каждому сценарию собираются задержки (p50/p95/p99/max) и число
+запросов к БД на вызов, для бота - еще число вызовов Bot API. Результат
+печатается в JSON для сравнения между версиями. Сценарии только читают
+данные, поэтому повторные прогоны на одном наборе данных сопоставимы.
+
+Запросы считаются через execute_wrapper соединения основного потока:
+асинхронный ORM обработчиков внутри async_to_sync выполняется в этом же
+потоке.
+"""
+import json
+import platform
+import statistics
+import time
+from datetime import datetime
+
+import django
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import SendMessage
+from aiogram.types import Chat, Message
+from aiogram.types import User as TelegramUser
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from accounting.models.transaction import Transaction
+from accounting.services import keyset
+from accounting.services.synthetic import SYNTHETIC_PREFIX
+from telegram_bot.handlers.balance_handlers import BalanceHandler
+from telegram_bot.handlers.category_handlers import CategoryHandler
+from telegram_bot.handlers.transaction_handlers import TransactionHandler
+from telegram_bot.handlers.wallet_handlers import WalletHandler
+from telegram_bot.telegram_auth import issue_miniapp_token
+from users.authentication import tokens_for_user
+
+User = get_user_model()
+
+GROUPS = ('api', 'miniapp', 'bot')
+
+
+class _OfflineSession(BaseSession):
+    """Сессия Bot API без сети: на SendMessage отвечает сообщением, на остальное True"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls += 1
+        if isinstance(method, SendMessage):
+            return Message(
+                message_id=self.calls,
+                date=datetime.now(),
+                chat=Chat(id=method.chat_id, type='private'),
+                text=method.text,
+            )
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30,
+                             chunk_size=65536, raise_for_status=True):
+        yield b''
+
+    async def close(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Замеряет эндпоинты API, страницы Mini App и обработчики бота, результат в JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=3,
+            help='Сколько синтетических пользователей замерять'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Вызовов каждого сценария на пользователя'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=2,
+            help='Вызовов прогрева перед замером'
+        )
+        parser.add_argument(
+            '--group',
+            choices=GROUPS,
+            action='append',
+            help='Замерять только указанные группы (можно повторять)'
+        )
+        parser.add_argument(
+            '--output',
+            default='-',
+            help='Файл для JSON результатов (по умолчанию stdout)'
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] <= 0 or options['repeat'] <= 0 or options['warmup'] < 0:
+            raise CommandError('--users и --repeat должны быть больше 0, --warmup не меньше 0')
+
+        users = list(User.objects.filter(
+            username__startswith=SYNTHETIC_PREFIX, telegram_id__isnull=False,
+        ).order_by('username')[:options['users']])
+        if not users:
+            raise CommandError(
+                'Нет синтетических пользователей, сначала выполните generate_synthetic_data')
+
+        self.options = options
+        self.queries = 0
+        results = {}
+        groups = options['group'] or GROUPS
+
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']), \
+                connection.execute_wrapper(self._count_query):
+            if 'api' in groups:
+                results.update(self._bench_api(users))
+            if 'miniapp' in groups:
+                results.update(self._bench_miniapp(users))
+            if 'bot' in groups:
+                results.update(async_to_sync(self._bench_bot)(users))
+
+        report = {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+            },
+            'dataset': {
+                'users': len(users),
+                'transactions': Transaction.objects.filter(user__in=users).count(),
+            },
+            'repeat': options['repeat'],
+            'results': results,
+        }
+        payload = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(payload)
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(payload)
+            self.stderr.write(self.style.SUCCESS(f'Результаты записаны в {options["output"]}'))
+
+    def _count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def _summary(self, name, latencies, queries, errors, api_calls=None):
+        values = sorted(latencies)
+        if len(values) > 1:
+            cuts = statistics.quantiles(values, n=100, method='inclusive')
+            p95, p99 = cuts[94], cuts[98]
+        else:
+            p95 = p99 = values[0]
+        result = {
+            'calls': len(values),
+            'errors': errors,
+            'p50_ms': round(statistics.median(values) * 1e3, 3),
+            'p95_ms': round(p95 * 1e3, 3),
+            'p99_ms': round(p99 * 1e3, 3),
+            'max_ms': round(values[-1] * 1e3, 3),
+            'mean_ms': round(statistics.fmean(values) * 1e3, 3),
+            'queries': statistics.median(queries),
+        }
+        if api_calls is not None:
+            result['bot_api_calls'] = statistics.median(api_calls)
+        self.stderr.write(
+            f'{name:32} p50={result["p50_ms"]:8.2f} мс  p95={result["p95_ms"]:8.2f} мс  '
+            f'запросов={result["queries"]}')
+        return result
+
+    def _measure(self, name, users, call):
+        """call(user) -> bool (успех), вызывается warmup + repeat раз на пользователя"""
+        latencies, queries, errors = [], [], 0
+        for user in users:
+            for _ in range(self.options['warmup']):
+                call(user)
+            for _ in range(self.options['repeat']):
+                before = self.queries
+                started = time.perf_counter()
+                ok = call(user)
+                latencies.append(time.perf_counter() - started)
+                queries.append(self.queries - before)
+                errors += not ok
+        return {name: self._summary(name, latencies, queries, errors)}
+
+    def _deep_cursor(self, user):
+        """Курсор страницы на 90% глубины списка транзакций пользователя"""
+        transactions = Transaction.objects.filter(user=user).order_by('-created_at', '-uuid')
+        count = transactions.count()
+        if not count:
+            return None
+        row = transactions[int(count * 0.9)]
+        return keyset.encode_cursor(Transaction, '-created_at', row, keyset.FORWARD)
+
+    def _bench_api(self, users):
+        client = Client()
+        headers = {
+            user.pk: {'HTTP_AUTHORIZATION': f'Bearer {tokens_for_user(user)["access"]}'}
+            for user in users
+        }
+        cursors = {user.pk: self._deep_cursor(user) for user in users}
+        transactions_url = reverse('transaction-list')
+
+        def get(url, **params):
+            def call(user):
+                query = {key: value(user) if callable(value) else value
+                         for key, value in params.items()}
+                response = client.get(url, query, secure=True, **headers[user.pk])
+                return response.status_code == 200
+            return call
+
+        scenarios = [
+            ('api.transactions.list', get(transactions_url)),
+            ('api.transactions.list.deep',
+             get(transactions_url, cursor=lambda user: cursors[user.pk] or '')),
+            ('api.transactions.stats', get(reverse('transaction-stats'))),
+            ('api.transactions.stats.month',
+             get(reverse('transaction-stats'), group_by='month')),
+            ('api.transactions.recent', get(reverse('transaction-recent'))),
+            ('api.wallets.list', get(reverse('wallet-list'))),
+            ('api.categories.list', get(reverse('category-list'))),
+        ]
+        results = {}
+        for name, call in scenarios:
+            results.update(self._measure(name, users, call))
+        return results
+
+    def _bench_miniapp(self, users):
+        client = Client()
+        tokens = {user.pk: issue_miniapp_token(user) for user in users}
+
+        def page(url_name):
+            url = reverse(f'telegram_bot:{url_name}')
+
+            def call(user):
+                response = client.get(url, {'_auth': tokens[user.pk]}, secure=True)
+                return response.status_code == 200
+            return call
+
+        results = {}
+        for name in ('mini_app_dashboard', 'transactions', 'wallets', 'categories'):
+            results.update(self._measure(f'miniapp.{name}', users, page(name)))
+        return results
+
+    async def _bench_bot(self, users):
+        session = _OfflineSession()
+        bot = Bot(token='42:benchmark', session=session)
+        storage = MemoryStorage()
+        balance, wallets = BalanceHandler(), WalletHandler()
+        categories, transactions = CategoryHandler(), TransactionHandler()
+
+        def message(user, text):
+            return Message(
+                message_id=1,
+                date=datetime.now(),
+                chat=Chat(id=user.telegram_id, type='private'),
+                from_user=TelegramUser(
+                    id=user.telegram_id, is_bot=False, first_name=user.username),
+                text=text,
+            ).as_(bot)
+
+        def state(user):
+            return FSMContext(storage=storage, key=StorageKey(
+                bot_id=bot.id, chat_id=user.telegram_id, user_id=user.telegram_id))
+
+        scenarios = [
+            ('bot.balance',
+             lambda user: balance.cmd_balance(message(user, '/balance'), user)),
+            ('bot.wallets',
+             lambda user: wallets.cmd_wallets(message(user, '/wallets'), user, state(user))),
+            ('bot.categories',
+             lambda user: categories.cmd_categories(
+                 message(user, '/categories'), user, state(user))),
+            # Шаг ввода описания: выбор кошелька для новой транзакции
+            ('bot.transaction.select_wallet',
+             lambda user: transactions.process_description(
+                 message(user, 'Продукты'), state(user), user)),
+        ]
+
+        results = {}
+        for name, handler in scenarios:
+            latencies, queries, api_calls, errors = [], [], [], 0
+            for user in users:
+                for _ in range(self.options['warmup']):
+                    await handler(user)
+                for _ in range(self.options['repeat']):
+                    before_queries, before_calls = self.queries, session.calls
+                    started = time.perf_counter()
+                    try:
+                        await handler(user)
+                    except Exception:
+                        errors += 1
+                    latencies.append(time.perf_counter() - started)
+                    queries.append(self.queries - before_queries)
+                    api_calls.append(session.calls - before_calls)
+            results[name] = self._summary(name, latencies, queries, errors, api_calls)
+        return results
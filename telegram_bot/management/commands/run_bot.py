@@ -7,7 +7,7 @@ import django
 import psutil
 from django.core.management.base import BaseCommand
 
-from telegram_bot.bot import run_polling
+from telegram_bot.bot import run_polling, run_webhook, set_webhook
 
 # Настройка Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings.dev')
@@ -23,6 +23,22 @@ class Command(BaseCommand):
             action='store_true',
             help='Запустить в режиме webhook вместо polling',
         )
+        parser.add_argument(
+            '--host',
+            default='127.0.0.1',
+            help='Адрес aiohttp сервера в режиме webhook',
+        )
+        parser.add_argument(
+            '--port',
+            type=int,
+            default=8081,
+            help='Порт aiohttp сервера в режиме webhook',
+        )
+        parser.add_argument(
+            '--set-webhook',
+            action='store_true',
+            help='Только зарегистрировать webhook (обновления принимает Django/ASGI)',
+        )
         parser.add_argument(
             '--kill-existing',
             action='store_true',
@@ -113,6 +129,11 @@ class Command(BaseCommand):
             return True
 
     def handle(self, *args, **options):
+        if options['set_webhook']:
+            set_webhook()
+            self.stdout.write(self.style.SUCCESS('Webhook зарегистрирован'))
+            return
+
         # Сначала останавливаем существующие процессы если запрошено
         if options['kill_existing']:
             self.stdout.write(
@@ -148,8 +169,10 @@ class Command(BaseCommand):
 
         if options['webhook']:
             self.stdout.write(
-                self.style.WARNING('Режим webhook пока не реализован')
+                self.style.SUCCESS(
+                    f"Запуск бота в режиме webhook на {options['host']}:{options['port']}...")
             )
+            run_webhook(host=options['host'], port=options['port'])
         else:
             self.stdout.write(
                 self.style.SUCCESS('Запуск бота в режиме polling...')
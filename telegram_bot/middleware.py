@@ -1,32 +1,13 @@
-import asyncio
 from typing import Any, Awaitable, Callable, Dict
 
 from aiogram import BaseMiddleware
 from aiogram.types import CallbackQuery, Message
-from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
-from django.db import close_old_connections, connection
-
-User = get_user_model()
 
+from telegram_bot.db import run_db
+from telegram_bot.user_cache import get_user_cache
 
-class DatabaseMiddleware(BaseMiddleware):
-    """Middleware для работы с Django ORM в async контексте"""
-
-    async def __call__(
-        self,
-        handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
-        event: Message | CallbackQuery,
-        data: Dict[str, Any]
-    ) -> Any:
-        # Закрываем старые соединения перед обработкой
-        await sync_to_async(close_old_connections)()
-
-        try:
-            return await handler(event, data)
-        finally:
-            # Закрываем соединения после обработки
-            await sync_to_async(close_old_connections)()
+User = get_user_model()
 
 
 class AuthMiddleware(BaseMiddleware):
@@ -55,16 +36,25 @@ class AuthMiddleware(BaseMiddleware):
 
     async def get_or_create_user(self, telegram_user):
         """Получение или создание пользователя Django"""
+        user_cache = get_user_cache()
+
+        # Активные пользователи берутся из кэша без обращения к БД
+        django_user = await user_cache.aget(telegram_user.id)
+        if django_user is not None:
+            return django_user, False
+
         try:
             # Пытаемся найти пользователя по telegram_id
-            django_user = await asyncio.to_thread(
+            django_user = await run_db(
                 User.objects.get,
                 telegram_id=telegram_user.id
             )
+            user_cache.db_loads += 1
+            await user_cache.astore(django_user)
             return django_user, False
         except User.DoesNotExist:
-            # Создаем нового пользователя
-            django_user = await asyncio.to_thread(
+            # Создаем нового пользователя, в кэш он попадет сигналом post_save
+            django_user = await run_db(
                 User.objects.create_user,
                 telegram_id=telegram_user.id,
                 username=telegram_user.username or telegram_user.id,
@@ -3,8 +3,6 @@ Middleware для обработки аутентификации Telegram WebAp
 """
 import logging
 
-from django.contrib.auth import authenticate, login
-from django.shortcuts import redirect
 from django.urls import reverse
 
 logger = logging.getLogger(__name__)
@@ -12,10 +10,13 @@ logger = logging.getLogger(__name__)
 
 class TelegramWebAppAuthMiddleware:
     """
-    Middleware для автоматической аутентификации пользователей Telegram WebApp
+    Middleware для запросов Telegram WebApp без данных аутентификации
 
-    Обрабатывает входящие запросы и автоматически аутентифицирует пользователей
-    на основе данных Telegram WebApp, сохраняя их в сессии Django.
+    Сама аутентификация stateless: TelegramMiniAppView проверяет init data
+    или подписанный токен Mini App из _auth на каждом запросе, без login()
+    и записи сессии. Middleware только отмечает запросы из Telegram без
+    _auth для перенаправления на страницу авторизации и не обращается к
+    request.user, чтобы не читать сессию.
     """
 
     def __init__(self, get_response):
@@ -74,48 +75,16 @@ class TelegramWebAppAuthMiddleware:
         """
         from django.conf import settings
 
-        # Если пользователь уже аутентифицирован, пропускаем
-        if request.user.is_authenticated:
+        # Init data или токен Mini App проверяет view, сессия не нужна
+        if self._extract_telegram_data(request):
             return
 
-        # В режиме отладки разрешаем доступ без Telegram данных
-        if getattr(settings, 'TELEGRAM_MINIAPP_DEBUG_MODE', False) and not self._is_telegram_request(request):
-            # Создаем тестового пользователя для разработки
-            from users.models.user import User
-            test_user, created = User.objects.get_or_create(
-                telegram_id=123456789,  # Тестовый ID
-                defaults={
-                    'username': 'test_user',
-                    'first_name': 'Test',
-                    'last_name': 'User'
-                }
-            )
-            login(request, test_user)
-            logger.info(
-                f"Debug mode: authenticated test user {test_user.username}")
+        # В режиме отладки тестового пользователя подставляет view
+        if getattr(settings, 'TELEGRAM_MINIAPP_DEBUG_MODE', False):
             return
 
-        # Проверяем, что это запрос из Telegram
-        if not self._is_telegram_request(request):
-            return
-
-        # Извлекаем данные аутентификации
-        telegram_data = self._extract_telegram_data(request)
-
-        if telegram_data:
-            # Аутентифицируем пользователя
-            user = authenticate(request, telegram_data=telegram_data)
-
-            if user:
-                # Входим в систему
-                login(request, user)
-                logger.info(
-                    f"User {user.username} authenticated via Telegram WebApp")
-            else:
-                # Аутентификация не удалась, перенаправляем на страницу авторизации
-                self._redirect_to_auth(request)
-        else:
-            # Нет данных аутентификации, перенаправляем на страницу авторизации
+        # Запрос из Telegram без данных аутентификации
+        if self._is_telegram_request(request):
             self._redirect_to_auth(request)
 
     def _is_telegram_request(self, request) -> bool:
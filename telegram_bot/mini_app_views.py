@@ -3,9 +3,8 @@ import logging
 from datetime import datetime, timedelta
 
 from django.contrib import messages
-from django.core.paginator import Paginator
 from django.db import transaction
-from django.db.models import Q, Sum
+from django.db.models import Q
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
@@ -14,6 +13,8 @@ from django.views import View
 from accounting.models.transaction import Transaction
 from accounting.models.transactionCategory import TransactionCategoryTree
 from accounting.models.wallet import Wallet
+from accounting.services import keyset, ledger
+from accounting.services.stats import compute_stats
 from users.models.user import User
 
 from .utils import (diagnose_telegram_request, get_telegram_error_response,
@@ -35,8 +36,14 @@ class TelegramMiniAppView(View):
         return context
 
     def get_auth_param(self):
-        """Получаем параметр аутентификации из запроса"""
-        return self.request.GET.get('_auth', '') or self.request.POST.get('_auth', '')
+        """
+        Параметр аутентификации для ссылок и форм
+
+        После успешной проверки это подписанный токен Mini App, а не исходные
+        init data: следующие запросы проверяются без HMAC init data и сессии.
+        """
+        return (getattr(self, 'auth_token', None) or
+                self.request.GET.get('_auth', '') or self.request.POST.get('_auth', ''))
 
     def dispatch(self, request, *args, **kwargs):
         from django.conf import settings
@@ -163,96 +170,110 @@ class TelegramMiniAppView(View):
                                f"Referer: {referer[:100]}")
                 return None
 
+            from .telegram_auth import (is_miniapp_token, issue_miniapp_token,
+                                        verify_miniapp_token)
+            if is_miniapp_token(init_data):
+                # Подписанный токен, выданный после проверки init data
+                token = verify_miniapp_token(init_data)
+                if token is None:
+                    logger.info("Mini App token is invalid or expired")
+                    return None
+                user = self._get_cached_user(token.telegram_id, token.user_id)
+                if user is not None:
+                    # Новый токен на каждый запрос: срок отсчитывается от
+                    # последнего действия, а не от входа
+                    self.auth_token = issue_miniapp_token(user)
+                return user
+
             # Логируем полученные данные для отладки (без полного содержимого)
             logger.info(f"Received Telegram WebApp data: {init_data[:50]}...")
 
-            # Используем aiogram 3 для безопасной проверки данных WebApp
             from django.conf import settings
             bot_token = getattr(settings, 'TELEGRAM_BOT_TOKEN', '')
 
-            user_data = None
-
             if bot_token:
-                try:
-                    from aiogram.utils.web_app import \
-                        safe_parse_webapp_init_data
-                    webapp_data = safe_parse_webapp_init_data(
-                        bot_token, init_data)
-                    # WebAppInitData - это объект с атрибутами, не словарь
-                    user_obj = webapp_data.user
-                    user_data = {
-                        'id': user_obj.id,
-                        'first_name': user_obj.first_name,
-                        'last_name': user_obj.last_name,
-                        'username': user_obj.username,
-                    }
-                    logger.info(
-                        f"Successfully parsed WebApp data with aiogram for user: {user_obj.id}")
-                except (ValueError, ImportError, AttributeError) as e:
+                # Проверка подписи с кэшем: повторный запрос той же сессии
+                # Mini App не вычисляет HMAC и не ищет пользователя в БД
+                from .telegram_auth import remember_user_id, verify_init_data
+                verified = verify_init_data(init_data, bot_token)
+                if not verified:
                     logger.warning(
-                        f"Failed to parse WebApp data with aiogram: {e}")
-                    # Fallback на старую логику
-                    try:
-                        from .telegram_auth import \
-                            get_telegram_user_from_webapp
-                        user_data = get_telegram_user_from_webapp(
-                            init_data, verify_signature=True)
-                        if user_data:
-                            logger.info(
-                                f"Successfully parsed WebApp data with fallback method for user: {user_data.get('id')}")
-                    except Exception as fallback_error:
-                        logger.error(
-                            f"Fallback parsing also failed: {fallback_error}")
-                        user_data = None
-            else:
-                logger.warning(
-                    "No Telegram bot token configured, using unverified parsing")
-                # Если нет токена, используем старую логику без проверки подписи
-                try:
-                    from .telegram_auth import get_telegram_user_from_webapp
-                    user_data = get_telegram_user_from_webapp(
-                        init_data, verify_signature=False)
-                    if user_data:
-                        logger.info(
-                            f"Successfully parsed WebApp data without verification for user: {user_data.get('id')}")
-                except Exception as unverified_error:
-                    logger.error(
-                        f"Unverified parsing failed: {unverified_error}")
-                    user_data = None
+                        "Failed to parse or verify Telegram WebApp data")
+                    return None
+
+                if verified.user_id is not None:
+                    user = self._get_cached_user(
+                        verified.telegram_id, verified.user_id)
+                    if user is not None:
+                        self.auth_token = issue_miniapp_token(user)
+                        return user
+
+                user = self._get_or_create_user(verified.user_data)
+                if user is not None:
+                    remember_user_id(init_data, verified, user.pk, bot_token)
+                    from .user_cache import get_user_cache
+                    get_user_cache().store(user)
+                    self.auth_token = issue_miniapp_token(user)
+                return user
+
+            logger.warning(
+                "No Telegram bot token configured, using unverified parsing")
+            # Если нет токена, используем старую логику без проверки подписи
+            try:
+                from .telegram_auth import get_telegram_user_from_webapp
+                user_data = get_telegram_user_from_webapp(
+                    init_data, verify_signature=False)
+                if user_data:
+                    logger.info(
+                        f"Successfully parsed WebApp data without verification for user: {user_data.get('id')}")
+            except Exception as unverified_error:
+                logger.error(
+                    f"Unverified parsing failed: {unverified_error}")
+                user_data = None
 
             if not user_data:
                 logger.warning(
                     "Failed to parse or verify Telegram WebApp data")
                 return None
 
-            telegram_id = user_data.get('id')
-            if not telegram_id:
-                logger.warning("No telegram_id found in user data")
-                return None
+            return self._get_or_create_user(user_data)
 
-            # Ищем или создаем пользователя
-            user = User.objects.filter(telegram_id=telegram_id).first()
-            if not user:
-                # Создаем нового пользователя
-                username = user_data.get('username') or f"tg_{telegram_id}"
-                user = User.objects.create(
-                    telegram_id=telegram_id,
-                    username=username,
-                    first_name=user_data.get('first_name', ''),
-                    last_name=user_data.get('last_name', ''),
-                )
-                logger.info(
-                    f"Created new user: {user.username} (telegram_id: {telegram_id})")
-            else:
-                logger.info(
-                    f"Found existing user: {user.username} (telegram_id: {telegram_id})")
+        except Exception as e:
+            logger.error(f"Error getting telegram user: {e}", exc_info=True)
+            return None
+
+    def _get_cached_user(self, telegram_id, user_id):
+        """Проверенный пользователь из кэша пользователей или по pk"""
+        from .user_cache import get_user_cache
+        user_cache = get_user_cache()
 
+        user = user_cache.get(telegram_id)
+        if user is not None and str(user.pk) == str(user_id):
             return user
 
-        except Exception as e:
-            logger.error(f"Error getting telegram user: {e}", exc_info=True)
+        user = User.objects.filter(pk=user_id).first()
+        if user is not None:
+            user_cache.store(user)
+        return user
+
+    def _get_or_create_user(self, user_data):
+        """Ищем или создаем пользователя по данным Telegram"""
+        telegram_id = user_data.get('id')
+        if not telegram_id:
+            logger.warning("No telegram_id found in user data")
             return None
 
+        from .telegram_auth import get_or_create_telegram_user
+        user, created = get_or_create_telegram_user(user_data)
+        if created:
+            logger.info(
+                f"Created new user: {user.username} (telegram_id: {telegram_id})")
+        else:
+            logger.info(
+                f"Found existing user: {user.username} (telegram_id: {telegram_id})")
+
+        return user
+
 
 class MiniAppDiagnosticView(View):
     """Диагностическая страница для проверки конфигурации Mini App"""
@@ -342,33 +363,23 @@ class MiniAppDashboardView(TelegramMiniAppView):
 
         # Статистика за последние 30 дней
         thirty_days_ago = datetime.now().date() - timedelta(days=30)
-        recent_transactions = user_transactions.filter(
-            date__gte=thirty_days_ago)
-
-        total_income = recent_transactions.filter(t_type='IN').aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-
-        total_expense = recent_transactions.filter(t_type='EX').aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-
-        balance = total_income - total_expense
+        stats = compute_stats(request.user, date_from=thirty_days_ago)
 
         # Последние транзакции
-        recent_transactions_list = user_transactions.order_by(
-            '-created_at')[:5]
+        recent_transactions_list = user_transactions.select_related(
+            'wallet', 'category').order_by('-created_at')[:5]
 
         # Кошельки
-        wallets = Wallet.objects.filter(user=request.user)
+        wallets = Wallet.objects.filter(
+            user=request.user).select_related('currency')
 
         context = self.get_context_data(
-            total_income=total_income,
-            total_expense=total_expense,
-            balance=balance,
+            total_income=stats['total_income'],
+            total_expense=stats['total_expense'],
+            balance=stats['balance'],
             recent_transactions=recent_transactions_list,
             wallets=wallets,
-            transaction_count=recent_transactions.count(),
+            transaction_count=stats['transaction_count'],
             user=request.user
         )
 
@@ -380,7 +391,7 @@ class TransactionListView(TelegramMiniAppView):
 
     def get(self, request):
         transactions = Transaction.objects.filter(
-            user=request.user).order_by('-created_at')
+            user=request.user).select_related('wallet', 'category')
 
         # Фильтрация
         t_type = request.GET.get('type')
@@ -400,10 +411,12 @@ class TransactionListView(TelegramMiniAppView):
         if date_to:
             transactions = transactions.filter(date__lte=date_to)
 
-        # Пагинация
-        paginator = Paginator(transactions, 20)
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
+        # Пагинация курсором по (created_at, uuid), без COUNT
+        try:
+            page_obj = keyset.paginate(
+                transactions, cursor=request.GET.get('cursor'), page_size=20)
+        except keyset.InvalidCursor:
+            page_obj = keyset.paginate(transactions, page_size=20)
 
         # Данные для фильтров
         wallets = Wallet.objects.filter(user=request.user)
@@ -486,12 +499,8 @@ class TransactionCreateView(TelegramMiniAppView):
                     date=request.POST.get('date', datetime.now().date())
                 )
 
-                # Обновляем баланс кошелька
-                if transaction_obj.t_type == 'IN':
-                    wallet.balance = wallet.balance + transaction_obj.amount
-                else:
-                    wallet.balance = wallet.balance - transaction_obj.amount
-                wallet.save()
+                # Учитываем транзакцию в балансе кошелька и агрегатах
+                ledger.record_created(transaction_obj)
 
                 messages.success(request, 'Транзакция успешно создана!')
                 # Добавляем auth_param к редиректу
@@ -538,9 +547,7 @@ class TransactionEditView(TelegramMiniAppView):
                     Transaction, uuid=transaction_id, user=request.user)
 
                 # Сохраняем старые значения для пересчета баланса
-                old_amount = transaction_obj.amount
-                old_type = transaction_obj.t_type
-                old_wallet = transaction_obj.wallet
+                before = ledger.snapshot(transaction_obj)
 
                 wallet = get_object_or_404(
                     Wallet, uuid=request.POST.get('wallet'), user=request.user)
@@ -590,19 +597,7 @@ class TransactionEditView(TelegramMiniAppView):
                 transaction_obj.save()
 
                 # Пересчитываем балансы кошельков
-                # Убираем старую транзакцию
-                if old_type == 'IN':
-                    old_wallet.balance = old_wallet.balance - old_amount
-                else:
-                    old_wallet.balance = old_wallet.balance + old_amount
-                old_wallet.save()
-
-                # Добавляем новую транзакцию
-                if transaction_obj.t_type == 'IN':
-                    wallet.balance = wallet.balance + transaction_obj.amount
-                else:
-                    wallet.balance = wallet.balance - transaction_obj.amount
-                wallet.save()
+                ledger.record_updated(before, transaction_obj)
 
                 messages.success(request, 'Транзакция успешно обновлена!')
                 # Добавляем auth_param к редиректу
@@ -633,14 +628,9 @@ class TransactionDeleteView(TelegramMiniAppView):
             with transaction.atomic():
                 transaction_obj = get_object_or_404(
                     Transaction, uuid=transaction_id, user=request.user)
-                wallet = transaction_obj.wallet
 
                 # Возвращаем баланс кошелька
-                if transaction_obj.t_type == 'IN':
-                    wallet.balance = wallet.balance + transaction_obj.amount
-                else:
-                    wallet.balance = wallet.balance + transaction_obj.amount
-                wallet.save()
+                ledger.record_deleted(transaction_obj)
 
                 transaction_obj.delete()
 
@@ -681,11 +671,10 @@ class WalletCreateView(TelegramMiniAppView):
     """Создание кошелька"""
 
     def get(self, request):
-        from accounting.models.currencyCBR import CurrencyCBR
-        currencies = CurrencyCBR.objects.all()
+        from accounting.services import currencies
 
         context = self.get_context_data(
-            currencies=currencies
+            currencies=currencies.all_currencies()
         )
 
         return render(request, 'telegram_bot/wallets/create.html', context)
@@ -743,12 +732,11 @@ class WalletEditView(TelegramMiniAppView):
 
     def get(self, request, wallet_id):
         wallet = get_object_or_404(Wallet, uuid=wallet_id, user=request.user)
-        from accounting.models.currencyCBR import CurrencyCBR
-        currencies = CurrencyCBR.objects.all()
+        from accounting.services import currencies
 
         context = self.get_context_data(
             wallet=wallet,
-            currencies=currencies
+            currencies=currencies.all_currencies()
         )
 
         return render(request, 'telegram_bot/wallets/edit.html', context)
@@ -8,13 +8,15 @@ from datetime import datetime, timedelta
 from django.contrib import messages
 from django.core.paginator import Paginator
 from django.db import transaction
-from django.db.models import Q, Sum
+from django.db.models import Q
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 
 from accounting.models.transaction import Transaction
 from accounting.models.transactionCategory import TransactionCategoryTree
 from accounting.models.wallet import Wallet
+from accounting.services import ledger
+from accounting.services.stats import compute_stats
 
 from .utils import safe_float_conversion
 from .views.telegram_base_view import TelegramWebAppAuthenticatedView
@@ -31,33 +33,23 @@ class MiniAppDashboardView(TelegramWebAppAuthenticatedView):
 
         # Статистика за последние 30 дней
         thirty_days_ago = datetime.now().date() - timedelta(days=30)
-        recent_transactions = user_transactions.filter(
-            date__gte=thirty_days_ago)
-
-        total_income = recent_transactions.filter(t_type='IN').aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-
-        total_expense = recent_transactions.filter(t_type='EX').aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-
-        balance = total_income - total_expense
+        stats = compute_stats(request.user, date_from=thirty_days_ago)
 
         # Последние транзакции
-        recent_transactions_list = user_transactions.order_by(
-            '-created_at')[:5]
+        recent_transactions_list = user_transactions.select_related(
+            'wallet', 'category').order_by('-created_at')[:5]
 
         # Кошельки
-        wallets = Wallet.objects.filter(user=request.user)
+        wallets = Wallet.objects.filter(
+            user=request.user).select_related('currency')
 
         context = self.get_context_data(
-            total_income=total_income,
-            total_expense=total_expense,
-            balance=balance,
+            total_income=stats['total_income'],
+            total_expense=stats['total_expense'],
+            balance=stats['balance'],
             recent_transactions=recent_transactions_list,
             wallets=wallets,
-            transaction_count=recent_transactions.count(),
+            transaction_count=stats['transaction_count'],
         )
 
         return render(request, 'telegram_bot/dashboard.html', context)
@@ -166,12 +158,8 @@ class TransactionCreateView(TelegramWebAppAuthenticatedView):
                     date=request.POST.get('date', datetime.now().date())
                 )
 
-                # Обновляем баланс кошелька
-                if transaction_obj.t_type == 'IN':
-                    wallet.balance += wallet.balance + transaction_obj.amount
-                else:
-                    wallet.balance -= wallet.balance - transaction_obj.amount
-                wallet.save()
+                # Учитываем транзакцию в балансе кошелька и агрегатах
+                ledger.record_created(transaction_obj)
 
                 messages.success(request, 'Транзакция успешно создана!')
                 return redirect('telegram_bot:transactions')
@@ -208,9 +196,7 @@ class TransactionEditView(TelegramWebAppAuthenticatedView):
                     Transaction, uuid=transaction_id, user=request.user)
 
                 # Сохраняем старые значения для пересчета баланса
-                old_amount = transaction_obj.amount
-                old_type = transaction_obj.t_type
-                old_wallet = transaction_obj.wallet
+                before = ledger.snapshot(transaction_obj)
 
                 wallet = get_object_or_404(
                     Wallet, uuid=request.POST.get('wallet'), user=request.user)
@@ -250,19 +236,7 @@ class TransactionEditView(TelegramWebAppAuthenticatedView):
                 transaction_obj.save()
 
                 # Пересчитываем балансы кошельков
-                # Убираем старую транзакцию
-                if old_type == 'IN':
-                    old_wallet.balance -= old_wallet.balance - old_amount
-                else:
-                    old_wallet.balance += old_wallet.balance + old_amount
-                old_wallet.save()
-
-                # Добавляем новую транзакцию
-                if transaction_obj.t_type == 'IN':
-                    wallet.balance += wallet.balance + transaction_obj.amount
-                else:
-                    wallet.balance -= wallet.balance - transaction_obj.amount
-                wallet.save()
+                ledger.record_updated(before, transaction_obj)
 
                 messages.success(request, 'Транзакция успешно обновлена!')
                 return redirect('telegram_bot:transactions')
@@ -282,14 +256,9 @@ class TransactionDeleteView(TelegramWebAppAuthenticatedView):
             with transaction.atomic():
                 transaction_obj = get_object_or_404(
                     Transaction, uuid=transaction_id, user=request.user)
-                wallet = transaction_obj.wallet
 
                 # Возвращаем баланс кошелька
-                if transaction_obj.t_type == 'IN':
-                    wallet.balance -= wallet.balance - transaction_obj.amount
-                else:
-                    wallet.balance += wallet.balance + transaction_obj.amount
-                wallet.save()
+                ledger.record_deleted(transaction_obj)
 
                 transaction_obj.delete()
 
@@ -0,0 +1,125 @@
+"""
+Операции бота над данными учёта.
+
+Каждая функция - синхронная единица работы: выполняется целиком в одном
+переходе в пул потоков БД и в одной транзакции БД через
+telegram_bot.db.unit_of_work и возвращает простые DTO вместо экземпляров
+моделей, чтобы обработчики не делали ленивых запросов из event loop.
+"""
+from decimal import Decimal
+from typing import NamedTuple, Optional
+
+from accounting.models.transactionCategory import TransactionCategoryTree
+from accounting.models.wallet import Wallet
+from accounting.services import ledger
+
+
+class WalletDTO(NamedTuple):
+    uuid: str
+    title: str
+    balance: Decimal
+    currency_code: str
+
+
+class CategoryDTO(NamedTuple):
+    uuid: str
+    title: str
+
+
+class TransactionDTO(NamedTuple):
+    uuid: str
+    t_type: str
+    amount: Decimal
+    description: str
+    wallet: WalletDTO
+    category: Optional[CategoryDTO]
+
+
+class CategoryExists(ValueError):
+    """Категория с таким названием у родителя уже есть."""
+
+
+def wallet_dto(wallet: Wallet) -> WalletDTO:
+    return WalletDTO(
+        uuid=str(wallet.uuid),
+        title=wallet.title,
+        balance=wallet.balance,
+        currency_code=wallet.currency.char_code if wallet.currency_id else '',
+    )
+
+
+def category_dto(category: Optional[TransactionCategoryTree]) -> Optional[CategoryDTO]:
+    if category is None:
+        return None
+    return CategoryDTO(uuid=str(category.uuid), title=category.title)
+
+
+def add_transaction(user, wallet_uuid, t_type: str, amount, description: str,
+                    category=None, category_uuid=None) -> TransactionDTO:
+    """
+    Создает транзакцию и возвращает ее с актуальным балансом кошелька
+
+    Args:
+        user: Владелец транзакции
+        wallet_uuid: UUID кошелька пользователя
+        category: Уже загруженная категория или None
+        category_uuid: UUID категории, если category не передана
+
+    Raises:
+        Wallet.DoesNotExist, TransactionCategoryTree.DoesNotExist
+    """
+    wallet = Wallet.objects.select_related(
+        'currency').get(uuid=wallet_uuid, user=user)
+    if category is None and category_uuid:
+        category = TransactionCategoryTree.objects.get(
+            uuid=category_uuid, user=user)
+
+    transaction_obj = ledger.create_transaction(
+        user=user,
+        wallet=wallet,
+        category=category,
+        t_type=t_type,
+        amount=Decimal(str(amount)),
+        description=description,
+    )
+
+    # Баланс сдвинут через F(), читаем итоговое значение
+    wallet.refresh_from_db(fields=['balance'])
+
+    return TransactionDTO(
+        uuid=str(transaction_obj.uuid),
+        t_type=transaction_obj.t_type,
+        amount=transaction_obj.amount,
+        description=transaction_obj.description,
+        wallet=wallet_dto(wallet),
+        category=category_dto(category),
+    )
+
+
+def add_category_with_transaction(user, parent_uuid, title: str,
+                                  category_description: str, wallet_uuid,
+                                  t_type: str, amount,
+                                  description: str) -> TransactionDTO:
+    """
+    Создает категорию (дочернюю для parent_uuid или корневую) и сразу
+    транзакцию в ней
+
+    Raises:
+        CategoryExists: категория с таким названием у родителя уже есть
+    """
+    parent = None
+    if parent_uuid:
+        parent = TransactionCategoryTree.objects.get(uuid=parent_uuid, user=user)
+
+    if TransactionCategoryTree.objects.filter(
+            user=user, title=title, parent=parent).exists():
+        raise CategoryExists(title)
+
+    category = TransactionCategoryTree.objects.create(
+        user=user,
+        parent=parent,
+        title=title,
+        description=category_description,
+    )
+    return add_transaction(
+        user, wallet_uuid, t_type, amount, description, category=category)
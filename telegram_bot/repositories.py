@@ -0,0 +1,212 @@
+"""
+Асинхронные репозитории кошельков, категорий и транзакций для бота.
+
+Чтение и простые записи идут через нативный асинхронный API QuerySet
+Django (aget, acreate, aexists, aaggregate, async for) без лямбд в
+asyncio.to_thread. Django выполняет их в одном thread-sensitive потоке
+asgiref, поэтому число потоков и соединений с БД у бота не растёт с
+нагрузкой.
+
+Записи из нескольких запросов (транзакция со сдвигом баланса) требуют
+transaction.atomic, которого у асинхронного ORM нет. Они по-прежнему
+выполняются через telegram_bot.db.unit_of_work и возвращают DTO.
+
+Соединение потока asgiref проверяется close_old_connections() не чаще раза
+в TELEGRAM_DB_CHECK_INTERVAL секунд и после ошибки БД - как в пуле
+telegram_bot.db, иначе разорванное соединение не переоткрылось бы.
+"""
+import functools
+import time
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.db.models import Q, Sum
+
+from telegram_bot.db import unit_of_work
+
+
+class _ConnectionGuard:
+    """Периодическая проверка соединения потока асинхронного ORM"""
+
+    def __init__(self):
+        self.checked_at = None
+        self.dirty = True
+        self.checks = 0
+
+    async def check(self):
+        interval = getattr(settings, 'TELEGRAM_DB_CHECK_INTERVAL', 30)
+        now = time.monotonic()
+        if self.dirty or now - self.checked_at >= interval:
+            # thread_sensitive: тот же поток, что и у aget/acreate
+            await sync_to_async(close_old_connections)()
+            self.checked_at = now
+            self.dirty = False
+            self.checks += 1
+
+
+_guard = _ConnectionGuard()
+
+
+def _native(method):
+    """Проверяет соединение перед запросом и помечает его после ошибки"""
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        await _guard.check()
+        try:
+            return await method(*args, **kwargs)
+        except DatabaseError:
+            _guard.dirty = True
+            raise
+    return wrapper
+
+
+class UserRepository:
+    """Данные пользователя, которые нельзя брать из кэша AuthMiddleware"""
+
+    @staticmethod
+    @_native
+    async def total_balance(user) -> Decimal:
+        """Общий баланс из БД: он обновляется через QuerySet.update()"""
+        from django.contrib.auth import get_user_model
+
+        return await get_user_model().objects.filter(pk=user.pk).values_list(
+            'total_balance', flat=True).aget()
+
+
+class WalletRepository:
+    """Кошельки пользователя"""
+
+    @staticmethod
+    @_native
+    async def list_for_user(user) -> list:
+        """Кошельки пользователя с загруженной валютой"""
+        from accounting.models.wallet import Wallet
+
+        queryset = Wallet.objects.filter(user=user).select_related('currency')
+        return [wallet async for wallet in queryset]
+
+    @staticmethod
+    @_native
+    async def get(user, wallet_uuid):
+        from accounting.models.wallet import Wallet
+
+        return await Wallet.objects.select_related('currency').aget(
+            uuid=wallet_uuid, user=user)
+
+    @staticmethod
+    @_native
+    async def create(user, title: str, description: str, currency_code: str):
+        """
+        Создает кошелек в валюте currency_code
+
+        Валюта уже присвоена экземпляру, повторно читать кошелек
+        для отображения не нужно.
+
+        Raises:
+            CurrencyCBR.DoesNotExist
+        """
+        from accounting.models.wallet import Wallet
+        from accounting.services import currencies
+
+        currency = await currencies.aby_code(currency_code)
+        return await Wallet.objects.acreate(
+            user=user,
+            title=title,
+            description=description,
+            currency=currency,
+            balance=Decimal('0.00'),
+        )
+
+
+class CategoryRepository:
+    """Категории транзакций пользователя"""
+
+    @staticmethod
+    @_native
+    async def entries(user) -> list:
+        """Компактный список категорий из кэша accounting.services.category_tree"""
+        from accounting.services.category_tree import get_entries
+
+        return await sync_to_async(get_entries)(user.pk)
+
+    @staticmethod
+    @_native
+    async def get(user, category_uuid):
+        from accounting.models.transactionCategory import \
+            TransactionCategoryTree
+
+        return await TransactionCategoryTree.objects.aget(
+            uuid=category_uuid, user=user)
+
+    @staticmethod
+    @_native
+    async def exists(user, title: str, parent=None) -> bool:
+        from accounting.models.transactionCategory import \
+            TransactionCategoryTree
+
+        return await TransactionCategoryTree.objects.filter(
+            user=user, title=title, parent=parent).aexists()
+
+    @staticmethod
+    @_native
+    async def create(user, title: str, description: str, parent=None):
+        from accounting.models.transactionCategory import \
+            TransactionCategoryTree
+
+        return await TransactionCategoryTree.objects.acreate(
+            user=user,
+            parent=parent,
+            title=title,
+            description=description,
+        )
+
+
+class TransactionRepository:
+    """Транзакции пользователя"""
+
+    @staticmethod
+    async def add(user, wallet_uuid, t_type: str, amount, description: str,
+                  category_uuid=None):
+        """Транзакция со сдвигом баланса, одна транзакция БД"""
+        from telegram_bot import operations
+
+        return await unit_of_work(
+            operations.add_transaction,
+            user, wallet_uuid, t_type, amount, description,
+            category_uuid=category_uuid,
+        )
+
+    @staticmethod
+    async def add_with_new_category(user, parent_uuid, title: str,
+                                    category_description: str, wallet_uuid,
+                                    t_type: str, amount, description: str):
+        """
+        Новая категория и транзакция в ней, одна транзакция БД
+
+        Raises:
+            operations.CategoryExists
+        """
+        from telegram_bot import operations
+
+        return await unit_of_work(
+            operations.add_category_with_transaction,
+            user, parent_uuid, title, category_description,
+            wallet_uuid, t_type, amount, description,
+        )
+
+    @staticmethod
+    @_native
+    async def totals(user, wallet_uuid=None) -> dict:
+        """Суммы доходов и расходов пользователя (по кошельку, если задан)"""
+        from accounting.models.transaction import Transaction
+
+        queryset = Transaction.objects.filter(user=user)
+        if wallet_uuid:
+            queryset = queryset.filter(wallet_id=wallet_uuid)
+        totals = await queryset.aaggregate(
+            income=Sum('amount', filter=Q(t_type='IN')),
+            expense=Sum('amount', filter=Q(t_type='EX')),
+        )
+        return {key: value or Decimal('0') for key, value in totals.items()}
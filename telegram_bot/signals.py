@@ -0,0 +1,19 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .user_cache import get_user_cache
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def refresh_cached_user(sender, instance, **kwargs):
+    """Обновляет запись пользователя в кэше бота после сохранения"""
+    get_user_cache().store(instance)
+
+
+@receiver(post_delete, sender=User)
+def evict_cached_user(sender, instance, **kwargs):
+    """Удаляет пользователя из кэша бота"""
+    get_user_cache().evict(instance.telegram_id)
@@ -0,0 +1,249 @@
+"""
+Хранилище FSM-состояний бота.
+
+По умолчанию используется MemoryStorage aiogram: состояние живёт в памяти
+процесса и теряется при перезапуске. При TELEGRAM_FSM_STORAGE=redis
+состояние хранится в Redis (те же REDIS_* настройки, что и у кэша), что
+позволяет запускать несколько воркеров бота.
+
+Данные состояния кодируются компактно: msgpack, если пакет установлен,
+иначе JSON без пробелов. Decimal/UUID/date/datetime сохраняют свой тип.
+TTL задаётся для каждой группы состояний или отдельного состояния
+(TELEGRAM_FSM_STATE_TTLS), данные живут столько же, сколько состояние.
+"""
+import datetime
+import json
+import logging
+import uuid
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import (BaseEventIsolation, BaseStorage,
+                                     StateType, StorageKey)
+from aiogram.fsm.storage.memory import MemoryStorage, SimpleEventIsolation
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATE_TTL = 60 * 60 * 24
+
+# Коды msgpack ext-типов и теги JSON для значений, которых нет в формате.
+# datetime стоит раньше date, так как является его подклассом
+_EXT_TYPES = (
+    (1, Decimal, str, Decimal),
+    (2, uuid.UUID, str, uuid.UUID),
+    (3, datetime.datetime, datetime.datetime.isoformat,
+     datetime.datetime.fromisoformat),
+    (4, datetime.date, datetime.date.isoformat, datetime.date.fromisoformat),
+)
+_JSON_TAG = '__t'
+
+
+class StateDataCodec:
+    """Компактная сериализация данных FSM (msgpack или JSON)"""
+
+    def __init__(self, use_msgpack: Optional[bool] = None):
+        if use_msgpack is None:
+            use_msgpack = msgpack is not None
+        if use_msgpack and msgpack is None:
+            raise ImproperlyConfigured('Пакет msgpack не установлен')
+        self.use_msgpack = use_msgpack
+
+    @property
+    def name(self) -> str:
+        return 'msgpack' if self.use_msgpack else 'json'
+
+    def dumps(self, data: Dict[str, Any]) -> bytes:
+        if self.use_msgpack:
+            return msgpack.packb(data, default=self._to_ext, use_bin_type=True)
+        return json.dumps(
+            data, default=self._to_json, ensure_ascii=False,
+            separators=(',', ':')
+        ).encode('utf-8')
+
+    def loads(self, value: bytes) -> Dict[str, Any]:
+        if self.use_msgpack:
+            return msgpack.unpackb(value, ext_hook=self._from_ext, raw=False)
+        return json.loads(value, object_hook=self._from_json)
+
+    @staticmethod
+    def _to_ext(obj):
+        for code, kind, encode, _ in _EXT_TYPES:
+            if isinstance(obj, kind):
+                return msgpack.ExtType(code, encode(obj).encode('utf-8'))
+        raise TypeError(f'Тип {type(obj).__name__} нельзя сохранить в FSM')
+
+    @staticmethod
+    def _from_ext(code, payload):
+        for ext_code, _, _, decode in _EXT_TYPES:
+            if ext_code == code:
+                return decode(payload.decode('utf-8'))
+        return msgpack.ExtType(code, payload)
+
+    @staticmethod
+    def _to_json(obj):
+        for code, kind, encode, _ in _EXT_TYPES:
+            if isinstance(obj, kind):
+                return {_JSON_TAG: code, 'v': encode(obj)}
+        raise TypeError(f'Тип {type(obj).__name__} нельзя сохранить в FSM')
+
+    @staticmethod
+    def _from_json(obj):
+        if _JSON_TAG in obj and len(obj) == 2:
+            for code, _, _, decode in _EXT_TYPES:
+                if obj[_JSON_TAG] == code:
+                    return decode(obj['v'])
+        return obj
+
+
+def resolve_state_ttl(state: Optional[str], state_ttls: Dict[str, int],
+                      default: int) -> int:
+    """
+    TTL для состояния: сначала точное имя "Group:state", затем группа
+
+    Args:
+        state: Строковое имя состояния aiogram или None
+        state_ttls: Словарь TTL по состояниям и группам
+        default: TTL по умолчанию
+
+    Returns:
+        int: TTL в секундах
+    """
+    if state:
+        if state in state_ttls:
+            return state_ttls[state]
+        group = state.split(':', 1)[0]
+        if group in state_ttls:
+            return state_ttls[group]
+    return default
+
+
+class PackedRedisStorage(BaseStorage):
+    """
+    Redis-хранилище FSM с TTL по состояниям и компактным кодированием
+
+    Состояние и данные лежат в отдельных ключах. При смене состояния оба
+    ключа получают TTL нового состояния; запись данных сохраняет текущий
+    TTL ключа (KEEPTTL), поэтому update_data не продлевает жизнь диалогу.
+    Требуется Redis >= 7.0 (EXPIRE ... NX).
+    """
+
+    def __init__(self, redis, key_builder=None,
+                 state_ttls: Optional[Dict[str, int]] = None,
+                 default_ttl: int = DEFAULT_STATE_TTL,
+                 codec: Optional[StateDataCodec] = None):
+        from aiogram.fsm.storage.redis import DefaultKeyBuilder
+
+        self.redis = redis
+        self.key_builder = key_builder or DefaultKeyBuilder(prefix='fsm')
+        self.state_ttls = state_ttls or {}
+        self.default_ttl = default_ttl
+        self.codec = codec or StateDataCodec()
+
+    async def close(self) -> None:
+        await self.redis.aclose(close_connection_pool=True)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state_key = self.key_builder.build(key, 'state')
+        data_key = self.key_builder.build(key, 'data')
+        if isinstance(state, State):
+            state = state.state
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if state is None:
+                pipe.delete(state_key)
+                pipe.expire(data_key, self.default_ttl)
+            else:
+                ttl = resolve_state_ttl(
+                    state, self.state_ttls, self.default_ttl)
+                pipe.set(state_key, state, ex=ttl)
+                pipe.expire(data_key, ttl)
+            await pipe.execute()
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        value = await self.redis.get(self.key_builder.build(key, 'state'))
+        if isinstance(value, bytes):
+            return value.decode('utf-8')
+        return value
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        data_key = self.key_builder.build(key, 'data')
+        if not data:
+            await self.redis.delete(data_key)
+            return
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(data_key, self.codec.dumps(data), keepttl=True)
+            # Новый ключ без состояния получает TTL по умолчанию
+            pipe.expire(data_key, self.default_ttl, nx=True)
+            await pipe.execute()
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        value = await self.redis.get(self.key_builder.build(key, 'data'))
+        if value is None:
+            return {}
+        return self.codec.loads(value)
+
+
+def build_redis_url() -> str:
+    """URL Redis из настроек REDIS_* проекта"""
+    password = getattr(settings, 'REDIS_PASSWORD', '')
+    auth = f':{password}@' if password else ''
+    host = getattr(settings, 'REDIS_HOST', '127.0.0.1')
+    port = getattr(settings, 'REDIS_PORT', 6379)
+    db = getattr(settings, 'TELEGRAM_FSM_REDIS_DB',
+                 getattr(settings, 'REDIS_DB', 0))
+    return f'redis://{auth}{host}:{port}/{db}'
+
+
+def create_storage() -> BaseStorage:
+    """
+    Создаёт хранилище FSM согласно TELEGRAM_FSM_STORAGE
+
+    Returns:
+        BaseStorage: MemoryStorage или PackedRedisStorage
+    """
+    backend = getattr(settings, 'TELEGRAM_FSM_STORAGE', 'memory')
+
+    if backend == 'memory':
+        return MemoryStorage()
+
+    if backend == 'redis':
+        try:
+            from redis.asyncio import Redis
+        except ImportError:
+            raise ImproperlyConfigured(
+                'Для TELEGRAM_FSM_STORAGE=redis нужен пакет redis')
+
+        logger.info("FSM состояние хранится в Redis")
+        return PackedRedisStorage(
+            redis=Redis.from_url(build_redis_url()),
+            state_ttls=getattr(settings, 'TELEGRAM_FSM_STATE_TTLS', {}),
+            default_ttl=getattr(
+                settings, 'TELEGRAM_FSM_STATE_TTL', DEFAULT_STATE_TTL),
+        )
+
+    raise ImproperlyConfigured(
+        f'Неизвестное хранилище FSM: {backend}')
+
+
+def create_events_isolation(storage: BaseStorage) -> BaseEventIsolation:
+    """
+    Изоляция обработки событий одного FSM-ключа
+
+    С Redis-хранилищем используется распределённая блокировка, поэтому
+    обновления одного чата не обрабатываются параллельно даже в разных
+    процессах (несколько ASGI-воркеров с webhook).
+    """
+    if isinstance(storage, PackedRedisStorage):
+        from aiogram.fsm.storage.redis import RedisEventIsolation
+        return RedisEventIsolation(
+            redis=storage.redis, key_builder=storage.key_builder)
+    return SimpleEventIsolation()
@@ -1,14 +1,53 @@
 """
 Утилиты для авторизации через Telegram WebApp
+
+Секретный ключ WebAppData выводится из токена бота один раз. Успешно
+проверенные init data кэшируются в памяти процесса по их хэшу до
+истечения срока действия (auth_date + TELEGRAM_WEBAPP_AUTH_MAX_AGE)
+вместе с id пользователя Django, так что повторные запросы той же сессии
+Mini App не вычисляют HMAC и не ищут пользователя в БД.
+
+После первой проверки init data Mini App получает короткоживущий
+подписанный токен (django.core.signing, HMAC с SECRET_KEY) и передает его
+в _auth вместо init data. Токен проверяется без обращения к БД и без
+сессии Django.
 """
+import functools
 import hashlib
 import hmac
 import json
+import time
 import urllib.parse
+import uuid
 from operator import itemgetter
-from typing import Dict, Optional
+from typing import Dict, NamedTuple, Optional, Tuple
 
 from django.conf import settings
+from django.core import signing
+
+from telegram_bot.cache import LRUTTLCache
+
+
+@functools.lru_cache(maxsize=8)
+def get_webapp_secret_key(bot_token: str) -> bytes:
+    """Секретный ключ проверки init data, HMAC-SHA256("WebAppData", token)"""
+    return hmac.new(
+        key=b"WebAppData",
+        msg=bot_token.encode(),
+        digestmod=hashlib.sha256
+    ).digest()
+
+
+def _calculate_hash(parsed_data: Dict, bot_token: str) -> str:
+    """Подпись init data без поля hash"""
+    data_check_string = '\n'.join(
+        f"{k}={v}" for k, v in sorted(parsed_data.items(), key=itemgetter(0))
+    )
+    return hmac.new(
+        key=get_webapp_secret_key(bot_token),
+        msg=data_check_string.encode(),
+        digestmod=hashlib.sha256
+    ).hexdigest()
 
 
 def verify_telegram_webapp_data(init_data: str, bot_token: str) -> bool:
@@ -55,24 +94,8 @@ def verify_telegram_webapp_data(init_data: str, bot_token: str) -> bool:
 
         received_hash = parsed_data.pop('hash')
 
-        # Создаем строку для проверки (сортированную по ключам)
-        data_check_string = '\n'.join(
-            f"{k}={v}" for k, v in sorted(parsed_data.items(), key=itemgetter(0))
-        )
-
-        # Создаем секретный ключ
-        secret_key = hmac.new(
-            key=b"WebAppData",
-            msg=bot_token.encode(),
-            digestmod=hashlib.sha256
-        ).digest()
-
-        # Вычисляем hash
-        calculated_hash = hmac.new(
-            key=secret_key,
-            msg=data_check_string.encode(),
-            digestmod=hashlib.sha256
-        ).hexdigest()
+        # Секретный ключ выводится из токена один раз
+        calculated_hash = _calculate_hash(parsed_data, bot_token)
 
         is_valid = hmac.compare_digest(calculated_hash, received_hash)
         logger.info(
@@ -155,3 +178,188 @@ def get_telegram_user_from_webapp(init_data: str, verify_signature: bool = True)
             return None
 
     return parse_telegram_webapp_data(init_data)
+
+
+class VerifiedInitData(NamedTuple):
+    """Результат проверки init data Mini App"""
+    telegram_id: int
+    user_data: Dict
+    auth_date: int
+    user_id: Optional[uuid.UUID] = None
+
+
+_init_data_cache: Optional[LRUTTLCache] = None
+
+
+def get_init_data_cache() -> LRUTTLCache:
+    """Кэш проверенных init data процесса"""
+    global _init_data_cache
+    if _init_data_cache is None:
+        _init_data_cache = LRUTTLCache(
+            maxsize=getattr(settings, 'TELEGRAM_WEBAPP_AUTH_CACHE_SIZE', 10000))
+    return _init_data_cache
+
+
+def _init_data_key(init_data: str, bot_token: str) -> str:
+    # Ключ зависит от токена: после его смены старые записи не читаются
+    return hashlib.sha256(
+        get_webapp_secret_key(bot_token) + init_data.encode()).hexdigest()
+
+
+def verify_init_data(init_data: str, bot_token: str = None,
+                     max_age: int = None) -> Optional[VerifiedInitData]:
+    """
+    Проверяет подпись и срок действия init data с кэшированием результата
+
+    Args:
+        init_data: Строка с данными от Telegram WebApp
+        bot_token: Токен бота, по умолчанию TELEGRAM_BOT_TOKEN
+        max_age: Срок действия от auth_date, секунды, по умолчанию
+            TELEGRAM_WEBAPP_AUTH_MAX_AGE
+
+    Returns:
+        VerifiedInitData или None, если данные не прошли проверку
+    """
+    import logging
+    logger = logging.getLogger(__name__)
+
+    bot_token = bot_token or getattr(settings, 'TELEGRAM_BOT_TOKEN', '')
+    if not init_data or not bot_token:
+        return None
+    if max_age is None:
+        max_age = getattr(settings, 'TELEGRAM_WEBAPP_AUTH_MAX_AGE', 60 * 60 * 24)
+
+    cache = get_init_data_cache()
+    key = _init_data_key(init_data, bot_token)
+    verified = cache.get(key)
+    if verified is not None:
+        return verified
+
+    parsed_data = dict(urllib.parse.parse_qsl(init_data, keep_blank_values=True))
+    received_hash = parsed_data.pop('hash', None)
+    if not received_hash:
+        logger.warning("No hash found in Telegram WebApp data")
+        return None
+
+    if not hmac.compare_digest(_calculate_hash(parsed_data, bot_token), received_hash):
+        logger.warning("Telegram WebApp signature verification: FAILED")
+        return None
+
+    try:
+        auth_date = int(parsed_data['auth_date'])
+        user_data = json.loads(parsed_data['user'])
+        telegram_id = int(user_data['id'])
+    except (KeyError, TypeError, ValueError) as e:
+        logger.warning(f"Invalid Telegram WebApp data: {e}")
+        return None
+
+    ttl = auth_date + max_age - time.time()
+    if ttl <= 0:
+        logger.info(f"Telegram WebApp data expired for user: {telegram_id}")
+        return None
+
+    verified = VerifiedInitData(
+        telegram_id=telegram_id, user_data=user_data, auth_date=auth_date)
+    cache.set(key, verified, ttl=ttl)
+    return verified
+
+
+def remember_user_id(init_data: str, verified: VerifiedInitData, user_id,
+                     bot_token: str = None, max_age: int = None) -> VerifiedInitData:
+    """Сохраняет id найденного пользователя Django в записи кэша init data"""
+    bot_token = bot_token or getattr(settings, 'TELEGRAM_BOT_TOKEN', '')
+    if max_age is None:
+        max_age = getattr(settings, 'TELEGRAM_WEBAPP_AUTH_MAX_AGE', 60 * 60 * 24)
+
+    verified = verified._replace(user_id=user_id)
+    ttl = verified.auth_date + max_age - time.time()
+    if ttl > 0:
+        get_init_data_cache().set(
+            _init_data_key(init_data, bot_token), verified, ttl=ttl)
+    return verified
+
+
+def get_or_create_telegram_user(user_data: Dict) -> Tuple[object, bool]:
+    """
+    Пользователь Django по данным пользователя Telegram
+
+    Новый пользователь получает username из Telegram, а если его нет или
+    он занят - tg_<telegram_id>. Параллельное создание того же telegram_id
+    не падает: проигравший запрос возвращает уже созданную запись.
+
+    Args:
+        user_data: Поле user из init data ('id', 'username', 'first_name', ...)
+
+    Returns:
+        (user, created)
+    """
+    from django.db import IntegrityError, transaction
+
+    from users.models.user import User
+
+    telegram_id = int(user_data['id'])
+    user = User.objects.filter(telegram_id=telegram_id).first()
+    if user is not None:
+        return user, False
+
+    fallback = f"tg_{telegram_id}"
+    usernames = list(dict.fromkeys((user_data.get('username') or fallback, fallback)))
+    for attempt, username in enumerate(usernames, 1):
+        try:
+            with transaction.atomic():
+                user = User.objects.create(
+                    telegram_id=telegram_id,
+                    username=username,
+                    first_name=user_data.get('first_name', ''),
+                    last_name=user_data.get('last_name', ''),
+                )
+            return user, True
+        except IntegrityError:
+            user = User.objects.filter(telegram_id=telegram_id).first()
+            if user is not None:
+                return user, False
+            if attempt == len(usernames):
+                raise
+
+
+MINIAPP_TOKEN_PREFIX = 'mt.'
+_MINIAPP_TOKEN_SALT = 'telegram_bot.miniapp_token'
+
+
+class MiniAppToken(NamedTuple):
+    """Данные подписанного токена сессии Mini App"""
+    user_id: str
+    telegram_id: int
+
+
+def is_miniapp_token(value: str) -> bool:
+    return bool(value) and value.startswith(MINIAPP_TOKEN_PREFIX)
+
+
+def issue_miniapp_token(user) -> str:
+    """Подписанный токен сессии Mini App для пользователя"""
+    signer = signing.TimestampSigner(salt=_MINIAPP_TOKEN_SALT)
+    return MINIAPP_TOKEN_PREFIX + signer.sign(f'{user.pk}:{user.telegram_id}')
+
+
+def verify_miniapp_token(token: str, max_age: int = None) -> Optional[MiniAppToken]:
+    """
+    Проверяет подпись и срок действия токена Mini App
+
+    Подпись сравнивается за постоянное время (signing.TimestampSigner).
+
+    Returns:
+        MiniAppToken или None для неверного или просроченного токена
+    """
+    if not is_miniapp_token(token):
+        return None
+    if max_age is None:
+        max_age = getattr(settings, 'TELEGRAM_MINIAPP_TOKEN_TTL', 60 * 60)
+
+    signer = signing.TimestampSigner(salt=_MINIAPP_TOKEN_SALT)
+    try:
+        value = signer.unsign(token[len(MINIAPP_TOKEN_PREFIX):], max_age=max_age)
+        user_id, telegram_id = value.rsplit(':', 1)
+        return MiniAppToken(user_id=user_id, telegram_id=int(telegram_id))
+    except (signing.BadSignature, ValueError):
+        return None
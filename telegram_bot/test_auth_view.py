@@ -8,8 +8,6 @@ from django.http import JsonResponse
 from django.shortcuts import render
 from django.views import View
 
-from users.models.user import User
-
 logger = logging.getLogger(__name__)
 
 
@@ -52,17 +50,9 @@ class TestAuthView(View):
         user = None
         if telegram_data and 'id' in telegram_data:
             try:
-                user = User.objects.filter(
-                    telegram_id=telegram_data['id']).first()
-                if not user:
-                    # Создаем тестового пользователя
-                    user = User.objects.create(
-                        telegram_id=telegram_data['id'],
-                        username=telegram_data.get(
-                            'username') or f"tg_{telegram_data['id']}",
-                        first_name=telegram_data.get('first_name', ''),
-                        last_name=telegram_data.get('last_name', ''),
-                    )
+                from .telegram_auth import get_or_create_telegram_user
+                user, created = get_or_create_telegram_user(telegram_data)
+                if created:
                     logger.info(f"Created test user: {user.username}")
             except Exception as e:
                 logger.error(f"Error creating user: {e}")
@@ -94,14 +84,14 @@ class TestAuthView(View):
 
         try:
             # Ищем или создаем пользователя
-            user = User.objects.filter(telegram_id=telegram_id).first()
-            if not user:
-                user = User.objects.create(
-                    telegram_id=telegram_id,
-                    username=username or f"tg_{telegram_id}",
-                    first_name=first_name,
-                    last_name=last_name,
-                )
+            from .telegram_auth import get_or_create_telegram_user
+            user, created = get_or_create_telegram_user({
+                'id': telegram_id,
+                'username': username,
+                'first_name': first_name,
+                'last_name': last_name,
+            })
+            if created:
                 logger.info(f"Created user via test form: {user.username}")
 
             return JsonResponse({
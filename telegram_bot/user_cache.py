@@ -0,0 +1,139 @@
+"""
+Кэш пользователей Django по telegram_id для AuthMiddleware.
+
+Первый уровень - LRU+TTL кэш в памяти процесса, второй (опционально,
+TELEGRAM_USER_CACHE_SHARED) - общий Django cache, в продакшене Redis.
+В кэше хранится словарь значений полей пользователя без пароля, из
+которого экземпляр User собирается через User.from_db() без запросов к БД.
+
+Сохранение пользователя через save() обновляет оба уровня сигналом
+post_save (write-through). Изменения через QuerySet.update() сигналов не
+порождают, поэтому поля, которые так обновляются (total_balance), нужно
+читать из БД, а не из django_user.
+"""
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache as shared_cache
+
+from telegram_bot.cache import LRUTTLCache
+
+User = get_user_model()
+
+_EXCLUDED_FIELDS = {'password'}
+
+
+def _shared_key(telegram_id) -> str:
+    return f'telegram_user:{telegram_id}'
+
+
+class UserCache:
+    """Двухуровневый кэш telegram_id -> User"""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300,
+                 shared: bool = False):
+        self.local = LRUTTLCache(maxsize=maxsize, ttl=ttl)
+        self.ttl = ttl
+        self.shared = shared
+        self.field_names = [
+            field.attname for field in User._meta.concrete_fields
+            if field.attname not in _EXCLUDED_FIELDS
+        ]
+        self.shared_hits = 0
+        self.db_loads = 0
+
+    def to_record(self, user) -> dict:
+        """Лёгкая запись пользователя для кэша"""
+        return {name: getattr(user, name) for name in self.field_names}
+
+    def from_record(self, record: dict):
+        """Экземпляр User из записи кэша, без обращения к БД"""
+        if set(record) != set(self.field_names):
+            # Запись от другой версии модели
+            return None
+        return User.from_db(
+            'default', self.field_names,
+            [record[name] for name in self.field_names]
+        )
+
+    def get_local(self, telegram_id):
+        record = self.local.get(telegram_id)
+        return self.from_record(record) if record is not None else None
+
+    def get(self, telegram_id):
+        """Синхронный вариант aget() для Django views"""
+        user = self.get_local(telegram_id)
+        if user is not None or not self.shared:
+            return user
+
+        record = shared_cache.get(_shared_key(telegram_id))
+        if record is None:
+            return None
+        user = self.from_record(record)
+        if user is not None:
+            self.shared_hits += 1
+            self.local.set(telegram_id, record)
+        return user
+
+    async def aget(self, telegram_id):
+        """Пользователь из кэша (память, затем общий кэш) или None"""
+        user = self.get_local(telegram_id)
+        if user is not None or not self.shared:
+            return user
+
+        record = await shared_cache.aget(_shared_key(telegram_id))
+        if record is None:
+            return None
+        user = self.from_record(record)
+        if user is not None:
+            self.shared_hits += 1
+            self.local.set(telegram_id, record)
+        return user
+
+    def store(self, user):
+        """Запись пользователя в оба уровня кэша (write-through)"""
+        if user.telegram_id is None:
+            return
+        record = self.to_record(user)
+        self.local.set(user.telegram_id, record)
+        if self.shared:
+            shared_cache.set(_shared_key(user.telegram_id), record, self.ttl)
+
+    async def astore(self, user):
+        if user.telegram_id is None:
+            return
+        record = self.to_record(user)
+        self.local.set(user.telegram_id, record)
+        if self.shared:
+            await shared_cache.aset(
+                _shared_key(user.telegram_id), record, self.ttl)
+
+    def evict(self, telegram_id):
+        """Удаление пользователя из обоих уровней"""
+        if telegram_id is None:
+            return
+        self.local.delete(telegram_id)
+        if self.shared:
+            shared_cache.delete(_shared_key(telegram_id))
+
+    def stats(self) -> dict:
+        """Счётчики: попадания в память, в общий кэш и загрузки из БД"""
+        stats = self.local.stats()
+        stats.update(shared_hits=self.shared_hits, db_loads=self.db_loads)
+        return stats
+
+
+_user_cache: Optional[UserCache] = None
+
+
+def get_user_cache() -> UserCache:
+    """Кэш пользователей процесса с параметрами из настроек"""
+    global _user_cache
+    if _user_cache is None:
+        _user_cache = UserCache(
+            maxsize=getattr(settings, 'TELEGRAM_USER_CACHE_SIZE', 10000),
+            ttl=getattr(settings, 'TELEGRAM_USER_CACHE_TTL', 300),
+            shared=getattr(settings, 'TELEGRAM_USER_CACHE_SHARED', False),
+        )
+    return _user_cache
@@ -9,8 +9,6 @@ from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 
-from users.models.user import User
-
 logger = logging.getLogger(__name__)
 
 
@@ -47,22 +45,18 @@ class TelegramWebAppAuthView(View):
                 return JsonResponse({'error': 'No user ID in auth data'}, status=400)
 
             # Ищем или создаем пользователя
-            user = User.objects.filter(telegram_id=telegram_id).first()
-            if not user:
-                # Создаем нового пользователя
-                username = user_data.get('username') or f"tg_{telegram_id}"
-                user = User.objects.create(
-                    telegram_id=telegram_id,
-                    username=username,
-                    first_name=user_data.get('first_name', ''),
-                    last_name=user_data.get('last_name', ''),
-                )
+            from .telegram_auth import get_or_create_telegram_user
+            user, created = get_or_create_telegram_user(user_data)
+            if created:
                 logger.info(
                     f"Created new user: {user.username} (telegram_id: {telegram_id})")
 
-            # Возвращаем успешный ответ
+            # Подписанный токен сессии Mini App вместо входа через сессию
+            from .telegram_auth import issue_miniapp_token
             return JsonResponse({
                 'ok': True,
+                'token': issue_miniapp_token(user),
+                'expires_in': getattr(settings, 'TELEGRAM_MINIAPP_TOKEN_TTL', 60 * 60),
                 'user': {
                     'id': str(user.uuid),
                     'username': user.username,
@@ -134,14 +128,14 @@ class TelegramWebAppTestView(View):
 
         try:
             # Ищем или создаем пользователя
-            user = User.objects.filter(telegram_id=telegram_id).first()
-            if not user:
-                user = User.objects.create(
-                    telegram_id=telegram_id,
-                    username=username or f"tg_{telegram_id}",
-                    first_name=first_name,
-                    last_name=last_name,
-                )
+            from .telegram_auth import get_or_create_telegram_user
+            user, created = get_or_create_telegram_user({
+                'id': telegram_id,
+                'username': username,
+                'first_name': first_name,
+                'last_name': last_name,
+            })
+            if created:
                 logger.info(f"Created user via test form: {user.username}")
 
             return JsonResponse({
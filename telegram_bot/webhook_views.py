@@ -7,47 +7,52 @@ from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
-from telegram_bot.bot import create_webhook_app
+from telegram_bot.bot import SECRET_HEADER, get_runtime, is_valid_webhook_secret
 
 logger = logging.getLogger(__name__)
 
 
-@method_decorator(csrf_exempt, name='dispatch')
-class TelegramWebhookView(View):
-    """Webhook для получения обновлений от Telegram"""
+async def process_webhook_request(request):
+    """
+    Передает обновление в долгоживущий диспетчер процесса
+
+    Обработка идет в фоне через планировщик с очередями по чатам, ответ
+    Telegram отправляется сразу после постановки в очередь. Если очередь
+    переполнена, возвращается 503 и Telegram повторит доставку.
+    """
+    if not is_valid_webhook_secret(request.headers.get(SECRET_HEADER)):
+        logger.warning("Webhook с неверным секретным токеном")
+        return JsonResponse({'error': 'forbidden'}, status=403)
+
+    runtime = get_runtime()
+    try:
+        update = runtime.parse_update(json.loads(request.body))
+    except ValueError as e:
+        logger.error(f"Некорректное обновление в webhook: {e}")
+        return JsonResponse({'error': 'invalid update'}, status=400)
+
+    logger.debug(f"Received update: {update.update_id}")
 
-    def post(self, request):
-        try:
-            # Получаем данные от Telegram
-            update_data = json.loads(request.body.decode('utf-8'))
+    if not await runtime.submit(update):
+        return JsonResponse({'error': 'overloaded'}, status=503)
 
-            # Логируем обновление
-            logger.info(f"Received update: {update_data}")
+    return JsonResponse({'status': 'ok'})
 
-            # Здесь будет обработка через aiogram
-            # Пока просто возвращаем OK
-            return JsonResponse({'status': 'ok'})
 
-        except Exception as e:
-            logger.error(f"Error processing webhook: {e}")
-            return JsonResponse({'error': str(e)}, status=500)
+@method_decorator(csrf_exempt, name='dispatch')
+class TelegramWebhookView(View):
+    """Webhook для получения обновлений от Telegram"""
+
+    async def post(self, request):
+        return await process_webhook_request(request)
 
-    def get(self, request):
+    async def get(self, request):
         """Проверка webhook"""
         return JsonResponse({'status': 'webhook is working'})
 
 
 @csrf_exempt
 @require_http_methods(["POST"])
-def telegram_webhook(request):
+async def telegram_webhook(request):
     """Простой webhook endpoint"""
-    try:
-        update_data = json.loads(request.body.decode('utf-8'))
-        logger.info(f"Received update: {update_data}")
-
-        # Здесь будет интеграция с aiogram
-        return JsonResponse({'status': 'ok'})
-
-    except Exception as e:
-        logger.error(f"Error processing webhook: {e}")
-        return JsonResponse({'error': str(e)}, status=500)
+    return await process_webhook_request(request)
@@ -2,6 +2,8 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
 
+from accounting.services.total_balance import recalculate_total_balances
+
 from users.models.family import Family
 from users.models.user import User
 
@@ -44,6 +46,15 @@ class UserAdmin(BaseUserAdmin):
     send_password_reset_email.short_description = _(
         "Send password reset email to selected users")
 
+    def recalculate_balance(self, request, queryset):
+        count = recalculate_total_balances(queryset)
+
+        self.message_user(request, _(
+            "Total balance recalculated for %(count)d users.") % {'count': count})
+
+    recalculate_balance.short_description = _(
+        "Recalculate total balance of selected users")
+
 
 admin.site.register(User, UserAdmin)
 
@@ -0,0 +1,44 @@
+"""
+JWT аутентификация API по токенам, выданным в обмен на init data Telegram.
+
+Сессия Django не используется. Пользователь берётся из кэша пользователей
+бота по claim telegram_id (telegram_bot.user_cache), и только при промахе
+читается из БД по user id токена.
+"""
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+TELEGRAM_ID_CLAIM = 'telegram_id'
+
+
+def tokens_for_user(user) -> dict:
+    """Пара access/refresh JWT с claim telegram_id"""
+    refresh = RefreshToken.for_user(user)
+    # Claim копируется в access токены, в том числе выданные при refresh
+    refresh[TELEGRAM_ID_CLAIM] = user.telegram_id
+    return {
+        'access': str(refresh.access_token),
+        'refresh': str(refresh),
+    }
+
+
+class TelegramJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication с пользователем из кэша вместо запроса к БД"""
+
+    def get_user(self, validated_token):
+        from telegram_bot.user_cache import get_user_cache
+
+        telegram_id = validated_token.get(TELEGRAM_ID_CLAIM)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if telegram_id is None or user_id is None:
+            return super().get_user(validated_token)
+
+        user_cache = get_user_cache()
+        user = user_cache.get(telegram_id)
+        if user is not None and str(user.pk) == str(user_id) and user.is_active:
+            return user
+
+        user = super().get_user(validated_token)
+        user_cache.store(user)
+        return user
@@ -41,19 +41,27 @@ class TelegramAuthSerializer(serializers.Serializer):
         return attrs
 
     def create(self, validated_data):
-        telegram_id = validated_data['id']
-
-        # Ищем существующего пользователя
-        try:
-            user = User.objects.get(telegram_id=telegram_id)
-        except User.DoesNotExist:
-            # Создаем нового пользователя
-            username = validated_data.get('username') or f"user_{telegram_id}"
-            user = User.objects.create(
-                telegram_id=telegram_id,
-                username=username,
-                first_name=validated_data['first_name'],
-                last_name=validated_data.get('last_name', ''),
-            )
+        from telegram_bot.telegram_auth import get_or_create_telegram_user
 
+        user, _ = get_or_create_telegram_user(validated_data)
+        return user
+
+
+class TelegramInitDataSerializer(serializers.Serializer):
+    """Init data Telegram WebApp для обмена на JWT"""
+    init_data = serializers.CharField()
+
+    def validate_init_data(self, value):
+        from telegram_bot.telegram_auth import verify_init_data
+
+        # Та же проверка с кэшем, что и у Mini App: подпись и срок auth_date
+        self.verified = verify_init_data(value)
+        if self.verified is None:
+            raise serializers.ValidationError("Invalid or expired Telegram init data")
+        return value
+
+    def create(self, validated_data):
+        from telegram_bot.telegram_auth import get_or_create_telegram_user
+
+        user, _ = get_or_create_telegram_user(self.verified.user_data)
         return user
@@ -1,9 +1,10 @@
 
 from django.urls import include, path
 from rest_framework import routers
+from rest_framework_simplejwt.views import TokenRefreshView
 
 from users.views import UserViewSet
-from users.views.auth_views import telegram_auth, user_profile
+from users.views.auth_views import telegram_auth, telegram_jwt, user_profile
 
 userRouter = routers.DefaultRouter()
 userRouter.register(r'users', UserViewSet, basename='user')
@@ -11,5 +12,7 @@ userRouter.register(r'users', UserViewSet, basename='user')
 urlpatterns = [
     path('', include(userRouter.urls)),
     path('auth/telegram/', telegram_auth, name='telegram_auth'),
+    path('auth/telegram/jwt/', telegram_jwt, name='telegram_jwt'),
+    path('auth/jwt/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('auth/profile/', user_profile, name='user_profile'),
 ]
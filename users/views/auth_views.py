@@ -1,11 +1,14 @@
 from django.contrib.auth import authenticate
 from rest_framework import status
 from rest_framework.authtoken.models import Token
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import (api_view, authentication_classes,
+                                       permission_classes)
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 
-from users.serializers import TelegramAuthSerializer, UserSerializer
+from users.authentication import tokens_for_user
+from users.serializers import (TelegramAuthSerializer,
+                               TelegramInitDataSerializer, UserSerializer)
 
 
 @api_view(['POST'])
@@ -37,6 +40,23 @@ def telegram_auth(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def telegram_jwt(request):
+    """
+    Обмен проверенных init data Telegram WebApp на access и refresh JWT
+    """
+    serializer = TelegramInitDataSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    user = serializer.save()
+
+    return Response({
+        **tokens_for_user(user),
+        'user': UserSerializer(user).data
+    }, status=status.HTTP_200_OK)
+
+
 @api_view(['GET'])
 def user_profile(request):
     """